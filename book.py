@@ -1,3 +1,6 @@
+from src.chess_engine import GameState
+from src.polyglot import polyglot_key
+
 OPENING_BOOK = {
     "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq -": [
         "e2e4",  # King's Pawn Opening
@@ -30,27 +33,11 @@ OPENING_BOOK = {
 }
 
 
-def get_book_fen(gs):
-
-    try:
-        # Get the full FEN from your board
-        full_fen = gs.board_to_fen()
-
-        # Split it into parts
-        parts = full_fen.split()
-
-        # Validate we have enough parts
-        if len(parts) < 4:
-            return None
-
-        # Only keep first 4 parts (ignore move counters)
-        book_key = " ".join(parts[:4])
-
-        return book_key
-
-    except Exception as e:
-
-        return None
+# OPENING_BOOK indexed by Polyglot key, so a lookup hashes the board instead
+# of building its FEN
+BOOK_INDEX = {
+    polyglot_key(GameState.from_fen(fen)): moves for fen, moves in OPENING_BOOK.items()
+}
 
 
 def string_to_move(move_string, gs, valid_moves):
@@ -98,21 +85,22 @@ def string_to_move(move_string, gs, valid_moves):
         return None
 
 
-def get_opening_book_move(gs, valid_moves):
+def get_opening_book_move(gs, valid_moves, book=None):
     """
     Main function to get an opening book move for the current position.
+    book is an optional PolyglotBook (e.g. one built by src.book_compiler),
+    probed before the built-in lines.
     Returns a Move object or None if position not in book.
     """
-    book_key = get_book_fen(gs)
-
-    if book_key is None:
-        return None
-
-    if book_key not in OPENING_BOOK:
-        return None
+    if book is not None:
+        move = book.choose(gs)
+        if move is not None and move in valid_moves:
+            return move
 
     # Get candidate moves from book
-    candidate_strings = OPENING_BOOK[book_key]
+    candidate_strings = BOOK_INDEX.get(polyglot_key(gs))
+    if candidate_strings is None:
+        return None
 
     # Try each candidate
     for move_string in candidate_strings:
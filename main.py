@@ -1,5 +1,9 @@
-from src.chess_engine import GameState, Move
+from src.bitboard import BitboardGameState
+from src.chess_engine import Move
 import src.Engine_Move as E
+from src.background import BackgroundEngine
+from src import profiling
+from src.bitbase import bitbases
 import pygame as p
 import os
 
@@ -11,7 +15,7 @@ max_fps = 15
 screen = p.display.set_mode((width, height))
 images = {}
 clock = p.time.Clock()
-gs = GameState()
+gs = BitboardGameState()
 
 
 def choose_promotion(screen, color):
@@ -137,6 +141,10 @@ def main():
     move_made = False
 
     load_images()
+    # CHESS_PROFILE=<file> profiles the engine for the whole game
+    profiling.enable_from_env()
+    # Endgame bitbases: generated on the first run, memory-mapped after that
+    bitbases.load()
     running = True
 
     selected_sq = ()
@@ -147,6 +155,10 @@ def main():
     player_one = True
     player_two = False
 
+    # The engine searches in a background thread: deepen until the time
+    # budget is spent, depth is only a cap
+    engine = BackgroundEngine(depth=64, think_time=2.0)
+
     while running:
         is_human_turn = (gs.white_to_move and player_one) or (
             not gs.white_to_move and player_two
@@ -183,17 +195,23 @@ def main():
                                 # when you find a matching valid move:
                                 move_made = True
                                 selected_move = valid_moves[i]
-                                animate_move(screen, gs.board, selected_move, clock)
-                                gs.make_move(selected_move)
-                                print(selected_move.get_chess_notation(), end="   ")
-                                ...
+                                # ask for the piece first, make_move then promotes to it
                                 if selected_move.is_pawn_promotion:
                                     piece_choice = choose_promotion(
                                         screen, selected_move.piece_moved[0]
                                     )
-                                    gs.board[selected_move.end_r][
-                                        selected_move.end_c
-                                    ] = (selected_move.piece_moved[0] + piece_choice)
+                                    selected_move = Move(
+                                        player_clicks[0],
+                                        player_clicks[1],
+                                        gs.board,
+                                        promotion_piece=piece_choice,
+                                    )
+                                    selected_move = valid_moves[
+                                        valid_moves.index(selected_move)
+                                    ]
+                                animate_move(screen, gs.board, selected_move, clock)
+                                gs.make_move(selected_move)
+                                print(selected_move.get_chess_notation(), end="   ")
 
                                 # if 2 moves have happened then print a new line
                                 if len(gs.move_log) % 2 == 0:
@@ -213,30 +231,33 @@ def main():
             #         gs.undo()
             #         move_made= True
 
-        # Engine move finder
-        if not is_human_turn:
-            depth = 3
-            ai_move = E.find_best_move(gs, valid_moves, depth)
-            if ai_move is None:
-                ai_move = E.find_random(valid_moves)
+        # Engine move finder: start a search, then check for the result each frame
+        if not is_human_turn and len(valid_moves) > 0:
+            if not engine.thinking:
+                engine.start(gs)
+            result = engine.poll()
+            if result is not None:
+                ai_move = result.move
+                if ai_move is None:
+                    ai_move = E.find_random(valid_moves)
 
-            if ai_move:
                 # animate ai move
                 animate_move(screen, gs.board, ai_move, clock)
                 gs.make_move(ai_move)
-                # print the notation for ai moves
+                # print the notation for ai moves, make_move already promoted
                 print(ai_move.get_chess_notation(), end="   ")
-        
-                # calling pawn promotion
-                if ai_move.is_pawn_promotion:
-                    gs.board[ai_move.end_r][ai_move.end_c] = (
-                        ai_move.piece_moved[0] + "q"
-                    )
+
                 if len(gs.move_log) % 2 == 0:
                     print()
-            
+
                 move_made = True
 
+                # think about the expected reply while the human thinks
+                if (gs.white_to_move and player_one) or (
+                    not gs.white_to_move and player_two
+                ):
+                    engine.ponder(gs, result)
+
         # if move was made then call new valid moves and set boolean to false
         if move_made:
             valid_moves = gs.get_valid_moves()
@@ -248,6 +269,7 @@ def main():
         draw_game_state(screen, gs, valid_moves, selected_sq)
         p.display.flip()
 
+    engine.stop()
     p.quit()
 
 
@@ -1,35 +1,36 @@
-import chess
-import chess.polyglot
+import os
 
-BOOK_PATH = "books/M112.bin"
+from src.polyglot import PolyglotBook
 
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "books", "M11.2.bin")
 
-def get_polyglot_move(gs):
+# Opened on first use and kept mapped; False once opening has failed
+_books = {}
+
+
+def open_book(path=BOOK_PATH):
+    """The PolyglotBook at path, or None if it is missing or not a book."""
+    book = _books.get(path)
+    if book is None:
+        try:
+            book = PolyglotBook(path)
+        except (OSError, ValueError):
+            book = False
+        _books[path] = book
+    return book or None
+
+
+def get_polyglot_move(gs, weighted=False, path=BOOK_PATH):
     """
-    Query polyglot book for best move
+    Query polyglot book for a move: the highest weight one, or with weighted
+    a random one in proportion to the weights
 
     Returns: Move object or None
     """
-    try:
-        # Convert your board to python-chess format
-        fen = gs.board_to_fen()
-        board = chess.Board(fen)
-
-        # Query the book
-        with chess.polyglot.open_reader(BOOK_PATH) as reader:
-            entries = list(reader.find_all(board))
-
-            if entries:
-                # Pick move with highest weight (most popular/best)
-                best_entry = max(entries, key=lambda e: e.weight)
-                uci_move = best_entry.move.uci()  # e.g., "e2e4"
-                # Convert to your Move object
-                return uci_to_move(uci_move, gs)
-
-    except Exception as e:
+    book = open_book(path)
+    if book is None:
         return None
-
-    return None
+    return book.choose(gs, weighted)
 
 
 def uci_to_move(uci_string, gs):
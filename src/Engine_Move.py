@@ -1,16 +1,51 @@
 import random
+import time
 import polyglot_book as p
+from src.bitbase import DRAW, KNOWN_WIN, bitbases
+from src.move_ordering import MoveOrderer
+from src.pst import MAX_PHASE, PIECE_VALUES
+from src.transposition import EXACT, LOWER, UPPER, TranspositionTable
 
 
 # I am further inspired to improve storage and search efficiency, from
 # the Sebastian League chess challenge.
 
 
-piece_value = {"k": 0, "q": 10, "r": 5, "b": 3.2, "n": 3, "p": 1}
+piece_value = PIECE_VALUES
 MATE = 1e5
 STALEMATE = 0
 
-TT = {}
+# Transposition table shared by every search; its size is a memory budget
+TT_SIZE_MB = 32
+TT = TranspositionTable(TT_SIZE_MB)
+
+
+def set_hash_size(size_mb):
+    """Resize (and clear) the transposition table."""
+    TT.resize(size_mb)
+
+# Killer moves and history scores, shared by every node of a search
+orderer = MoveOrderer()
+
+# One reusable move list per remaining depth, so minimax does not allocate a
+# fresh list at every node. Each depth is only live once on the current path.
+move_buffers = []
+
+
+def move_buffer(depth):
+    while len(move_buffers) <= depth:
+        move_buffers.append([])
+    return move_buffers[depth]
+
+
+# Quiescence nodes have no remaining depth, so their lists are kept per ply
+qmove_buffers = []
+
+
+def qmove_buffer(ply):
+    while len(qmove_buffers) <= ply:
+        qmove_buffers.append([])
+    return qmove_buffers[ply]
 
 
 # This function is called when there is no best move found
@@ -24,29 +59,246 @@ def find_random(valid_moves):
     return valid_moves[random.randint(0, len(valid_moves) - 1)]
 
 
-def find_best_move(gs, valid_moves, depth):
-    # This implementation of Transposition Table, I copy pasted this code from a repo
-    # I am yet to learn more about it
-    key = str(gs.board)
-    if key in TT and TT[key]["depth"] >= depth:
-        return TT[key]["score"]
+class SearchTimeout(Exception):
+    """Raised inside minimax when the time or node budget is used up."""
+
+
+class SearchLimits:
+    """
+    Wall-clock and node budget for one search; minimax counts nodes here.
+    cancel is an optional token with is_set() (e.g. threading.Event) that
+    stops the search from another thread.
+    """
+
+    def __init__(self, time_limit=None, node_limit=None, cancel=None):
+        self.start = time.perf_counter()
+        self.deadline = None if time_limit is None else self.start + time_limit
+        self.node_limit = node_limit
+        self.cancel = cancel
+        self.nodes = 0
+
+    def count_node(self):
+        self.nodes += 1
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            raise SearchTimeout
+        # Reading the clock costs more than a node check, so only every 256 nodes
+        if not self.nodes & 255:
+            if self.deadline is not None and time.perf_counter() >= self.deadline:
+                raise SearchTimeout
+            if self.cancel is not None and self.cancel.is_set():
+                raise SearchTimeout
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+
+class SearchStats:
+    """
+    What one search did: node counts, transposition table use, beta cutoffs
+    and, per completed iteration, cumulative nodes and time. Searches fill it
+    in as they go; SearchResult.stats refers to it, so on_iteration callbacks
+    see it mid-search.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.nodes = 0  # All nodes, quiescence included
+        self.qnodes = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_stores = 0
+        self.cutoffs = 0  # Beta cutoffs in the main search
+        self.first_move_cutoffs = 0  # ... by the first move searched
+        self.iterations = []  # (depth, nodes, seconds) at the end of each depth
+
+    def end_iteration(self, depth, nodes):
+        self.nodes = nodes
+        self.iterations.append((depth, nodes, self.elapsed()))
+
+    def merge(self, other):
+        """Add the counters of another search (e.g. a parallel worker's)."""
+        self.qnodes += other.qnodes
+        self.tt_probes += other.tt_probes
+        self.tt_hits += other.tt_hits
+        self.tt_stores += other.tt_stores
+        self.cutoffs += other.cutoffs
+        self.first_move_cutoffs += other.first_move_cutoffs
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    @property
+    def nps(self):
+        elapsed = self.elapsed() if not self.iterations else self.iterations[-1][2]
+        return self.nodes / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def tt_hit_rate(self):
+        return self.tt_hits / self.tt_probes if self.tt_probes else 0.0
+
+    @property
+    def first_move_cutoff_rate(self):
+        """Share of cutoffs made by the first move: how good the move ordering is."""
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    def depth_stats(self):
+        """
+        (depth, nodes, seconds, branching factor) for each completed depth,
+        counting that iteration alone; the branching factor is its nodes over
+        the previous iteration's (None for the first).
+        """
+        rows = []
+        prev_nodes = prev_time = 0
+        prev_iteration = None
+        for depth, nodes, seconds in self.iterations:
+            iteration = nodes - prev_nodes
+            ebf = iteration / prev_iteration if prev_iteration else None
+            rows.append((depth, iteration, seconds - prev_time, ebf))
+            prev_nodes, prev_time, prev_iteration = nodes, seconds, iteration
+        return rows
+
+    def as_dict(self):
+        """Flat summary for logs and monitoring."""
+        return {
+            "nodes": self.nodes,
+            "qnodes": self.qnodes,
+            "nps": round(self.nps),
+            "tt_probes": self.tt_probes,
+            "tt_hits": self.tt_hits,
+            "tt_hit_rate": self.tt_hit_rate,
+            "tt_stores": self.tt_stores,
+            "cutoffs": self.cutoffs,
+            "first_move_cutoff_rate": self.first_move_cutoff_rate,
+            "depths": [
+                {"depth": d, "nodes": n, "time": t, "ebf": ebf}
+                for d, n, t, ebf in self.depth_stats()
+            ],
+        }
+
+    def summary(self):
+        lines = [
+            f"nodes {self.nodes} (quiescence {self.qnodes})  nps {self.nps:.0f}",
+            f"tt probes {self.tt_probes}  hits {self.tt_hits} ({self.tt_hit_rate:.1%})"
+            f"  stores {self.tt_stores}",
+            f"cutoffs {self.cutoffs}  first move {self.first_move_cutoff_rate:.1%}",
+        ]
+        for depth, nodes, seconds, ebf in self.depth_stats():
+            ebf_text = f"{ebf:.2f}" if ebf is not None else "-"
+            lines.append(f"depth {depth}: {nodes} nodes  {seconds:.3f}s  ebf {ebf_text}")
+        return "\n".join(lines)
+
+
+class SearchResult:
+    """
+    Best move of a search with its score (white's point of view), depth, PV
+    and the SearchStats of the search.
+    """
+
+    def __init__(self, move=None, score=0, depth=0, pv=None, nodes=0, stats=None):
+        self.move = move
+        self.score = score
+        self.depth = depth
+        self.pv = pv if pv is not None else []
+        self.nodes = nodes
+        self.stats = stats
+
+    def pv_notation(self):
+        return " ".join(m.get_chess_notation() for m in self.pv)
+
+
+# Budget of the running search (None when not searching)
+limits = None
+# Counters of the current (or last) search
+stats = SearchStats()
+
+# Set when the root itself is in a bitbase: a won position is then searched
+# to the mate instead of being cut off with KNOWN_WIN
+root_in_bitbase = False
+
+# Principal variation collected per ply while searching
+MAX_PLY = 64
+pv_table = [[] for _ in range(MAX_PLY + 1)]
+
+
+def find_best_move(gs, valid_moves, depth, time_limit=None, node_limit=None):
+    """
+    Best move for the side to move, searching up to depth plies or until the
+    time/node budget runs out, whichever comes first.
+    """
+    result = search(gs, valid_moves, depth, time_limit, node_limit)
+    return result.move
+
+
+def search(
+    gs, valid_moves, depth, time_limit=None, node_limit=None, on_iteration=None, cancel=None
+):
+    """
+    Iterative deepening: search depth 1, 2, ... up to depth. The best move of
+    the last completed iteration is kept, so when the budget runs out (or
+    cancel is set) mid iteration there is always a move to return.
+    on_iteration, if given, is called with the SearchResult after every
+    completed depth.
+    """
+    global limits, root_in_bitbase, stats
 
     if depth == 0:
-        score = evaluate_board(gs)
-        TT[key] = {"score": score, "depth": depth}
-        return score
+        return SearchResult(score=evaluate_board(gs))
 
     if len(valid_moves) == 0:
-        return None
-    best_move = None
+        return SearchResult()
     if len(gs.move_log) < 20:
 
         # If found, convert to Move object
         book_move = p.get_polyglot_move(gs)
         if book_move:
-            return book_move
+            return SearchResult(book_move, pv=[book_move])
+
+    orderer.new_search()
+    TT.new_search()
+    # order a copy, the caller may still be using its list, with the move
+    # stored for this position (e.g. by an earlier search) first
+    key = gs.zobrist_key
+    entry = TT.probe(key)
+    root_moves = order_moves(gs, list(valid_moves), 0, entry[4] if entry else None)
+    root_len = len(gs.move_log)
+    limits = SearchLimits(time_limit, node_limit, cancel)
+    stats = SearchStats()
+    root_in_bitbase = bitbases.probe(gs) is not None
+    result = SearchResult(root_moves[0], stats=stats)
+
+    try:
+        for d in range(1, depth + 1):
+            partial = SearchResult(depth=d, stats=stats)
+            try:
+                search_root(gs, root_moves, d, partial)
+            except SearchTimeout:
+                # Unwind the moves minimax had made when it was interrupted
+                while len(gs.move_log) > root_len:
+                    gs.undo()
+                # The previous best is searched first, so a best move found in
+                # the unfinished iteration is at least as good
+                if partial.move is not None:
+                    result = partial
+                break
+            result = partial
+            result.nodes = limits.nodes
+            stats.end_iteration(d, limits.nodes)
+            TT.store(key, d, EXACT, score_to_tt(result.score, 0), result.move.move_id)
+            if on_iteration is not None:
+                on_iteration(result)
+            # A forced mate will not change with more depth
+            if abs(result.score) >= MATE - MAX_PLY:
+                break
+            # Search the best move first in the next iteration
+            order_moves(gs, root_moves, 0, result.move.move_id)
+    finally:
+        result.nodes = stats.nodes = limits.nodes
+        limits = None
+    return result
+
 
-    # set
+def search_root(gs, root_moves, depth, result):
+    """Search every root move to depth, recording improvements in result."""
     alpha = -float("inf")
     beta = float("inf")
 
@@ -54,103 +306,279 @@ def find_best_move(gs, valid_moves, depth):
     if gs.white_to_move:
         max_score = -float("inf")
         # check if move is in valid
-        for move in valid_moves:
+        for move in root_moves:
             gs.make_move(move)
-            # check for checkmate
-            if gs.checkmate:
-                gs.undo()
-                return move
             # Score this move using minimax
             # find scores and take the highest
-            score = minimax(gs, depth - 1, alpha, beta, False)
+            score = minimax(gs, depth - 1, alpha, beta, False, 1)
             gs.undo()
             # for the highest score play that move
             if score > max_score:
                 max_score = score
-                best_move = move
                 alpha = max(alpha, score)
+                result.move, result.score = move, score
+                result.pv = [move] + pv_table[1]
 
     # Black's turn - minimize
     else:
         min_score = float("inf")
 
-        for move in valid_moves:
+        for move in root_moves:
             gs.make_move(move)
 
-            if gs.checkmate:
-                gs.undo()
-                return move
-
             # Score this move using minimax
-            score = minimax(gs, depth - 1, alpha, beta, True)
+            score = minimax(gs, depth - 1, alpha, beta, True, 1)
             gs.undo()
             if score < min_score:
                 min_score = score
-                best_move = move
                 beta = min(beta, score)
-    return best_move
+                result.move, result.score = move, score
+                result.pv = [move] + pv_table[1]
 
 
 # MINIMAX SEARCH ALGO
-def minimax(gs, depth, alpha, beta, max_player):
+# ply counts moves from the root and indexes the killer slots
+def minimax(gs, depth, alpha, beta, max_player, ply=0):
+    if limits is not None:
+        limits.count_node()
+    pv_table[ply] = []
+
+    # Base case: depth 0, resolve the captures left hanging first
+    if depth == 0 or ply >= MAX_PLY:
+        return quiescence(gs, alpha, beta, max_player, ply)
+
+    # Endgame bitbases: draws are exact, wins are cut off unless the root is
+    # already in the same ending
+    outcome = bitbases.probe(gs)
+    if outcome == DRAW:
+        return STALEMATE
+    if outcome is not None and not root_in_bitbase:
+        sign = 1 if gs.white_to_move else -1
+        return sign * outcome * KNOWN_WIN + evaluate_board(gs)
+
+    # Transposition table: a deep enough entry may settle this node or narrow
+    # the window; its best move is searched first either way
+    alpha_orig, beta_orig = alpha, beta
+    key = gs.zobrist_key
+    tt_move_id = None
+    entry = TT.probe(key)
+    stats.tt_probes += 1
+    if entry is not None:
+        stats.tt_hits += 1
+        tt_move_id = entry[4]
+        if entry[1] >= depth:
+            score = score_from_tt(entry[3], ply)
+            if entry[2] == EXACT:
+                return score
+            if entry[2] == LOWER:
+                alpha = max(alpha, score)
+            else:
+                beta = min(beta, score)
+            if alpha >= beta:
+                return score
 
-    # Base case: depth 0
-    if depth == 0:
-        return evaluate_board(gs)
-    valid_moves = gs.get_valid_moves()
-    # Game over
+    valid_moves = gs.get_valid_moves(move_buffer(depth))
+    # Game over, nearer mates score higher
     if len(valid_moves) == 0:
         if gs.checkmate:
-            return -MATE if max_player else MATE
+            return -MATE + ply if max_player else MATE - ply
         return STALEMATE
 
     # Max if white is true
+    best_move_id = None
     if max_player:
         max_eval = -float("inf")
         # check for the move in valid moves
-        for move in order_moves(gs, valid_moves):
+        for i, move in enumerate(order_moves(gs, valid_moves, ply, tt_move_id)):
             gs.make_move(move)
             # switch player
-            eval_score = minimax(gs, depth - 1, alpha, beta, False)
+            eval_score = minimax(gs, depth - 1, alpha, beta, False, ply + 1)
             gs.undo()
             # get the max eval from 2 nodes
-            max_eval = max(max_eval, eval_score)
+            if eval_score > max_eval:
+                max_eval = eval_score
+                best_move_id = move.move_id
+                pv_table[ply] = [move] + pv_table[ply + 1]
             # set alpha
             alpha = max(alpha, eval_score)
-            # prune a node
+            # prune a node, remembering the move that refuted this line
             if beta <= alpha:
+                orderer.record_cutoff(move, ply, depth)
+                stats.cutoffs += 1
+                if i == 0:
+                    stats.first_move_cutoffs += 1
                 break
+        store_node(key, depth, max_eval, alpha_orig, beta_orig, best_move_id, ply)
         return max_eval
 
     # Min if white is false
     else:
         min_eval = float("inf")
         # search for moves in the order of captures, more revision is required
-        for move in order_moves(gs, valid_moves):
+        for i, move in enumerate(order_moves(gs, valid_moves, ply, tt_move_id)):
             gs.make_move(move)
             # switch player
-            eval_score = minimax(gs, depth - 1, alpha, beta, True)
+            eval_score = minimax(gs, depth - 1, alpha, beta, True, ply + 1)
             gs.undo()
             # get beta from the nodes
-            min_eval = min(min_eval, eval_score)
+            if eval_score < min_eval:
+                min_eval = eval_score
+                best_move_id = move.move_id
+                pv_table[ply] = [move] + pv_table[ply + 1]
             beta = min(beta, eval_score)
             # pruning the nodes
             if beta <= alpha:
+                orderer.record_cutoff(move, ply, depth)
+                stats.cutoffs += 1
+                if i == 0:
+                    stats.first_move_cutoffs += 1
                 break
+        store_node(key, depth, min_eval, alpha_orig, beta_orig, best_move_id, ply)
         return min_eval
 
 
-# This function checks if it's endgame
-def is_endgame(board):
-    # Count queens and major pieces
-    num_queens = sum(1 for row in board for p in row if p[1] == "q")
-    num_major = sum(1 for row in board for p in row if p[1] in ["q", "r"])
-    return num_queens == 0 or num_major <= 3
+# Captures worth less than this above alpha are not searched in quiescence
+DELTA_MARGIN = 2
+
+
+def quiescence(gs, alpha, beta, max_player, ply):
+    """
+    Search captures (and promotions) only until the position is quiet, so a
+    leaf is never scored in the middle of an exchange. The side to move may
+    stand pat on the static evaluation unless it is in check, in which case
+    every evasion is searched. Captures that lose material by SEE, or that
+    cannot bring the score back up to alpha, are skipped.
+    """
+    if limits is not None:
+        limits.count_node()
+    stats.qnodes += 1
+    pv_table[ply] = []
+    if ply >= MAX_PLY:
+        return evaluate_board(gs)
+
+    valid_moves = gs.get_valid_moves(qmove_buffer(ply))
+    if len(valid_moves) == 0:
+        if gs.checkmate:
+            return -MATE + ply if max_player else MATE - ply
+        return STALEMATE
+
+    in_check = gs.in_check
+    if in_check:
+        moves = valid_moves
+        best = -float("inf") if max_player else float("inf")
+    else:
+        stand_pat = evaluate_board(gs)
+        # Stand pat: the side to move can decline every capture
+        if max_player:
+            if stand_pat >= beta:
+                return stand_pat
+            alpha = max(alpha, stand_pat)
+        else:
+            if stand_pat <= alpha:
+                return stand_pat
+            beta = min(beta, stand_pat)
+        best = stand_pat
+        moves = []
+        for move in valid_moves:
+            if not (move.is_capture or move.is_pawn_promotion):
+                continue
+            if move.is_pawn_promotion and move.promotion_piece != "q":
+                continue
+            # Delta pruning: even winning the piece outright cannot reach alpha
+            gain = piece_value[move.piece_captured[1]] if move.piece_captured != "--" else 1
+            if move.is_pawn_promotion:
+                gain += piece_value["q"] - piece_value["p"]
+            if max_player:
+                if stand_pat + gain + DELTA_MARGIN <= alpha:
+                    continue
+            elif stand_pat - gain - DELTA_MARGIN >= beta:
+                continue
+            if gs.see(move) < 0:
+                continue
+            moves.append(move)
+
+    for move in order_moves(gs, moves, ply):
+        gs.make_move(move)
+        score = quiescence(gs, alpha, beta, not max_player, ply + 1)
+        gs.undo()
+        if max_player:
+            if score > best:
+                best = score
+                pv_table[ply] = [move] + pv_table[ply + 1]
+            alpha = max(alpha, score)
+        else:
+            if score < best:
+                best = score
+                pv_table[ply] = [move] + pv_table[ply + 1]
+            beta = min(beta, score)
+        if beta <= alpha:
+            break
+    return best
+
+
+def store_node(key, depth, score, alpha, beta, best_move_id, ply):
+    """Store a searched node with the bound its score represents."""
+    if score <= alpha:
+        flag = UPPER
+    elif score >= beta:
+        flag = LOWER
+    else:
+        flag = EXACT
+    TT.store(key, depth, flag, score_to_tt(score, ply), best_move_id)
+    stats.tt_stores += 1
+
+
+# Mate scores count plies from the root; in the table they are stored relative
+# to the node so they stay right when the position is reached at another ply
+def score_to_tt(score, ply):
+    if score >= MATE - MAX_PLY:
+        return score + ply
+    if score <= -MATE + MAX_PLY:
+        return score - ply
+    return score
+
+
+def score_from_tt(score, ply):
+    if score >= MATE - MAX_PLY:
+        return score - ply
+    if score <= -MATE + MAX_PLY:
+        return score + ply
+    return score
+
+
+# Below this phase a side that is ahead drives the other king to the edge
+MOPUP_PHASE = 6
+
+# Pawn structure weights in pawns: doubled, isolated and passed pawns
+PAWN_STRUCTURE = (-0.2, -0.15, 0.2)
+FILE_MASKS = [0x0101010101010101 << c for c in range(8)]
+ADJACENT_FILES = [
+    (FILE_MASKS[c - 1] if c > 0 else 0) | (FILE_MASKS[c + 1] if c < 7 else 0)
+    for c in range(8)
+]
+# Squares ahead of a pawn on its own and the adjacent files: white moves
+# towards row 0, black towards row 7
+PASSED_MASKS = {
+    "w": [
+        (FILE_MASKS[sq % 8] | ADJACENT_FILES[sq % 8]) & ((1 << (sq // 8 * 8)) - 1)
+        for sq in range(64)
+    ],
+    "b": [
+        (FILE_MASKS[sq % 8] | ADJACENT_FILES[sq % 8]) >> (sq // 8 * 8 + 8) << (sq // 8 * 8 + 8)
+        for sq in range(64)
+    ],
+}
+# Pawn structure scores by (white pawns, black pawns); the pawns change
+# far less often than the rest of the position
+PAWN_CACHE = {}
+PAWN_CACHE_SIZE = 1 << 16
 
 
 # We call all our other evaluation functions in this function.
+# Material and piece-square sums are kept up to date by GameState.make_move
+# and pawn structure is cached by the pawn masks, so this does not score the
+# whole board
 def evaluate_board(gs):
-    score = material_score(gs.board)
     if gs.checkmate:
         if gs.white_to_move:
             return -MATE
@@ -159,138 +587,71 @@ def evaluate_board(gs):
 
     if gs.stalemate:
         return STALEMATE
-    if is_endgame(gs.board):
-        score += evaluate_endgame(gs.board, gs)
-    else:
-        score += evaluate_position(gs.board)
-    # Calculate material + position
-    score += evaluate_position(gs.board)
+
+    # Blend middlegame and endgame tables by the remaining pieces
+    phase = min(gs.phase, MAX_PHASE)
+    score = gs.material + (
+        gs.pst_mg * phase + gs.pst_eg * (MAX_PHASE - phase)
+    ) / MAX_PHASE
+    score += pawn_structure_score(gs)
+    if phase <= MOPUP_PHASE and abs(gs.material) >= 3:
+        score += mopup_score(gs)
     return score
 
 
-# prioritise search as per order
-def order_moves(gs, moves):
-    # Prioritize captures and checks first
-    scored = []
-    for m in moves:
+def pawn_counts(pawns, enemy_pawns, color):
+    """Doubled, isolated and passed pawns of one side, from pawn masks."""
+    doubled = isolated = passed = 0
+    for c in range(8):
+        on_file = bin(pawns & FILE_MASKS[c]).count("1")
+        if on_file:
+            doubled += on_file - 1
+            if not pawns & ADJACENT_FILES[c]:
+                isolated += on_file
+    passed_masks = PASSED_MASKS[color]
+    while pawns:
+        bit = pawns & -pawns
+        if not enemy_pawns & passed_masks[bit.bit_length() - 1]:
+            passed += 1
+        pawns ^= bit
+    return doubled, isolated, passed
+
+
+def pawn_structure_score(gs):
+    """Doubled, isolated and passed pawn terms, cached by the pawn masks."""
+    key = gs.pawn_masks()
+    score = PAWN_CACHE.get(key)
+    if score is None:
+        white, black = key
         score = 0
-        #
-        if m.is_capture:
-            score += 10
-        if gs.square_under_att(m.end_r, m.end_c):
-            score += 5
-        scored.append((score, m))
-
-    # sort the moves as by captures and attacks, more revision is required
-    # such as counting the value of pieces defending
-    # and the value of pieces attacking.
-    scored.sort(reverse=True, key=lambda x: x[0])
-    return [m for _, m in scored]
-
-
-# a naive assessment of position
-# add score as per material
-def material_score(board):
-    score = 0
-    for row in board:
-        for s in row:
-            if s[0] == "w":
-                score += piece_value[s[1]]
-
-            # careful not to use else here since "--" also exists
-            elif s[0] == "b":
-                score -= piece_value[s[1]]
+        for weight, w, b in zip(
+            PAWN_STRUCTURE, pawn_counts(white, black, "w"), pawn_counts(black, white, "b")
+        ):
+            score += weight * (w - b)
+        if len(PAWN_CACHE) >= PAWN_CACHE_SIZE:
+            PAWN_CACHE.clear()
+        PAWN_CACHE[key] = score
     return score
 
 
-# evaluating the board by checking if pawn is in centre, piece is developed
-# better methods incled using Bit boards and PSTs(Piece Square Tables)
-def evaluate_position(board):
-    # check for centre control
-    score = 0
-    for r in range(8):
-        for c in range(8):
-            piece = board[r][c]
-
-            if piece[1] == "p":
-                if piece[0] == "w":
-                    # White pawns: r=7 is starting, r=0 is promotion
-                    # Reward pawns that move forward
-                    advancement = 7 - r  # incentive to go
-                    score += advancement * 0.03
-
-                else:  # Black pawn
-                    # Black pawns: r=0 is starting, r=7 is promotion
-                    advancement = r  # 0 at start, 7 near promotion
-                    score -= advancement * 0.05
-
-            # Center control bonus (e4, d4, e5, d5)
-            if piece != "--":
-                if 3 <= r <= 4 and 3 <= c <= 4:  # Center squares
-                    center_bonus = 0.21
-                    if piece[0] == "w":
-                        score += center_bonus
-                    else:
-                        score -= center_bonus
-
-    # check for piece development
-    for r in range(8):
-        for c in range(8):
-            piece = board[r][c]
-
-            if piece[1] in ["n", "b"]:
-                if piece[0] == "w":
-                    # White pawns: r=7 is starting, r=0 is promotion
-                    # Reward pawns that move forward
-                    advancement = 7 - r  # incentive to go
-                    score += advancement * 0.06
-
-                else:
-                    advancement = r  # 0 at start, 7 near promotion
-                    score -= advancement * 0.06
-            # reward centre control
-            if piece != "--":
-                if 3 <= r <= 4 and 3 <= c <= 4:  # Center squares
-                    center_bonus = 0.2
-                    if piece[0] == "w":
-                        score += center_bonus
-                    else:
-                        score -= center_bonus
-    return score
+def mopup_score(gs):
+    """
+    Endgame bonus for the side ahead in material: push the losing king
+    towards the edge and bring the kings together, so won endings like
+    KQK and KRK make progress.
+    """
+    if gs.material > 0:
+        strong, weak, sign = gs.w_king_loc, gs.b_king_loc, 1
+    else:
+        strong, weak, sign = gs.b_king_loc, gs.w_king_loc, -1
+    edge = abs(3.5 - weak[0]) + abs(3.5 - weak[1])
+    distance = abs(strong[0] - weak[0]) + abs(strong[1] - weak[1])
+    return sign * (0.1 * edge + 0.04 * (14 - distance))
 
 
-def count_pieces(board):
-    """Count total pieces"""
-    count = 0
-    for row in board:
-        for square in row:
-            if square != "--":
-                count += 1
-    return count
-
-
-# This function evaluates the position when the dynamics completely change
-# When there are less pieces and more space
-# This function like all others is still naive
-def evaluate_endgame(board, gs):
-    score = 0
-    white_king_pos = gs.w_king_loc
-    black_king_pos = gs.b_king_loc
-
-    # Reward central king activity in endgame
-    if white_king_pos:
-        wr, wc = white_king_pos
-        score += (3.5 - abs(3.5 - wr)) + (3.5 - abs(3.5 - wc))
-    if black_king_pos:
-        br, bc = black_king_pos
-        score -= (3.5 - abs(3.5 - br)) + (3.5 - abs(3.5 - bc))
-
-    # Penalize isolated pawns or doubled pawns
-    for c in range(8):
-        col_pawns = [board[r][c] for r in range(8) if board[r][c][1] == "p"]
-        if col_pawns.count("wp") > 1:
-            score -= 0.2
-        if col_pawns.count("bp") > 1:
-            score += 0.2
+# prioritise search as per order: TT move, MVV-LVA captures, killers, history
+# Scoring only looks at the moves themselves, nothing is generated here
+def order_moves(gs, moves, ply=0, tt_move_id=None):
+    # The list is sorted in place so the per-depth buffer is reused
+    return orderer.order(moves, ply, tt_move_id)
 
-    return score
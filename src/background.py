@@ -0,0 +1,157 @@
+"""
+Engine search in a background thread, so the pygame loop keeps drawing while
+the engine thinks.
+
+The UI calls start() when it is the engine's turn and poll() once per frame
+until a result comes back. After the engine moves, ponder() keeps searching
+the position after the reply the engine expects, filling the transposition
+table while the human thinks; if the human plays that reply the engine either
+answers at once or starts its real search with a warm table.
+"""
+
+import threading
+import time
+
+import polyglot_book as p
+from src.Engine_Move import SearchResult
+from src.search import searcher as default_searcher
+
+# Pondering has no time limit; it runs until cancelled or a mate is found
+PONDER_DEPTH = 64
+
+
+class SearchJob:
+    """
+    One search() call running in a daemon thread, with a cancel token (a new
+    threading.Event unless one is given). on_iteration is called from the
+    thread after every completed depth and on_done with the final SearchResult.
+    """
+
+    def __init__(
+        self,
+        searcher,
+        gs,
+        depth,
+        time_limit=None,
+        node_limit=None,
+        on_iteration=None,
+        on_done=None,
+        cancel=None,
+    ):
+        self.key = gs.zobrist_key
+        self.cancel = cancel if cancel is not None else threading.Event()
+        self.result = None  # Final SearchResult, once the thread has finished
+        self.latest = None  # Last completed iteration
+        self.on_iteration = on_iteration
+        self.on_done = on_done
+        self.start = time.perf_counter()
+        self.thread = threading.Thread(
+            target=self._run, args=(searcher, gs, depth, time_limit, node_limit), daemon=True
+        )
+        self.thread.start()
+
+    def _run(self, searcher, gs, depth, time_limit, node_limit):
+        self.result = searcher.search(
+            gs,
+            gs.get_valid_moves(),
+            depth,
+            time_limit,
+            node_limit,
+            on_iteration=self._iteration,
+            cancel=self.cancel,
+        )
+        if self.on_done is not None:
+            self.on_done(self.result)
+
+    def _iteration(self, result):
+        self.latest = result
+        if self.on_iteration is not None:
+            self.on_iteration(result)
+
+    def done(self):
+        return not self.thread.is_alive()
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def stop(self):
+        """Cancel the search and wait for the thread; returns its result."""
+        self.cancel.set()
+        self.thread.join()
+        return self.result
+
+
+class BackgroundEngine:
+    """Non-blocking front end to a Searcher for the game loop."""
+
+    def __init__(self, searcher=None, depth=64, think_time=2.0, use_book=True):
+        self.searcher = searcher if searcher is not None else default_searcher
+        self.depth = depth
+        self.think_time = think_time
+        self.use_book = use_book
+        self.job = None
+        self.pondering = False
+        self.ready = None  # Result available without searching (book, ponder hit)
+
+    @property
+    def thinking(self):
+        """True from start() until poll() has handed back the result."""
+        return self.ready is not None or (self.job is not None and not self.pondering)
+
+    def start(self, gs):
+        """Begin searching gs, the position with the engine to move."""
+        if self.pondering:
+            job, self.job, self.pondering = self.job, None, False
+            if job.key == gs.zobrist_key:
+                # Ponder hit: the human played the expected reply
+                if job.elapsed() >= self.think_time and job.latest is not None:
+                    job.stop()
+                    self.ready = job.latest
+                    return
+                spent = job.elapsed()
+                job.stop()
+                self._search(gs, max(0.05, self.think_time - spent))
+                return
+            job.stop()
+
+        if self.use_book and len(gs.move_log) < 20:
+            book_move = p.get_polyglot_move(gs)
+            if book_move:
+                self.ready = SearchResult(book_move, pv=[book_move])
+                return
+        self._search(gs, self.think_time)
+
+    def _search(self, gs, time_limit):
+        # The search runs on a copy, so the UI can keep using gs
+        self.job = SearchJob(self.searcher, gs.copy(), self.depth, time_limit)
+
+    def poll(self):
+        """SearchResult once the search has finished, otherwise None."""
+        if self.ready is not None:
+            result, self.ready = self.ready, None
+            return result
+        if self.job is None or self.pondering or not self.job.done():
+            return None
+        result, self.job = self.job.result, None
+        return result
+
+    def ponder(self, gs, result):
+        """
+        Search the position after the reply predicted by result's PV while the
+        other side thinks. Does nothing without a predicted reply.
+        """
+        self.stop()
+        if result is None or len(result.pv) < 2:
+            return
+        position = gs.copy()
+        position.make_move(result.pv[1])
+        self.job = SearchJob(self.searcher, position, PONDER_DEPTH)
+        self.pondering = True
+
+    def stop(self):
+        """Cancel any running search or ponder."""
+        if self.job is not None:
+            self.job.stop()
+        self.job = None
+        self.pondering = False
+        self.ready = None
@@ -0,0 +1,206 @@
+"""
+Vectorised evaluation of many positions at once with NumPy.
+
+Positions are encoded as an N x 12 x 64 tensor of piece planes (one plane per
+piece in PLANE_PIECES, squares as r * 8 + c like GameState.board), and the
+terms of Engine_Move.evaluate_board are computed for the whole batch with
+array operations: material, middlegame/endgame piece-square tables tapered by
+the phase, pawn structure from pawn_features() and the mop-up term. numpy is
+only needed by this module:
+
+    python -m src.batch_eval --positions 20000
+"""
+
+import argparse
+import random
+import time
+
+try:
+    import numpy as np
+except ImportError:  # The engine itself does not need numpy
+    np = None
+
+from src.Engine_Move import MOPUP_PHASE, PAWN_STRUCTURE, evaluate_board
+from src.chess_engine import FEN_PIECES, GameState
+from src.pst import MATERIAL, MAX_PHASE, PHASE, PST_EG, PST_MG
+
+PLANE_PIECES = [color + piece for color in "wb" for piece in "pnbrqk"]
+PLANE_INDEX = {piece: i for i, piece in enumerate(PLANE_PIECES)}
+WHITE_KING = PLANE_INDEX["wk"]
+BLACK_KING = PLANE_INDEX["bk"]
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("batch evaluation needs numpy (pip install numpy)")
+
+
+def _tables():
+    """Per-plane weights as arrays: material, phase, PST middlegame/endgame."""
+    material = np.array([MATERIAL[p] for p in PLANE_PIECES], dtype=np.float64)
+    phase = np.array([PHASE[p] for p in PLANE_PIECES], dtype=np.float64)
+    mg = np.array([PST_MG[p] for p in PLANE_PIECES], dtype=np.float64)
+    eg = np.array([PST_EG[p] for p in PLANE_PIECES], dtype=np.float64)
+    return material, phase, mg, eg
+
+
+def encode_states(states):
+    """N x 12 x 64 uint8 planes for a sequence of GameStates."""
+    _require_numpy()
+    planes = np.zeros((len(states), 12, 64), dtype=np.uint8)
+    for n, gs in enumerate(states):
+        for r, row in enumerate(gs.board):
+            for c, piece in enumerate(row):
+                if piece != "--":
+                    planes[n, PLANE_INDEX[piece], r * 8 + c] = 1
+    return planes
+
+
+def encode_fens(fens):
+    """N x 12 x 64 uint8 planes straight from FEN strings, without a GameState."""
+    _require_numpy()
+    planes = np.zeros((len(fens), 12, 64), dtype=np.uint8)
+    for n, fen in enumerate(fens):
+        sq = 0
+        for ch in fen.split(None, 1)[0]:
+            if ch == "/":
+                continue
+            if ch.isdigit():
+                sq += int(ch)
+            else:
+                planes[n, PLANE_INDEX[FEN_PIECES[ch]], sq] = 1
+                sq += 1
+    return planes
+
+
+def evaluate_planes(planes):
+    """
+    evaluate_board for every position of an N x 12 x 64 plane tensor, as a
+    float64 array (pawns, white's point of view). Checkmate and stalemate
+    need move generation and are not detected.
+    """
+    _require_numpy()
+    material_w, phase_w, mg_w, eg_w = _tables()
+    planes = planes.astype(np.float64, copy=False)
+    counts = planes.sum(axis=2)
+    material = counts @ material_w
+    phase = np.minimum(counts @ phase_w, MAX_PHASE)
+    mg = np.einsum("nps,ps->n", planes, mg_w)
+    eg = np.einsum("nps,ps->n", planes, eg_w)
+    score = material + (mg * phase + eg * (MAX_PHASE - phase)) / MAX_PHASE
+    features = pawn_features(planes)
+    score += (features[:, 0] - features[:, 1]) @ np.array(PAWN_STRUCTURE)
+
+    mopup = (phase <= MOPUP_PHASE) & (np.abs(material) >= 3)
+    if mopup.any():
+        score += np.where(mopup, mopup_planes(planes, material), 0.0)
+    return score
+
+
+def mopup_planes(planes, material):
+    """Engine_Move.mopup_score for every position (positions need both kings)."""
+    white_king = planes[:, WHITE_KING].argmax(axis=1)
+    black_king = planes[:, BLACK_KING].argmax(axis=1)
+    ahead = material > 0
+    strong = np.where(ahead, white_king, black_king)
+    weak = np.where(ahead, black_king, white_king)
+    sign = np.where(ahead, 1.0, -1.0)
+    weak_r, weak_c = weak // 8, weak % 8
+    edge = np.abs(3.5 - weak_r) + np.abs(3.5 - weak_c)
+    distance = np.abs(strong // 8 - weak_r) + np.abs(strong % 8 - weak_c)
+    return sign * (0.1 * edge + 0.04 * (14 - distance))
+
+
+def pawn_features(planes):
+    """
+    Pawn structure counts per position as an N x 2 x 3 int array: for white
+    then black, the number of doubled, isolated and passed pawns, as counted
+    by Engine_Move.pawn_counts. evaluate_planes weighs them by PAWN_STRUCTURE.
+    """
+    _require_numpy()
+    n = len(planes)
+    boards = planes.reshape(n, 12, 8, 8).astype(bool)
+    white = boards[:, PLANE_INDEX["wp"]]
+    black = boards[:, PLANE_INDEX["bp"]]
+    features = np.zeros((n, 2, 3), dtype=np.int64)
+    for side, (own, other) in enumerate(((white, black), (black, white))):
+        files = own.sum(axis=1)
+        features[:, side, 0] = np.maximum(files - 1, 0).sum(axis=1)
+        occupied = files > 0
+        neighbours = np.zeros_like(occupied)
+        neighbours[:, 1:] |= occupied[:, :-1]
+        neighbours[:, :-1] |= occupied[:, 1:]
+        features[:, side, 1] = (files * ~neighbours).sum(axis=1)
+
+        # Rows ahead of each square (white moves towards row 0): an enemy
+        # pawn there on the same or an adjacent file stops a passer
+        if side == 0:
+            ahead = np.logical_or.accumulate(other, axis=1)
+            ahead = np.concatenate([np.zeros_like(ahead[:, :1]), ahead[:, :-1]], axis=1)
+        else:
+            ahead = np.logical_or.accumulate(other[:, ::-1], axis=1)[:, ::-1]
+            ahead = np.concatenate([ahead[:, 1:], np.zeros_like(ahead[:, :1])], axis=1)
+        blocked = ahead.copy()
+        blocked[:, :, 1:] |= ahead[:, :, :-1]
+        blocked[:, :, :-1] |= ahead[:, :, 1:]
+        features[:, side, 2] = (own & ~blocked).sum(axis=(1, 2))
+    return features
+
+
+def evaluate_batch(positions):
+    """evaluate_planes for a list of GameStates or FEN strings."""
+    if positions and isinstance(positions[0], str):
+        return evaluate_planes(encode_fens(positions))
+    return evaluate_planes(encode_states(positions))
+
+
+def random_positions(count, seed=0, max_plies=120):
+    """count GameStates reached by random play from the start, for benchmarks."""
+    rng = random.Random(seed)
+    states = []
+    while len(states) < count:
+        gs = GameState()
+        for _ in range(rng.randrange(max_plies)):
+            moves = gs.get_valid_moves()
+            if not moves:
+                break
+            gs.make_move(rng.choice(moves))
+        if not (gs.checkmate or gs.stalemate):
+            states.append(gs)
+    return states
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch evaluation speed and agreement")
+    parser.add_argument("--positions", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    states = random_positions(args.positions, args.seed)
+    fens = [gs.board_to_fen() for gs in states]
+
+    start = time.perf_counter()
+    expected = [evaluate_board(gs) for gs in states]
+    scalar_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fresh = [evaluate_board(GameState.from_fen(fen)) for fen in fens]
+    from_fen_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    planes = encode_fens(fens)
+    encode_time = time.perf_counter() - start
+    start = time.perf_counter()
+    scores = evaluate_planes(planes)
+    batch_time = time.perf_counter() - start
+
+    error = np.abs(scores - np.array(expected)).max()
+    assert np.allclose(expected, fresh)
+    print(f"{len(states)} positions, max difference from evaluate_board {error:.2e}")
+    print(f"evaluate_board on existing states: {scalar_time:.3f}s")
+    print(f"evaluate_board from FEN:           {from_fen_time:.3f}s")
+    print(f"batch: encode {encode_time:.3f}s + evaluate {batch_time:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
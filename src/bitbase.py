@@ -0,0 +1,320 @@
+"""
+Win/draw bitbases for king and queen, rook or pawn against a lone king,
+generated by retrograde analysis and cached on disk.
+
+Positions are indexed with the stronger side as white:
+
+    index = side_to_move << 18 | white_king << 12 | black_king << 6 | piece
+
+(squares as r * 8 + c, side_to_move 1 for black). A table holds one bit per
+index, set when white wins with best play, so it is 64 KB. Generation starts
+from the checkmates (and, for KPK, the winning promotions, looked up in the
+KQK and KRK tables) and walks moves backwards, so every position is settled
+once. Tables are written under bitbases/ and memory-mapped from then on:
+
+    python -m src.bitbase            # generate what is missing and print stats
+"""
+
+import argparse
+import mmap
+import os
+import time
+
+SIGNATURES = ("kqk", "krk", "kpk")  # Generation order: KPK promotes into the others
+TABLE_POSITIONS = 1 << 19
+TABLE_BYTES = TABLE_POSITIONS // 8
+BLACK_TO_MOVE = 1 << 18
+
+BITBASE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bitbases"
+)
+
+# Probe results, from the side to move's point of view
+WIN, DRAW, LOSS = 1, 0, -1
+
+# Search score for a won bitbase position, above any evaluation and below mates
+KNOWN_WIN = 1000
+
+# Material (PIECE_VALUES) and phase weight of the extra piece of each signature
+SIGNATURE_MATERIAL = {"kqk": (10, 4), "krk": (5, 2), "kpk": (1, 0)}
+
+ROOK_DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+BISHOP_DIRECTIONS = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+
+
+def _rays(sq, directions):
+    rays = []
+    r0, c0 = divmod(sq, 8)
+    for dr, dc in directions:
+        ray = []
+        r, c = r0 + dr, c0 + dc
+        while 0 <= r < 8 and 0 <= c < 8:
+            ray.append(r * 8 + c)
+            r, c = r + dr, c + dc
+        rays.append(ray)
+    return rays
+
+
+KING_MOVES = [
+    [
+        (r + dr) * 8 + c + dc
+        for dr in (-1, 0, 1)
+        for dc in (-1, 0, 1)
+        if (dr or dc) and 0 <= r + dr < 8 and 0 <= c + dc < 8
+    ]
+    for r, c in (divmod(sq, 8) for sq in range(64))
+]
+# ADJACENT[a * 64 + b]: the squares are the same or touch (kings may not)
+ADJACENT = bytearray(
+    max(abs(a // 8 - b // 8), abs(a % 8 - b % 8)) <= 1 for a in range(64) for b in range(64)
+)
+
+SLIDER_RAYS = {
+    "q": [_rays(sq, ROOK_DIRECTIONS + BISHOP_DIRECTIONS) for sq in range(64)],
+    "r": [_rays(sq, ROOK_DIRECTIONS) for sq in range(64)],
+}
+
+# LINE[kind][a * 64 + b]: a piece on a attacks b on an empty board;
+# BETWEEN[a * 64 + b]: bitmask of the squares strictly between them
+LINE = {kind: bytearray(4096) for kind in ("q", "r", "p")}
+BETWEEN = [0] * 4096
+for _sq in range(64):
+    for _kind, _all_rays in SLIDER_RAYS.items():
+        for _ray in _all_rays[_sq]:
+            _mask = 0
+            for _target in _ray:
+                LINE[_kind][_sq * 64 + _target] = 1
+                BETWEEN[_sq * 64 + _target] = _mask
+                _mask |= 1 << _target
+    # White pawns move towards row 0
+    _r, _c = divmod(_sq, 8)
+    for _dc in (-1, 1):
+        if _r > 0 and 0 <= _c + _dc < 8:
+            LINE["p"][_sq * 64 + (_r - 1) * 8 + _c + _dc] = 1
+
+
+def attacks(kind, piece, target, blocker):
+    """A white piece of kind on piece attacks target, with one blocker on the board."""
+    line = piece * 64 + target
+    return LINE[kind][line] and not BETWEEN[line] >> blocker & 1
+
+
+def generate(kind, promotions=None):
+    """
+    Bitbase for K + kind ('q', 'r' or 'p') against K, as a bytearray of
+    TABLE_BYTES. promotions maps 'q' and 'r' to the KQK and KRK tables and
+    is needed for 'p'.
+    """
+    win = bytearray(TABLE_POSITIONS)
+    legal = bytearray(TABLE_POSITIONS)
+    # Black moves of each black-to-move position not yet known to lose
+    remaining = bytearray(TABLE_POSITIONS)
+    stack = []
+
+    for wk in range(64):
+        for bk in range(64):
+            if ADJACENT[wk * 64 + bk]:
+                continue
+            for p in range(64):
+                if p == wk or p == bk or (kind == "p" and not 8 <= p < 56):
+                    continue
+                w = wk << 12 | bk << 6 | p
+                b = BLACK_TO_MOVE | w
+                legal[b] = 1
+                moves = 0
+                for t in KING_MOVES[bk]:
+                    if ADJACENT[t * 64 + wk]:
+                        continue
+                    # Taking the piece (undefended, as t is not next to wk) draws
+                    if t == p or not attacks(kind, p, t, wk):
+                        moves += 1
+                remaining[b] = moves
+                check = attacks(kind, p, bk, wk)
+                if moves == 0 and check:
+                    win[b] = 1
+                    stack.append(b)
+                if check:
+                    continue  # Black in check with white to move: illegal
+                legal[w] = 1
+                if kind == "p" and p < 16 and p - 8 != wk and p - 8 != bk:
+                    promoted = BLACK_TO_MOVE | wk << 12 | bk << 6 | (p - 8)
+                    if any(probe_table(table, promoted) for table in promotions.values()):
+                        win[w] = 1
+                        stack.append(w)
+
+    rays = SLIDER_RAYS.get(kind)
+    while stack:
+        index = stack.pop()
+        wk, bk, p = index >> 12 & 63, index >> 6 & 63, index & 63
+        if index & BLACK_TO_MOVE:
+            # White moved into this lost position: that position is won
+            for t in KING_MOVES[wk]:
+                if t == p or ADJACENT[t * 64 + bk]:
+                    continue
+                w = t << 12 | bk << 6 | p
+                if legal[w] and not win[w]:
+                    win[w] = 1
+                    stack.append(w)
+            if rays is not None:
+                origins = []
+                for ray in rays[p]:
+                    for t in ray:
+                        if t == wk or t == bk:
+                            break
+                        origins.append(t)
+            else:
+                origins = []
+                if p + 8 < 56 and p + 8 != wk and p + 8 != bk:
+                    origins.append(p + 8)
+                    if 32 <= p < 40 and p + 16 != wk and p + 16 != bk:
+                        origins.append(p + 16)
+            for t in origins:
+                w = wk << 12 | bk << 6 | t
+                if legal[w] and not win[w]:
+                    win[w] = 1
+                    stack.append(w)
+        else:
+            # Black moved into this lost position: one escape fewer
+            for t in KING_MOVES[bk]:
+                if t == p or ADJACENT[t * 64 + wk]:
+                    continue
+                b = BLACK_TO_MOVE | wk << 12 | t << 6 | p
+                if legal[b] and not win[b]:
+                    remaining[b] -= 1
+                    if remaining[b] == 0:
+                        win[b] = 1
+                        stack.append(b)
+
+    bits = bytearray(TABLE_BYTES)
+    for index in range(TABLE_POSITIONS):
+        if win[index]:
+            bits[index >> 3] |= 1 << (index & 7)
+    return bits
+
+
+def probe_table(table, index):
+    return table[index >> 3] >> (index & 7) & 1
+
+
+class Bitbases:
+    """
+    The bitbases in directory, memory-mapped by load(). probe() answers
+    None until then, and for any other material.
+    """
+
+    def __init__(self, directory=BITBASE_DIR):
+        self.directory = directory
+        self.tables = {}
+
+    def path(self, signature):
+        return os.path.join(self.directory, signature + ".bin")
+
+    def load(self, generate_missing=True):
+        """
+        Map every table, generating and saving missing ones first unless
+        generate_missing is False. Returns the loaded signatures.
+        """
+        for signature in SIGNATURES:
+            if signature in self.tables:
+                continue
+            path = self.path(signature)
+            if not self._valid(path):
+                if not generate_missing:
+                    continue
+                promotions = {"q": self.tables.get("kqk"), "r": self.tables.get("krk")}
+                if signature == "kpk" and None in promotions.values():
+                    continue
+                self._save(path, generate(signature[1], promotions))
+            with open(path, "rb") as f:
+                self.tables[signature] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return list(self.tables)
+
+    @staticmethod
+    def _valid(path):
+        return os.path.exists(path) and os.path.getsize(path) == TABLE_BYTES
+
+    def _save(self, path, table):
+        # Write to a temporary name first, so a concurrent load never maps a
+        # half-written table
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(table)
+        os.replace(tmp, path)
+
+    def close(self):
+        for table in self.tables.values():
+            table.close()
+        self.tables = {}
+
+    def signature(self, gs):
+        """'kqk', 'krk' or 'kpk' if gs has one of the tabled materials, else None."""
+        material = abs(gs.material)
+        for signature, (value, phase) in SIGNATURE_MATERIAL.items():
+            if gs.phase == phase and abs(material - value) < 1e-6:
+                break
+        else:
+            return None
+        pieces = 0
+        for row in gs.board:
+            for piece in row:
+                if piece != "--":
+                    pieces += 1
+        return signature if pieces == 3 and signature in self.tables else None
+
+    def probe(self, gs):
+        """WIN, DRAW or LOSS for the side to move in gs, or None if not tabled."""
+        signature = self.signature(gs)
+        if signature is None:
+            return None
+        strong = "w" if gs.material > 0 else "b"
+        wk = bk = p = 0
+        for r, row in enumerate(gs.board):
+            for c, piece in enumerate(row):
+                if piece == "--":
+                    continue
+                # Black as the stronger side: mirror the ranks and swap colours
+                sq = r * 8 + c if strong == "w" else (7 - r) * 8 + c
+                if piece[1] != "k":
+                    p = sq
+                elif piece[0] == strong:
+                    wk = sq
+                else:
+                    bk = sq
+        strong_to_move = gs.white_to_move == (strong == "w")
+        index = wk << 12 | bk << 6 | p
+        if not strong_to_move:
+            index |= BLACK_TO_MOVE
+        if not probe_table(self.tables[signature], index):
+            return DRAW
+        return WIN if strong_to_move else LOSS
+
+
+# Shared by the searches; empty until load() is called
+bitbases = Bitbases()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate and check the endgame bitbases")
+    parser.add_argument("--dir", default=BITBASE_DIR, help="where the tables are kept")
+    parser.add_argument("--regenerate", action="store_true", help="rebuild existing tables")
+    args = parser.parse_args()
+
+    bb = Bitbases(args.dir)
+    if args.regenerate:
+        for signature in SIGNATURES:
+            if os.path.exists(bb.path(signature)):
+                os.remove(bb.path(signature))
+    start = time.perf_counter()
+    bb.load()
+    print(f"loaded {', '.join(bb.tables)} in {time.perf_counter() - start:.1f}s")
+    for signature, table in bb.tables.items():
+        wins = [0, 0]
+        for index in range(TABLE_POSITIONS):
+            if probe_table(table, index):
+                wins[index >> 18] += 1
+        print(f"{signature}: {wins[0]} wins with white to move, {wins[1]} with black to move")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,778 @@
+"""
+Bitboard backend for GameState.
+
+Squares are numbered sq = row * 8 + col, the same layout as GameState.board,
+so a8 is bit 0 and h1 is bit 63. Converting between the two representations
+is then just divmod(sq, 8).
+"""
+
+import functools
+import operator
+
+from src.chess_engine import (
+    FLAG_CASTLE,
+    FLAG_ENPASSANT,
+    FLAG_PROMOTION,
+    PROMOTION_CODES,
+    PROMOTION_PIECES,
+    PROMOTION_SHIFT,
+    ZOBRIST_BLACK_TO_MOVE,
+    ZOBRIST_CASTLING,
+    ZOBRIST_ENPASSANT,
+    ZOBRIST_PIECES,
+    Castle_R,
+    GameState,
+    Move,
+)
+from src.pst import MATERIAL, PHASE, PST_EG, PST_MG
+
+
+FULL = (1 << 64) - 1
+
+# Direction deltas as (d_row, d_col); positive directions move towards h1
+# (increasing square index), negative ones towards a8.
+POSITIVE_DIRECTIONS = [(1, 0), (0, 1), (1, 1), (1, -1)]
+NEGATIVE_DIRECTIONS = [(-1, 0), (0, -1), (-1, -1), (-1, 1)]
+
+PIECES = ["wp", "wn", "wb", "wr", "wq", "wk", "bp", "bn", "bb", "br", "bq", "bk"]
+
+
+def _on_board(r, c):
+    return 0 <= r < 8 and 0 <= c < 8
+
+
+def _leaper_table(offsets):
+    """Attack sets for a piece that jumps by fixed offsets (knight, king)."""
+    table = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        mask = 0
+        for dr, dc in offsets:
+            if _on_board(r + dr, c + dc):
+                mask |= 1 << ((r + dr) * 8 + c + dc)
+        table.append(mask)
+    return table
+
+
+def _ray_table(dr, dc):
+    """Squares reachable from each square along one direction on an empty board."""
+    table = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        mask = 0
+        r, c = r + dr, c + dc
+        while _on_board(r, c):
+            mask |= 1 << (r * 8 + c)
+            r, c = r + dr, c + dc
+        table.append(mask)
+    return table
+
+
+KNIGHT_ATTACKS = _leaper_table(
+    [(-1, -2), (2, 1), (2, -1), (-2, 1), (-1, 2), (1, 2), (-2, -1), (1, -2)]
+)
+KING_ATTACKS = _leaper_table(
+    [(-1, -1), (1, 1), (1, -1), (-1, 1), (-1, 0), (1, 0), (0, -1), (0, 1)]
+)
+# Squares attacked by a pawn of the given colour standing on sq
+PAWN_ATTACKS = {
+    "w": _leaper_table([(-1, -1), (-1, 1)]),
+    "b": _leaper_table([(1, -1), (1, 1)]),
+}
+RAYS = {d: _ray_table(*d) for d in POSITIVE_DIRECTIONS + NEGATIVE_DIRECTIONS}
+RAY_N, RAY_S = RAYS[(-1, 0)], RAYS[(1, 0)]
+RAY_W, RAY_E = RAYS[(0, -1)], RAYS[(0, 1)]
+RAY_NW, RAY_NE = RAYS[(-1, -1)], RAYS[(-1, 1)]
+RAY_SW, RAY_SE = RAYS[(1, -1)], RAYS[(1, 1)]
+
+# Empty-board lines, used to skip slider lookups that cannot hit anything
+ROOK_LINES = [RAY_N[sq] | RAY_S[sq] | RAY_W[sq] | RAY_E[sq] for sq in range(64)]
+BISHOP_LINES = [RAY_NW[sq] | RAY_NE[sq] | RAY_SW[sq] | RAY_SE[sq] for sq in range(64)]
+
+ROW_MASKS = [0xFF << (8 * r) for r in range(8)]
+
+
+def _between_table():
+    """BETWEEN[a][b]: squares strictly between a and b if they share a line."""
+    table = [[0] * 64 for _ in range(64)]
+    for sq in range(64):
+        for dr, dc in POSITIVE_DIRECTIONS + NEGATIVE_DIRECTIONS:
+            r, c = divmod(sq, 8)
+            between = 0
+            r, c = r + dr, c + dc
+            while _on_board(r, c):
+                table[sq][r * 8 + c] = between
+                between |= 1 << (r * 8 + c)
+                r, c = r + dr, c + dc
+    return table
+
+
+BETWEEN = _between_table()
+
+
+# Classical ray attacks: each ray is cut at its first blocker, which is the
+# lowest set bit for rays running towards h1 and the highest for rays towards a8.
+def rook_attacks(sq, occupied):
+    ray = RAY_S[sq]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= RAY_S[(blockers & -blockers).bit_length() - 1]
+    attacks = ray
+    ray = RAY_E[sq]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= RAY_E[(blockers & -blockers).bit_length() - 1]
+    attacks |= ray
+    ray = RAY_N[sq]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= RAY_N[blockers.bit_length() - 1]
+    attacks |= ray
+    ray = RAY_W[sq]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= RAY_W[blockers.bit_length() - 1]
+    return attacks | ray
+
+
+def bishop_attacks(sq, occupied):
+    ray = RAY_SE[sq]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= RAY_SE[(blockers & -blockers).bit_length() - 1]
+    attacks = ray
+    ray = RAY_SW[sq]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= RAY_SW[(blockers & -blockers).bit_length() - 1]
+    attacks |= ray
+    ray = RAY_NW[sq]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= RAY_NW[blockers.bit_length() - 1]
+    attacks |= ray
+    ray = RAY_NE[sq]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= RAY_NE[blockers.bit_length() - 1]
+    return attacks | ray
+
+
+def iter_bits(bb):
+    """Yield the square index of every set bit, lowest first."""
+    while bb:
+        lsb = bb & -bb
+        yield lsb.bit_length() - 1
+        bb ^= lsb
+
+
+def _line_table():
+    """LINE[a][b]: the whole line through a and b (both included) if they share one."""
+    table = [[0] * 64 for _ in range(64)]
+    for sq in range(64):
+        for forward, backward in zip(POSITIVE_DIRECTIONS, NEGATIVE_DIRECTIONS):
+            rays = RAYS[forward][sq] | RAYS[backward][sq]
+            line = rays | 1 << sq
+            for target in iter_bits(rays):
+                table[sq][target] = line
+    return table
+
+
+LINE = _line_table()
+
+# Castling rights as a bitmask: 1 = white kingside, 2 = white queenside,
+# 4 = black kingside, 8 = black queenside (the order of ZOBRIST_CASTLING)
+CASTLING_KEYS = [
+    functools.reduce(
+        operator.xor, (ZOBRIST_CASTLING[i] for i in range(4) if rights >> i & 1), 0
+    )
+    for rights in range(16)
+]
+# Rights kept when a move starts or ends on a square: king and rook squares
+# clear the rights that depend on them
+CASTLING_KEEP = [15] * 64
+CASTLING_KEEP[60] = 15 & ~3  # e1
+CASTLING_KEEP[63] = 15 & ~1  # h1
+CASTLING_KEEP[56] = 15 & ~2  # a1
+CASTLING_KEEP[4] = 15 & ~12  # e8
+CASTLING_KEEP[7] = 15 & ~4  # h8
+CASTLING_KEEP[0] = 15 & ~8  # a8
+
+# Move objects only depend on their squares, flags and the pieces moved and
+# captured, so each is built once and shared by every position that has it.
+# The cache key is the move_id with the moved and captured pieces on top.
+MOVE_CACHE = {}
+MOVED_KEYS = {piece: i << 18 for i, piece in enumerate(PIECES)}
+CAPTURED_KEYS = {piece: i << 22 for i, piece in enumerate(PIECES)}
+CAPTURED_KEYS["--"] = len(PIECES) << 22
+PROMOTION_KEYS = [
+    (piece, FLAG_PROMOTION | PROMOTION_CODES[piece] << PROMOTION_SHIFT)
+    for piece in PROMOTION_PIECES
+]
+COLOR_PIECES = {color: [color + piece for piece in "pnbrqk"] for color in "wb"}
+
+
+class BitboardGameState(GameState):
+    """
+    GameState whose bitboards are the authoritative position: make_move/undo
+    update them, the 8x8 board (kept for Move construction, SEE and
+    evaluation), the hash and the evaluation terms directly from the move,
+    with one undo record per move. Legal moves are generated straight from
+    the bitboards with check and pin masks, and castling rights are a
+    bitmask behind the is_possible_castling property.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.history = []  # One undo record per move in move_log
+        self.load_bitboards()
+
+    @property
+    def is_possible_castling(self):
+        rights = self.castling_rights
+        return Castle_R(bool(rights & 1), bool(rights & 2), bool(rights & 4), bool(rights & 8))
+
+    @is_possible_castling.setter
+    def is_possible_castling(self, rights):
+        self.castling_rights = (
+            (rights.w_k_s and 1)
+            | (rights.w_q_s and 2)
+            | (rights.b_k_s and 4)
+            | (rights.b_q_s and 8)
+        )
+
+    def load_bitboards(self):
+        """Rebuild every bitboard from self.board."""
+        self.bitboards = {piece: 0 for piece in PIECES}
+        self.occupancy = {"w": 0, "b": 0}
+        for r in range(8):
+            for c in range(8):
+                piece = self.board[r][c]
+                if piece != "--":
+                    bit = 1 << (r * 8 + c)
+                    self.bitboards[piece] |= bit
+                    self.occupancy[piece[0]] |= bit
+
+    def fen_to_board(self, fen):
+        super().fen_to_board(fen)
+        self.history = []
+        self.load_bitboards()
+
+    def copy(self):
+        gs = super().copy()
+        gs.bitboards = dict(self.bitboards)
+        gs.occupancy = dict(self.occupancy)
+        gs.history = []
+        return gs
+
+    def pawn_masks(self):
+        return self.bitboards["wp"], self.bitboards["bp"]
+
+    def make_move(self, move):
+        board = self.board
+        bbs = self.bitboards
+        occupancy = self.occupancy
+        move_id = move.move_id
+        start = move_id & 63
+        end = move_id >> 6 & 63
+        start_r, start_c, end_r, end_c = move.start_r, move.start_c, move.end_r, move.end_c
+        moved = move.piece_moved
+        captured = move.piece_captured
+        us = moved[0]
+
+        h = self._zobrist_key
+        rights = self.castling_rights
+        ep = self.enpassant_possible
+        material, mg, eg, phase = self.material, self.pst_mg, self.pst_eg, self.phase
+        self.history.append((h, material, mg, eg, phase, rights, ep, self.halfmove_clock))
+        self.move_log.append(move)
+        h ^= ZOBRIST_BLACK_TO_MOVE ^ CASTLING_KEYS[rights]
+        if ep:
+            h ^= ZOBRIST_ENPASSANT[ep[1]]
+
+        if captured != "--":
+            bit = 1 << end
+            bbs[captured] ^= bit
+            occupancy[captured[0]] ^= bit
+            h ^= ZOBRIST_PIECES[captured][end]
+            material -= MATERIAL[captured]
+            mg -= PST_MG[captured][end]
+            eg -= PST_EG[captured][end]
+            phase -= PHASE[captured]
+            halfmove = 0
+        else:
+            halfmove = self.halfmove_clock + 1
+
+        placed = us + move.promotion_piece if move.is_pawn_promotion else moved
+        from_bit = 1 << start
+        to_bit = 1 << end
+        bbs[moved] ^= from_bit
+        bbs[placed] ^= to_bit
+        occupancy[us] ^= from_bit | to_bit
+        board[start_r][start_c] = "--"
+        board[end_r][end_c] = placed
+        h ^= ZOBRIST_PIECES[moved][start] ^ ZOBRIST_PIECES[placed][end]
+        mg += PST_MG[placed][end] - PST_MG[moved][start]
+        eg += PST_EG[placed][end] - PST_EG[moved][start]
+
+        ep = ()
+        kind = moved[1]
+        if kind == "p":
+            halfmove = 0
+            if placed != moved:
+                material += MATERIAL[placed] - MATERIAL[moved]
+                phase += PHASE[placed]
+            elif move.is_enpassant:
+                pawn = "bp" if us == "w" else "wp"
+                sq = start_r * 8 + end_c
+                bit = 1 << sq
+                bbs[pawn] ^= bit
+                occupancy[pawn[0]] ^= bit
+                board[start_r][end_c] = "--"
+                h ^= ZOBRIST_PIECES[pawn][sq]
+                material -= MATERIAL[pawn]
+                mg -= PST_MG[pawn][sq]
+                eg -= PST_EG[pawn][sq]
+            elif end - start == 16 or start - end == 16:
+                ep = ((start_r + end_r) // 2, start_c)
+                h ^= ZOBRIST_ENPASSANT[start_c]
+        elif kind == "k":
+            if us == "w":
+                self.w_king_loc = (end_r, end_c)
+            else:
+                self.b_king_loc = (end_r, end_c)
+            if move.is_castle:
+                rook = us + "r"
+                if end_c > start_c:  # Kingside
+                    rook_from, rook_to = end + 1, end - 1
+                else:  # Queenside
+                    rook_from, rook_to = end - 2, end + 1
+                bits = 1 << rook_from | 1 << rook_to
+                bbs[rook] ^= bits
+                occupancy[us] ^= bits
+                board[end_r][rook_from & 7] = "--"
+                board[end_r][rook_to & 7] = rook
+                h ^= ZOBRIST_PIECES[rook][rook_from] ^ ZOBRIST_PIECES[rook][rook_to]
+                mg += PST_MG[rook][rook_to] - PST_MG[rook][rook_from]
+                eg += PST_EG[rook][rook_to] - PST_EG[rook][rook_from]
+
+        rights &= CASTLING_KEEP[start] & CASTLING_KEEP[end]
+        h ^= CASTLING_KEYS[rights]
+        self.castling_rights = rights
+        self.enpassant_possible = ep
+        self.halfmove_clock = halfmove
+        self.white_to_move = us == "b"
+        if us == "b":
+            self.fullmove_number += 1
+        self._zobrist_key = h
+        self.material, self.pst_mg, self.pst_eg, self.phase = material, mg, eg, phase
+
+    def undo(self):
+        if not self.move_log:
+            return
+        move = self.move_log.pop()
+        (
+            self._zobrist_key,
+            self.material,
+            self.pst_mg,
+            self.pst_eg,
+            self.phase,
+            self.castling_rights,
+            self.enpassant_possible,
+            self.halfmove_clock,
+        ) = self.history.pop()
+        board = self.board
+        bbs = self.bitboards
+        occupancy = self.occupancy
+        move_id = move.move_id
+        start = move_id & 63
+        end = move_id >> 6 & 63
+        start_r, start_c, end_r, end_c = move.start_r, move.start_c, move.end_r, move.end_c
+        moved = move.piece_moved
+        captured = move.piece_captured
+        us = moved[0]
+
+        placed = board[end_r][end_c]
+        from_bit = 1 << start
+        to_bit = 1 << end
+        bbs[placed] ^= to_bit
+        bbs[moved] ^= from_bit
+        occupancy[us] ^= from_bit | to_bit
+        board[start_r][start_c] = moved
+        board[end_r][end_c] = captured
+        if captured != "--":
+            bbs[captured] ^= to_bit
+            occupancy[captured[0]] ^= to_bit
+
+        kind = moved[1]
+        if kind == "p":
+            if move.is_enpassant:
+                pawn = "bp" if us == "w" else "wp"
+                bit = 1 << (start_r * 8 + end_c)
+                bbs[pawn] ^= bit
+                occupancy[pawn[0]] ^= bit
+                board[start_r][end_c] = pawn
+        elif kind == "k":
+            if us == "w":
+                self.w_king_loc = (start_r, start_c)
+            else:
+                self.b_king_loc = (start_r, start_c)
+            if move.is_castle:
+                rook = us + "r"
+                if end_c > start_c:  # Kingside
+                    rook_from, rook_to = end + 1, end - 1
+                else:  # Queenside
+                    rook_from, rook_to = end - 2, end + 1
+                bits = 1 << rook_from | 1 << rook_to
+                bbs[rook] ^= bits
+                occupancy[us] ^= bits
+                board[end_r][rook_to & 7] = "--"
+                board[end_r][rook_from & 7] = rook
+
+        self.white_to_move = us == "w"
+        if us == "b":
+            self.fullmove_number -= 1
+
+    def make_null_move(self):
+        """Pass the turn; undo with undo_null_move before any earlier move."""
+        ep = self.enpassant_possible
+        h = self._zobrist_key
+        self.null_log.append((h, ep))
+        h ^= ZOBRIST_BLACK_TO_MOVE
+        if ep:
+            h ^= ZOBRIST_ENPASSANT[ep[1]]
+        self.enpassant_possible = ()
+        self.white_to_move = not self.white_to_move
+        self._zobrist_key = h
+
+    def undo_null_move(self):
+        self._zobrist_key, self.enpassant_possible = self.null_log.pop()
+        self.white_to_move = not self.white_to_move
+
+    def is_attacked(self, sq, by_color, occupied=None, removed=0):
+        """
+        Is square sq attacked by by_color? occupied overrides the board occupancy
+        and removed masks out enemy pieces (e.g. one just captured).
+        """
+        bbs = self.bitboards
+        if occupied is None:
+            occupied = self.occupancy["w"] | self.occupancy["b"]
+        pawn, knight, bishop, rook, queen, king = COLOR_PIECES[by_color]
+        keep = ~removed
+        if KNIGHT_ATTACKS[sq] & bbs[knight] & keep:
+            return True
+        if KING_ATTACKS[sq] & bbs[king]:
+            return True
+        # A pawn of by_color attacks sq if a pawn of the other colour on sq
+        # would attack the pawn's square
+        if PAWN_ATTACKS["b" if by_color == "w" else "w"][sq] & bbs[pawn] & keep:
+            return True
+        queens = bbs[queen]
+        rooks = (bbs[rook] | queens) & keep & ROOK_LINES[sq]
+        if rooks and rook_attacks(sq, occupied) & rooks:
+            return True
+        bishops = (bbs[bishop] | queens) & keep & BISHOP_LINES[sq]
+        if bishops and bishop_attacks(sq, occupied) & bishops:
+            return True
+        return False
+
+    def attackers_to(self, sq, by_color, occupied=None):
+        """Bitboard of every by_color piece attacking square sq."""
+        bbs = self.bitboards
+        if occupied is None:
+            occupied = self.occupancy["w"] | self.occupancy["b"]
+        pawn, knight, bishop, rook, queen, king = COLOR_PIECES[by_color]
+        queens = bbs[queen]
+        attackers = (
+            (KNIGHT_ATTACKS[sq] & bbs[knight])
+            | (KING_ATTACKS[sq] & bbs[king])
+            | (PAWN_ATTACKS["b" if by_color == "w" else "w"][sq] & bbs[pawn])
+        )
+        rooks = (bbs[rook] | queens) & ROOK_LINES[sq]
+        if rooks:
+            attackers |= rook_attacks(sq, occupied) & rooks
+        bishops = (bbs[bishop] | queens) & BISHOP_LINES[sq]
+        if bishops:
+            attackers |= bishop_attacks(sq, occupied) & bishops
+        return attackers & occupied
+
+    def pinned_pieces(self, king_sq, us, them, occupied):
+        """Bitboard of our pieces pinned to our king by an enemy slider."""
+        bbs = self.bitboards
+        queens = bbs[them + "q"]
+        snipers = ((bbs[them + "r"] | queens) & ROOK_LINES[king_sq]) | (
+            (bbs[them + "b"] | queens) & BISHOP_LINES[king_sq]
+        )
+        pinned = 0
+        own = self.occupancy[us]
+        while snipers:
+            lsb = snipers & -snipers
+            snipers ^= lsb
+            blockers = BETWEEN[king_sq][lsb.bit_length() - 1] & occupied
+            # Exactly one piece in between, and it is ours
+            if blockers and not blockers & (blockers - 1) and blockers & own:
+                pinned |= blockers
+        return pinned
+
+    def is_square_attacked(self, r, c, by_white):
+        """Check if square (r, c) is attacked by the given side."""
+        return self.is_attacked(r * 8 + c, "w" if by_white else "b")
+
+    def square_under_att(self, r, c):
+        """Check if square (r, c) is under attack by opponent."""
+        return self.is_attacked(r * 8 + c, "b" if self.white_to_move else "w")
+
+    def check(self):
+        """Check if current player's king is in check."""
+        if self.white_to_move:
+            return self.is_attacked(self.w_king_loc[0] * 8 + self.w_king_loc[1], "b")
+        return self.is_attacked(self.b_king_loc[0] * 8 + self.b_king_loc[1], "w")
+
+    def least_valuable_attacker(self, r, c, by_white, removed=0):
+        """Cheapest attacker of (r, c) as a square, ignoring removed pieces."""
+        color = "w" if by_white else "b"
+        occupied = (self.occupancy["w"] | self.occupancy["b"]) & ~removed
+        attackers = self.attackers_to(r * 8 + c, color, occupied)
+        if not attackers:
+            return None
+        for piece in COLOR_PIECES[color]:
+            found = attackers & self.bitboards[piece]
+            if found:
+                return (found & -found).bit_length() - 1
+        return None
+
+    def _add_moves(self, moves, from_sq, targets):
+        """Append the (cached) moves of the piece on from_sq to each target."""
+        board = self.board
+        base = from_sq | MOVED_KEYS[board[from_sq >> 3][from_sq & 7]]
+        while targets:
+            lsb = targets & -targets
+            targets ^= lsb
+            to_sq = lsb.bit_length() - 1
+            key = base | to_sq << 6 | CAPTURED_KEYS[board[to_sq >> 3][to_sq & 7]]
+            move = MOVE_CACHE.get(key)
+            if move is None:
+                move = MOVE_CACHE[key] = Move(divmod(from_sq, 8), divmod(to_sq, 8), board)
+            moves.append(move)
+
+    def _add_pawn_moves(self, moves, from_sq, targets):
+        """_add_moves for a pawn: one move per promotion piece on the last rank."""
+        board = self.board
+        base = from_sq | MOVED_KEYS[board[from_sq >> 3][from_sq & 7]]
+        while targets:
+            lsb = targets & -targets
+            targets ^= lsb
+            to_sq = lsb.bit_length() - 1
+            key = base | to_sq << 6 | CAPTURED_KEYS[board[to_sq >> 3][to_sq & 7]]
+            if to_sq < 8 or to_sq >= 56:
+                for piece, promotion in PROMOTION_KEYS:
+                    move = MOVE_CACHE.get(key | promotion)
+                    if move is None:
+                        move = MOVE_CACHE[key | promotion] = Move(
+                            divmod(from_sq, 8), divmod(to_sq, 8), board, promotion_piece=piece
+                        )
+                    moves.append(move)
+            else:
+                move = MOVE_CACHE.get(key)
+                if move is None:
+                    move = MOVE_CACHE[key] = Move(divmod(from_sq, 8), divmod(to_sq, 8), board)
+                moves.append(move)
+
+    def _add_special(self, moves, from_sq, to_sq, flag):
+        """Append the cached en passant (flag FLAG_ENPASSANT) or castling move."""
+        board = self.board
+        key = (
+            from_sq
+            | to_sq << 6
+            | flag
+            | MOVED_KEYS[board[from_sq >> 3][from_sq & 7]]
+            | CAPTURED_KEYS["--"]
+        )
+        move = MOVE_CACHE.get(key)
+        if move is None:
+            move = MOVE_CACHE[key] = Move(
+                divmod(from_sq, 8),
+                divmod(to_sq, 8),
+                board,
+                is_enpassant=flag == FLAG_ENPASSANT,
+                is_castle=flag == FLAG_CASTLE,
+            )
+        moves.append(move)
+
+    def _pawn_pushes(self, pawns, empty):
+        """(single, double) push target sets for the side to move's pawns."""
+        if self.white_to_move:
+            single = (pawns >> 8) & empty
+            return single, ((single & ROW_MASKS[5]) >> 8) & empty
+        single = (pawns << 8) & empty
+        return single, ((single & ROW_MASKS[2]) << 8) & empty  # empty masks to 64 bits
+
+    def all_possible_moves(self, moves=None):
+        """
+        Generate all pseudo-legal moves (may leave king in check).
+        If a list is passed in it is cleared and reused instead of allocating one.
+        """
+        if moves is None:
+            moves = []
+        else:
+            moves.clear()
+        us = "w" if self.white_to_move else "b"
+        pawn, knight, bishop, rook, queen, king = COLOR_PIECES[us]
+        bbs = self.bitboards
+        own = self.occupancy[us]
+        enemy = self.occupancy["b" if us == "w" else "w"]
+        occupied = own | enemy
+
+        pawns = bbs[pawn]
+        single, double = self._pawn_pushes(pawns, ~occupied & FULL)
+        for from_sq in iter_bits(pawns):
+            from_bit = 1 << from_sq
+            if us == "w":
+                pushes = single & from_bit >> 8 | double & from_bit >> 16
+            else:
+                pushes = single & from_bit << 8 | double & from_bit << 16
+            self._add_pawn_moves(moves, from_sq, pushes | PAWN_ATTACKS[us][from_sq] & enemy)
+        self._add_enpassant(moves, us, pawns, None, occupied)
+        for from_sq in iter_bits(bbs[knight]):
+            self._add_moves(moves, from_sq, KNIGHT_ATTACKS[from_sq] & ~own)
+        for from_sq in iter_bits(bbs[bishop] | bbs[queen]):
+            self._add_moves(moves, from_sq, bishop_attacks(from_sq, occupied) & ~own)
+        for from_sq in iter_bits(bbs[rook] | bbs[queen]):
+            self._add_moves(moves, from_sq, rook_attacks(from_sq, occupied) & ~own)
+        for from_sq in iter_bits(bbs[king]):
+            self._add_moves(moves, from_sq, KING_ATTACKS[from_sq] & ~own)
+        return moves
+
+    def _add_enpassant(self, moves, us, pawns, king_sq, occupied):
+        """
+        En passant captures; with king_sq only those that do not leave the
+        king attacked, tested on the occupancy after both pawns have moved.
+        """
+        if not self.enpassant_possible:
+            return
+        ep_r, ep_c = self.enpassant_possible
+        ep_sq = ep_r * 8 + ep_c
+        them = "b" if us == "w" else "w"
+        captured_bit = 1 << (ep_sq + 8 if us == "w" else ep_sq - 8)
+        for from_sq in iter_bits(PAWN_ATTACKS[them][ep_sq] & pawns):
+            if king_sq is not None:
+                after = (occupied ^ (1 << from_sq) ^ captured_bit) | (1 << ep_sq)
+                if self.is_attacked(king_sq, them, after, captured_bit):
+                    continue
+            self._add_special(moves, from_sq, ep_sq, FLAG_ENPASSANT)
+
+    def get_castling_moves(self, r, c, moves):
+        """Generate castling moves if legal (the king is known not to be in check)."""
+        rights = self.castling_rights
+        if self.white_to_move:
+            king_side, queen_side, them = rights & 1, rights & 2, "b"
+        else:
+            king_side, queen_side, them = rights & 4, rights & 8, "w"
+        if not (king_side or queen_side):
+            return
+        occupied = self.occupancy["w"] | self.occupancy["b"]
+        sq = r * 8 + c
+        if king_side and not occupied & (0b11 << (sq + 1)):
+            if not self.is_attacked(sq + 1, them, occupied) and not self.is_attacked(
+                sq + 2, them, occupied
+            ):
+                self._add_special(moves, sq, sq + 2, FLAG_CASTLE)
+        if queen_side and not occupied & (0b111 << (sq - 3)):
+            if not self.is_attacked(sq - 1, them, occupied) and not self.is_attacked(
+                sq - 2, them, occupied
+            ):
+                self._add_special(moves, sq, sq - 2, FLAG_CASTLE)
+
+    def get_valid_moves(self, valid_moves=None):
+        """
+        Get all legal moves, generated directly: checkers and pins are found
+        once, non-king moves are masked to the squares that answer a check
+        and to their pin line, and only king moves and en passant need an
+        attack query, made against the occupancy the move would leave.
+        """
+        white = self.white_to_move
+        us, them = ("w", "b") if white else ("b", "w")
+        pawn, knight, bishop, rook, queen, king = COLOR_PIECES[us]
+        bbs = self.bitboards
+        own = self.occupancy[us]
+        occupied = own | self.occupancy[them]
+        king_r, king_c = self.w_king_loc if white else self.b_king_loc
+        king_sq = king_r * 8 + king_c
+
+        if valid_moves is None:
+            valid_moves = []
+        else:
+            valid_moves.clear()
+        moves = valid_moves
+
+        checkers = self.attackers_to(king_sq, them, occupied)
+        in_check = checkers != 0
+        # Squares a non-king move must land on (answering any check)
+        if not in_check:
+            evasions = FULL
+        elif checkers & (checkers - 1):
+            evasions = 0  # Double check: only the king can move
+        else:
+            evasions = checkers | BETWEEN[king_sq][checkers.bit_length() - 1]
+
+        pawns = bbs[pawn]
+        if evasions:
+            pinned = self.pinned_pieces(king_sq, us, them, occupied)
+            lines = LINE[king_sq]
+            targets = evasions & ~own
+            enemy = self.occupancy[them]
+
+            single, double = self._pawn_pushes(pawns, ~occupied & FULL)
+            single &= evasions
+            double &= evasions
+            attacks = PAWN_ATTACKS[us]
+            for from_sq in iter_bits(pawns):
+                from_bit = 1 << from_sq
+                if white:
+                    one, two = from_bit >> 8, from_bit >> 16
+                else:
+                    one, two = from_bit << 8, from_bit << 16
+                allowed = attacks[from_sq] & enemy & evasions | single & one | double & two
+                if pinned & from_bit:
+                    allowed &= lines[from_sq]
+                if allowed:
+                    self._add_pawn_moves(moves, from_sq, allowed)
+
+            # A pinned knight can never move
+            for from_sq in iter_bits(bbs[knight] & ~pinned):
+                self._add_moves(moves, from_sq, KNIGHT_ATTACKS[from_sq] & targets)
+            queens = bbs[queen]
+            for from_sq in iter_bits(bbs[bishop] | queens):
+                allowed = bishop_attacks(from_sq, occupied) & targets
+                if pinned >> from_sq & 1:
+                    allowed &= lines[from_sq]
+                self._add_moves(moves, from_sq, allowed)
+            for from_sq in iter_bits(bbs[rook] | queens):
+                allowed = rook_attacks(from_sq, occupied) & targets
+                if pinned >> from_sq & 1:
+                    allowed &= lines[from_sq]
+                self._add_moves(moves, from_sq, allowed)
+
+        # En passant can uncover the king along the rank, so it is always tested
+        self._add_enpassant(moves, us, pawns, king_sq, occupied)
+
+        # The king is lifted off the board so sliders see through its square
+        without_king = occupied ^ (1 << king_sq)
+        safe = 0
+        for to_sq in iter_bits(KING_ATTACKS[king_sq] & ~own):
+            if not self.is_attacked(to_sq, them, without_king, 1 << to_sq):
+                safe |= 1 << to_sq
+        self._add_moves(moves, king_sq, safe)
+
+        if not in_check:
+            self.get_castling_moves(king_r, king_c, moves)
+        self.in_check = in_check
+
+        # Detect game-ending conditions
+        if len(moves) == 0:
+            self.checkmate = in_check
+            self.stalemate = not in_check
+        else:
+            self.checkmate = False
+            self.stalemate = False
+        return moves
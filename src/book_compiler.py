@@ -0,0 +1,259 @@
+"""
+Compile PGN games into a Polyglot opening book.
+
+Games are streamed from the PGN files, replayed through a GameState up to a
+ply limit, and every (position, move) pair is counted together with the
+result of the game from the mover's side. The book weight of a move is
+2 * wins + draws, as in Polyglot's own make-book, so the output can be read
+by polyglot_book.get_polyglot_move() or any other Polyglot reader.
+
+    python -m src.book_compiler games/*.pgn -o books/own.bin --max-ply 20 --workers 4
+"""
+
+import argparse
+import os
+import re
+import time
+from multiprocessing import Pool
+
+from src.bitboard import BitboardGameState
+from src.chess_engine import Move
+from src.polyglot import encode_move, polyglot_key, write_book
+
+DEFAULT_MAX_PLY = 20
+# Games handed to a worker at a time
+BATCH_GAMES = 256
+# Polyglot weights are 16-bit
+MAX_WEIGHT = 0xFFFF
+
+# Result tag to score for white: win 2, draw 1, loss 0
+RESULTS = {"1-0": 2, "1/2-1/2": 1, "0-1": 0}
+
+COMMENT = re.compile(r"\{[^}]*\}|;[^\n]*")
+MOVE_NUMBER = re.compile(r"^\d+\.+")
+HEADER = re.compile(r'\[(\w+)\s+"(.*)"\]')
+
+
+def iter_game_texts(path):
+    """Raw text of each game in the PGN file at path, one game at a time."""
+    lines = []
+    in_moves = False
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if line.startswith("["):
+                if in_moves:
+                    yield "".join(lines)
+                    lines, in_moves = [], False
+            elif line.strip():
+                in_moves = True
+            lines.append(line)
+    if in_moves:
+        yield "".join(lines)
+
+
+def parse_game(text):
+    """(headers, SAN tokens) of one game's PGN text; variations are skipped."""
+    headers = dict(HEADER.findall(text))
+    movetext = COMMENT.sub(" ", HEADER.sub(" ", text))
+
+    # Drop (variations), which may nest
+    depth = 0
+    kept = []
+    for ch in movetext:
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth = max(0, depth - 1)
+        elif depth == 0:
+            kept.append(ch)
+
+    sans = []
+    for token in "".join(kept).split():
+        token = MOVE_NUMBER.sub("", token)
+        if not token or token[0] == "$" or token in RESULTS or token == "*":
+            continue
+        sans.append(token)
+    return headers, sans
+
+
+def san_to_move(san, valid_moves):
+    """The move of valid_moves written as san, or None if none or several match."""
+    san = san.rstrip("+#!?")
+    if san in ("O-O", "0-0", "O-O-O", "0-0-0"):
+        end_c = 6 if len(san) == 3 else 2
+        for move in valid_moves:
+            if move.is_castle and move.end_c == end_c:
+                return move
+        return None
+
+    promotion = None
+    if "=" in san:
+        san, promotion = san.split("=", 1)
+        promotion = promotion[:1].lower()
+    elif san[-1] in "QRBN" and san[0].islower():
+        san, promotion = san[:-1], san[-1].lower()
+
+    piece = san[0].lower() if san[0] in "KQRBN" else "p"
+    body = san[1:] if piece != "p" else san
+    body = body.replace("x", "").replace("-", "").replace(":", "")
+    if len(body) < 2:
+        return None
+    end_c = Move.files_to_cols.get(body[-2])
+    end_r = Move.ranks_to_rows.get(body[-1])
+    disambiguation = body[:-2]
+
+    found = None
+    for move in valid_moves:
+        if (
+            move.end_r != end_r
+            or move.end_c != end_c
+            or move.piece_moved[1] != piece
+            or move.is_castle
+        ):
+            continue
+        if move.is_pawn_promotion and move.promotion_piece != (promotion or "q"):
+            continue
+        if any(
+            (ch in Move.files_to_cols and Move.files_to_cols[ch] != move.start_c)
+            or (ch in Move.ranks_to_rows and Move.ranks_to_rows[ch] != move.start_r)
+            for ch in disambiguation
+        ):
+            continue
+        if found is not None:
+            return None
+        found = move
+    return found
+
+
+def replay_game(text, max_ply, stats):
+    """
+    Add the (position, move) pairs of one game to stats, a dict of
+    (key, move) -> [games, wins, draws, losses]. Returns False if the game
+    was skipped: no result, a bad FEN or a move that could not be read. A
+    skipped game adds nothing to stats.
+    """
+    headers, sans = parse_game(text)
+    white_score = RESULTS.get(headers.get("Result"))
+    if white_score is None:
+        return False
+    try:
+        gs = BitboardGameState.from_fen(headers["FEN"]) if "FEN" in headers else BitboardGameState()
+    except ValueError:
+        return False
+
+    # Collected first, so a game that fails halfway is not counted in part
+    played = []
+    for san in sans[:max_ply]:
+        move = san_to_move(san, gs.get_valid_moves())
+        if move is None:
+            return False
+        score = white_score if gs.white_to_move else 2 - white_score
+        played.append(((polyglot_key(gs), encode_move(move)), score))
+        gs.make_move(move)
+
+    for entry, score in played:
+        counts = stats.setdefault(entry, [0, 0, 0, 0])
+        counts[0] += 1
+        counts[3 - score] += 1  # score 2 -> wins, 1 -> draws, 0 -> losses
+    return True
+
+
+def _compile_batch(args):
+    """Pool worker: stats, games read and games skipped for a batch of games."""
+    texts, max_ply = args
+    stats = {}
+    skipped = 0
+    for text in texts:
+        if not replay_game(text, max_ply, stats):
+            skipped += 1
+    return stats, len(texts), skipped
+
+
+def _batches(paths, max_ply):
+    batch = []
+    for path in paths:
+        for text in iter_game_texts(path):
+            batch.append(text)
+            if len(batch) == BATCH_GAMES:
+                yield batch, max_ply
+                batch = []
+    if batch:
+        yield batch, max_ply
+
+
+def compile_games(paths, max_ply=DEFAULT_MAX_PLY, workers=1):
+    """
+    Statistics of every (position, move) in the games of the PGN files at
+    paths, as a dict of (polyglot key, polyglot move) ->
+    [games, wins, draws, losses]. Returns (stats, games, skipped). With
+    workers > 1 batches of games are replayed in a process pool while this
+    process keeps reading the files.
+    """
+    stats = {}
+    games = skipped = 0
+    if workers > 1:
+        pool = Pool(workers)
+        results = pool.imap_unordered(_compile_batch, _batches(paths, max_ply))
+    else:
+        pool = None
+        results = map(_compile_batch, _batches(paths, max_ply))
+    try:
+        for batch_stats, batch_games, batch_skipped in results:
+            games += batch_games
+            skipped += batch_skipped
+            if not stats:
+                stats = batch_stats
+                continue
+            for entry, counts in batch_stats.items():
+                total = stats.get(entry)
+                if total is None:
+                    stats[entry] = counts
+                else:
+                    for i in range(4):
+                        total[i] += counts[i]
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return stats, games, skipped
+
+
+def book_entries(stats, min_games=1):
+    """Polyglot (key, move, weight, learn) entries for compile_games() stats."""
+    kept = [
+        (key, move, 2 * wins + draws)
+        for (key, move), (games, wins, draws, _) in stats.items()
+        if games >= min_games
+    ]
+    # Scale down if the most played move would overflow the 16-bit weight
+    top = max((weight for _, _, weight in kept), default=0)
+    scale = MAX_WEIGHT / top if top > MAX_WEIGHT else 1
+    return [(key, move, int(weight * scale), 0) for key, move, weight in kept]
+
+
+def compile_book(paths, out, max_ply=DEFAULT_MAX_PLY, workers=1, min_games=1):
+    """Compile the PGN files at paths into the Polyglot book out."""
+    start = time.perf_counter()
+    stats, games, skipped = compile_games(paths, max_ply, workers)
+    written = write_book(out, book_entries(stats, min_games))
+    elapsed = time.perf_counter() - start
+    print(
+        f"{games} games ({skipped} skipped), {len(stats)} position/move pairs,"
+        f" {written} entries written to {out} in {elapsed:.1f}s"
+    )
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile PGN games into a Polyglot book")
+    parser.add_argument("pgn", nargs="+", help="PGN files to read")
+    parser.add_argument("-o", "--output", required=True, help="book file to write")
+    parser.add_argument("--max-ply", type=int, default=DEFAULT_MAX_PLY)
+    parser.add_argument("--min-games", type=int, default=1, help="drop rarer moves")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    compile_book(args.pgn, args.output, args.max_ply, args.workers, args.min_games)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,74 @@
+import random
+
+from src.pst import MATERIAL, PHASE, PIECE_VALUES, PST_EG, PST_MG
+
+
+# Zobrist keys: one random 64-bit number per (piece, square), per castling
+# right, per en passant file and for the side to move. A fixed seed keeps
+# keys stable between runs so they can be stored on disk.
+_zobrist_rng = random.Random(0x5EED)
+ZOBRIST_PIECES = {
+    color + piece: [_zobrist_rng.getrandbits(64) for _ in range(64)]
+    for color in "wb"
+    for piece in "prnbqk"
+}
+ZOBRIST_CASTLING = [_zobrist_rng.getrandbits(64) for _ in range(4)]
+ZOBRIST_ENPASSANT = [_zobrist_rng.getrandbits(64) for _ in range(8)]
+ZOBRIST_BLACK_TO_MOVE = _zobrist_rng.getrandbits(64)
+
+# FEN piece letters to board strings
+FEN_PIECES = {
+    letter: ("w" if letter.isupper() else "b") + letter.lower()
+    for letter in "PNBRQKpnbrqk"
+}
+
+# Piece values for static exchange evaluation; the king is worth more than
+# anything it could win, so it only ever recaptures last
+SEE_VALUES = dict(PIECE_VALUES, k=100)
+
+
+def castling_hash(rights):
+    """Zobrist contribution of a Castle_R object."""
+    h = 0
+    if rights.w_k_s:
+        h ^= ZOBRIST_CASTLING[0]
+    if rights.w_q_s:
+        h ^= ZOBRIST_CASTLING[1]
+    if rights.b_k_s:
+        h ^= ZOBRIST_CASTLING[2]
+    if rights.b_q_s:
+        h ^= ZOBRIST_CASTLING[3]
+    return h
+
+
 class GameState:
     """
     Represents the complete state of a chess game.
     Handles board representation, move execution, and game rules.
     """
 
+    # Diagonals first, then straight lines (used by pin and attack detection)
+    queen_directions = [
+        (-1, -1),
+        (-1, 1),
+        (1, -1),
+        (1, 1),
+        (-1, 0),
+        (1, 0),
+        (0, -1),
+        (0, 1),
+    ]
+    knight_directions = [
+        (-1, -2),
+        (2, 1),
+        (2, -1),
+        (-2, 1),
+        (-1, 2),
+        (1, 2),
+        (-2, -1),
+        (1, -2),
+    ]
+
     def __init__(self):
         """Initialize the chess board and game state variables."""
 
@@ -51,9 +116,11 @@ class GameState:
         # Game end conditions
         self.checkmate = False
         self.stalemate = False
+        self.in_check = False  # Side to move, as of the last get_valid_moves
 
         # En passant: stores (row, col) where capture is possible, or ()
         self.enpassant_possible = ()
+        self.enpassant_log = [self.enpassant_possible]
 
         # Castling rights tracker
         self.is_possible_castling = Castle_R(True, True, True, True)
@@ -66,6 +133,115 @@ class GameState:
             )
         ]
 
+        # Zobrist key of the current position, with one entry per played move
+        # in zobrist_log so undo can restore it
+        self._zobrist_key = self.compute_zobrist()
+        self.zobrist_log = []
+
+        # Evaluation terms kept up to date by make_move: material and
+        # middlegame/endgame piece-square sums (white minus black, in pawns)
+        # and the game phase. eval_log holds the previous values for undo.
+        self.material, self.pst_mg, self.pst_eg, self.phase = self.compute_evaluation()
+        self.eval_log = []
+
+        # Fifty-move clock and move number, as in the last two FEN fields
+        self.halfmove_clock = 0
+        self.fullmove_number = 1
+        self.halfmove_log = []
+
+        # Zobrist keys saved by make_null_move for undo_null_move
+        self.null_log = []
+
+        # Scratch list for pseudo-legal moves, reused by get_valid_moves
+        self.pseudo_moves = []
+
+    @classmethod
+    def from_fen(cls, fen):
+        """Create a new state (of this class) from a FEN string."""
+        gs = cls()
+        gs.fen_to_board(fen)
+        return gs
+
+    def copy(self):
+        """
+        Cheap snapshot of the current position. The copy starts with an empty
+        move history, so move_log and the undo logs are not duplicated.
+        """
+        gs = self.__class__.__new__(self.__class__)
+        gs.__dict__.update(self.__dict__)
+        gs.board = [row[:] for row in self.board]
+        gs.move_log = []
+        gs.is_possible_castling = Castle_R(
+            self.is_possible_castling.w_k_s,
+            self.is_possible_castling.w_q_s,
+            self.is_possible_castling.b_k_s,
+            self.is_possible_castling.b_q_s,
+        )
+        gs.castling_log = [
+            Castle_R(
+                self.is_possible_castling.w_k_s,
+                self.is_possible_castling.w_q_s,
+                self.is_possible_castling.b_k_s,
+                self.is_possible_castling.b_q_s,
+            )
+        ]
+        gs.enpassant_log = [self.enpassant_possible]
+        gs.zobrist_log = []
+        gs.eval_log = []
+        gs.halfmove_log = []
+        gs.null_log = []
+        gs.pseudo_moves = []
+        return gs
+
+    @property
+    def zobrist_key(self):
+        """64-bit hash of pieces, side to move, castling rights and en passant."""
+        return self._zobrist_key
+
+    def compute_zobrist(self):
+        """Hash the current position from scratch."""
+        h = 0
+        for r in range(8):
+            for c in range(8):
+                piece = self.board[r][c]
+                if piece != "--":
+                    h ^= ZOBRIST_PIECES[piece][r * 8 + c]
+        h ^= castling_hash(self.is_possible_castling)
+        if self.enpassant_possible:
+            h ^= ZOBRIST_ENPASSANT[self.enpassant_possible[1]]
+        if not self.white_to_move:
+            h ^= ZOBRIST_BLACK_TO_MOVE
+        return h
+
+    def compute_evaluation(self):
+        """Material, middlegame PST, endgame PST and phase from scratch."""
+        material = mg = eg = 0
+        phase = 0
+        for r in range(8):
+            for c in range(8):
+                piece = self.board[r][c]
+                if piece != "--":
+                    sq = r * 8 + c
+                    material += MATERIAL[piece]
+                    mg += PST_MG[piece][sq]
+                    eg += PST_EG[piece][sq]
+                    phase += PHASE[piece]
+        return material, mg, eg, phase
+
+    def pawn_masks(self):
+        """White and black pawns as 64-bit masks, bit r * 8 + c."""
+        white = black = 0
+        # Pawns never stand on the first or last row
+        for r in range(1, 7):
+            row = self.board[r]
+            for c in range(8):
+                piece = row[c]
+                if piece == "wp":
+                    white |= 1 << (r * 8 + c)
+                elif piece == "bp":
+                    black |= 1 << (r * 8 + c)
+        return white, black
+
     def board_to_fen(self):
         fen_parts = []
 
@@ -95,8 +271,19 @@ class GameState:
 
         fen = "/".join(fen_parts)
 
-        fen += "w" if self.white_to_move else "b"
-        fen += " -"
+        fen += " w" if self.white_to_move else " b"
+
+        # Castling rights
+        castling = ""
+        if self.is_possible_castling.w_k_s:
+            castling += "K"
+        if self.is_possible_castling.w_q_s:
+            castling += "Q"
+        if self.is_possible_castling.b_k_s:
+            castling += "k"
+        if self.is_possible_castling.b_q_s:
+            castling += "q"
+        fen += " " + (castling or "-")
 
         # En passant target
         if self.enpassant_possible:
@@ -108,58 +295,110 @@ class GameState:
         else:
             fen += " -"
 
+        fen += f" {self.halfmove_clock} {self.fullmove_number}"
         return fen
 
-    # def fen_to_board(self, fen):
-
-    #     parts = fen.split()
-
-    #     if len(parts)<4:
-    #         raise ValueError("Invalid FEN")
-
-    #     rows = parts[0].split('/')
-    #     for r_string in rows:
-    #         row = []
-    #         for char in r_string:
-    #             if char.isdigit():
-    #                 # Empty squares
-    #                 row.extend(["--"] * int(char))
-    #             else:
-    #                 # Piece: uppercase = white, lowercase = black
-    #                 color = "w" if char.isupper() else "b"
-    #                 piece = char.lower()
-    #                 row.append(color + piece)
-    #             self.board.append(row)
-
-    #     # 2. Active color
-    #     self.white_to_move = (parts[1] == "w")
-
-    #     # 4. En passant target
-    #     if parts[3] != "-":
-    #         files = "abcdefgh"
-    #         ranks = "87654321"
-    #         file = files.index(parts[3][0])
-    #         rank = ranks.index(parts[3][1])
-    #         self.enpassant_possible = (rank, file)
-    #     else:
-    #         self.enpassant_possible = ()
-
-    #     # 5. Update king locations
-    #     for r in range(8):
-    #         for c in range(8):
-    #             if self.board[r][c] == "wk":
-    #                 self.w_king_loc = (r, c)
-    #             elif self.board[r][c] == "bk":
-    #                 self.b_king_loc = (r, c)
-
-    #     # Reset move log
-    #     self.move_log = []
-    #     self.checkmate = False
-    #     self.stalemate = False
+    def fen_to_board(self, fen):
+        """
+        Load a position from FEN. The move clocks are optional and default
+        to 0 and 1.
+        """
+
+        parts = fen.split()
+
+        if len(parts) < 4:
+            raise ValueError("Invalid FEN")
+
+        rows = parts[0].split("/")
+        if len(rows) != 8:
+            raise ValueError("Invalid FEN")
+        # 1. Pieces, hashing them and finding the kings in the same pass
+        self.board = []
+        h = 0
+        for r, r_string in enumerate(rows):
+            row = []
+            for char in r_string:
+                if char.isdigit():
+                    # Empty squares
+                    row.extend(["--"] * int(char))
+                else:
+                    # Piece: uppercase = white, lowercase = black
+                    piece = FEN_PIECES.get(char)
+                    c = len(row)
+                    if piece is None or c > 7:
+                        raise ValueError("Invalid FEN")
+                    if piece == "wk":
+                        self.w_king_loc = (r, c)
+                    elif piece == "bk":
+                        self.b_king_loc = (r, c)
+                    h ^= ZOBRIST_PIECES[piece][r * 8 + c]
+                    row.append(piece)
+            if len(row) != 8:
+                raise ValueError("Invalid FEN")
+            self.board.append(row)
+        if parts[0].count("K") != 1 or parts[0].count("k") != 1:
+            raise ValueError("Invalid FEN")
+
+        # 2. Active color
+        self.white_to_move = parts[1] == "w"
+
+        # 3. Castling rights
+        self.is_possible_castling = Castle_R(
+            "K" in parts[2], "Q" in parts[2], "k" in parts[2], "q" in parts[2]
+        )
+        self.castling_log = [
+            Castle_R(
+                self.is_possible_castling.w_k_s,
+                self.is_possible_castling.w_q_s,
+                self.is_possible_castling.b_k_s,
+                self.is_possible_castling.b_q_s,
+            )
+        ]
+
+        # 4. En passant target
+        if parts[3] != "-":
+            files = "abcdefgh"
+            ranks = "87654321"
+            if len(parts[3]) != 2 or parts[3][0] not in files or parts[3][1] not in ranks:
+                raise ValueError("Invalid FEN")
+            file = files.index(parts[3][0])
+            rank = ranks.index(parts[3][1])
+            self.enpassant_possible = (rank, file)
+        else:
+            self.enpassant_possible = ()
+        self.enpassant_log = [self.enpassant_possible]
+
+        # 5. Move clocks
+        self.halfmove_clock = int(parts[4]) if len(parts) > 4 else 0
+        self.fullmove_number = int(parts[5]) if len(parts) > 5 else 1
+        self.halfmove_log = []
+        self.null_log = []
+
+        # Reset move log
+        self.move_log = []
+        self.checkmate = False
+        self.stalemate = False
+        self.in_check = False
+        h ^= castling_hash(self.is_possible_castling)
+        if self.enpassant_possible:
+            h ^= ZOBRIST_ENPASSANT[self.enpassant_possible[1]]
+        if not self.white_to_move:
+            h ^= ZOBRIST_BLACK_TO_MOVE
+        self._zobrist_key = h
+        self.zobrist_log = []
+        self.material, self.pst_mg, self.pst_eg, self.phase = self.compute_evaluation()
+        self.eval_log = []
 
     def make_move(self, move):
         """Execute a move and update game state."""
 
+        # Take the outgoing castling rights and en passant file out of the hash
+        h = self._zobrist_key
+        self.zobrist_log.append(h)
+        h ^= castling_hash(self.is_possible_castling) ^ ZOBRIST_BLACK_TO_MOVE
+        if self.enpassant_possible:
+            h ^= ZOBRIST_ENPASSANT[self.enpassant_possible[1]]
+
         # Handle en passant: captured pawn is not on the destination square
         if move.is_enpassant:
             if self.white_to_move:
@@ -167,13 +406,27 @@ class GameState:
             else:
                 self.board[move.end_r - 1][move.end_c] = "--"  # Remove white pawn
 
-        # Execute move
+        # Execute move (a promoting pawn is replaced by the chosen piece)
         self.board[move.start_r][move.start_c] = "--"
-        self.board[move.end_r][move.end_c] = move.piece_moved
+        if move.is_pawn_promotion:
+            self.board[move.end_r][move.end_c] = (
+                move.piece_moved[0] + move.promotion_piece
+            )
+        else:
+            self.board[move.end_r][move.end_c] = move.piece_moved
 
         self.move_log.append(move)
         self.white_to_move = not self.white_to_move
 
+        # Pawn moves and captures reset the fifty-move clock
+        self.halfmove_log.append(self.halfmove_clock)
+        if move.piece_moved[1] == "p" or move.piece_captured != "--":
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+        if self.white_to_move:
+            self.fullmove_number += 1
+
         # Update king position tracker
         if move.piece_moved == "bk":
             self.b_king_loc = (move.end_r, move.end_c)
@@ -185,6 +438,7 @@ class GameState:
             self.enpassant_possible = ((move.start_r + move.end_r) // 2, move.start_c)
         else:
             self.enpassant_possible = ()
+        self.enpassant_log.append(self.enpassant_possible)
 
         # Update castling rights
         self.update_castle(move)
@@ -197,6 +451,51 @@ class GameState:
             )
         )
 
+        # Hash the pieces that moved and the new castling/en passant state
+        start = move.start_r * 8 + move.start_c
+        end = move.end_r * 8 + move.end_c
+        # and update the evaluation terms the same way
+        moved = move.piece_moved
+        placed = self.board[move.end_r][move.end_c]
+        material, mg, eg, phase = self.material, self.pst_mg, self.pst_eg, self.phase
+        self.eval_log.append((material, mg, eg, phase))
+        h ^= ZOBRIST_PIECES[moved][start]
+        h ^= ZOBRIST_PIECES[placed][end]
+        mg += PST_MG[placed][end] - PST_MG[moved][start]
+        eg += PST_EG[placed][end] - PST_EG[moved][start]
+        if move.is_pawn_promotion:
+            material += MATERIAL[placed] - MATERIAL[moved]
+            phase += PHASE[placed]
+        captured = move.piece_captured
+        if captured != "--":
+            h ^= ZOBRIST_PIECES[captured][end]
+            material -= MATERIAL[captured]
+            mg -= PST_MG[captured][end]
+            eg -= PST_EG[captured][end]
+            phase -= PHASE[captured]
+        if move.is_enpassant:
+            captured = "bp" if moved[0] == "w" else "wp"
+            sq = move.start_r * 8 + move.end_c
+            h ^= ZOBRIST_PIECES[captured][sq]
+            material -= MATERIAL[captured]
+            mg -= PST_MG[captured][sq]
+            eg -= PST_EG[captured][sq]
+        if move.is_castle:
+            rook_piece = moved[0] + "r"
+            if move.end_c - move.start_c == 2:  # Kingside
+                rook_from, rook_to = end + 1, end - 1
+            else:  # Queenside
+                rook_from, rook_to = end - 2, end + 1
+            rook = ZOBRIST_PIECES[rook_piece]
+            h ^= rook[rook_from] ^ rook[rook_to]
+            mg += PST_MG[rook_piece][rook_to] - PST_MG[rook_piece][rook_from]
+            eg += PST_EG[rook_piece][rook_to] - PST_EG[rook_piece][rook_from]
+        h ^= castling_hash(self.is_possible_castling)
+        if self.enpassant_possible:
+            h ^= ZOBRIST_ENPASSANT[self.enpassant_possible[1]]
+        self._zobrist_key = h
+        self.material, self.pst_mg, self.pst_eg, self.phase = material, mg, eg, phase
+
     def update_castle(self, move):
         """
         Update castling rights based on piece movements.
@@ -227,6 +526,18 @@ class GameState:
                 elif move.start_c == 7:
                     self.is_possible_castling.b_k_s = False
 
+        # Rook captured on its starting square: that side's castling is gone too
+        if move.piece_captured == "wr" and move.end_r == 7:
+            if move.end_c == 0:
+                self.is_possible_castling.w_q_s = False
+            elif move.end_c == 7:
+                self.is_possible_castling.w_k_s = False
+        elif move.piece_captured == "br" and move.end_r == 0:
+            if move.end_c == 0:
+                self.is_possible_castling.b_q_s = False
+            elif move.end_c == 7:
+                self.is_possible_castling.b_k_s = False
+
         # Execute castling: move the rook
         if move.is_castle:
             if move.end_c - move.start_c == 2:  # Kingside
@@ -240,16 +551,43 @@ class GameState:
                 ]
                 self.board[move.end_r][move.end_c - 2] = "--"
 
+    def make_null_move(self):
+        """
+        Pass the turn without moving (for null-move pruning in the search).
+        The board is unchanged; only the side to move, en passant and the hash
+        are. Undo it with undo_null_move before undoing any earlier move.
+        """
+        h = self._zobrist_key
+        self.null_log.append(h)
+        h ^= ZOBRIST_BLACK_TO_MOVE
+        if self.enpassant_possible:
+            h ^= ZOBRIST_ENPASSANT[self.enpassant_possible[1]]
+        self.enpassant_possible = ()
+        self.enpassant_log.append(self.enpassant_possible)
+        self.white_to_move = not self.white_to_move
+        self._zobrist_key = h
+
+    def undo_null_move(self):
+        self._zobrist_key = self.null_log.pop()
+        self.enpassant_log.pop()
+        self.enpassant_possible = self.enpassant_log[-1]
+        self.white_to_move = not self.white_to_move
+
     def undo(self):
         """Undo the last move and restore all game state."""
 
         if len(self.move_log) != 0:
             move = self.move_log.pop()
+            self._zobrist_key = self.zobrist_log.pop()
+            self.material, self.pst_mg, self.pst_eg, self.phase = self.eval_log.pop()
 
             # Restore board
             self.board[move.start_r][move.start_c] = move.piece_moved
             self.board[move.end_r][move.end_c] = move.piece_captured
             self.white_to_move = not self.white_to_move
+            self.halfmove_clock = self.halfmove_log.pop()
+            if not self.white_to_move:
+                self.fullmove_number -= 1
 
             # Restore king position
             if move.piece_moved == "bk":
@@ -266,20 +604,8 @@ class GameState:
                     self.board[move.end_r - 1][move.end_c] = "wp"
 
             # Restore en passant opportunity
-            if len(self.move_log) > 0:
-                last_move = self.move_log[-1]
-                if (
-                    last_move.piece_moved[1] == "p"
-                    and abs(last_move.start_r - last_move.end_r) == 2
-                ):
-                    self.enpassant_possible = (
-                        (last_move.start_r + last_move.end_r) // 2,
-                        last_move.start_c,
-                    )
-                else:
-                    self.enpassant_possible = ()
-            else:
-                self.enpassant_possible = ()
+            self.enpassant_log.pop()
+            self.enpassant_possible = self.enpassant_log[-1]
 
             # Restore castling rights
             self.castling_log.pop()
@@ -304,62 +630,323 @@ class GameState:
                     ]
                     self.board[move.end_r][move.end_c + 1] = "--"
 
-    def get_valid_moves(self):
+    def get_valid_moves(self, valid_moves=None):
         """
-        Get all legal moves (pseudo-legal moves that don't leave king in check).
+        Get all legal moves. Pins and checks are found once per position, so
+        pseudo-legal moves are filtered without making and undoing them.
         Also detects checkmate and stalemate.
+        Pass a list as valid_moves to have it cleared and refilled (e.g. one
+        buffer per search ply) instead of getting a new list.
         """
 
-        moves = self.all_possible_moves()
-        valid_moves = []
-        # Add castling moves
+        in_check, pins, checks = self.get_pins_and_checks()
         if self.white_to_move:
-            self.get_castling_moves(self.w_king_loc[0], self.w_king_loc[1], moves)
+            king_r, king_c = self.w_king_loc
+        else:
+            king_r, king_c = self.b_king_loc
+
+        # Pseudo-legal moves go into a scratch list reused on every call
+        moves = self.pseudo_moves
+        if len(checks) > 1:
+            # Double check: only the king can move
+            moves.clear()
+            self.get_king_moves(king_r, king_c, moves)
         else:
-            self.get_castling_moves(self.b_king_loc[0], self.b_king_loc[1], moves)
+            self.all_possible_moves(moves)
+
+        # Squares a non-king move may land on to resolve a single check
+        block_squares = None
+        if len(checks) == 1:
+            check_r, check_c, d_r, d_c = checks[0]
+            if self.board[check_r][check_c][1] == "n":
+                block_squares = {(check_r, check_c)}
+            else:
+                block_squares = set()
+                r, c = king_r + d_r, king_c + d_c
+                while True:
+                    block_squares.add((r, c))
+                    if (r, c) == (check_r, check_c):
+                        break
+                    r, c = r + d_r, c + d_c
+
+        pinned = {(r, c): (d_r, d_c) for r, c, d_r, d_c in pins}
+        enemy_white = not self.white_to_move
+        if valid_moves is None:
+            valid_moves = []
+        else:
+            valid_moves.clear()
+        for move in moves:
+            if move.start_r == king_r and move.start_c == king_c:
+                if not self.king_move_attacked(move, enemy_white):
+                    valid_moves.append(move)
+                continue
+
+            if block_squares is not None and (move.end_r, move.end_c) not in block_squares:
+                # An en passant capture can also remove a checking pawn
+                if not (
+                    move.is_enpassant and (move.start_r, move.end_c) in block_squares
+                ):
+                    continue
 
-        # Test each move to ensure it doesn't leave our king in check
-        for i in range(len(moves) - 1, -1, -1):
-            self.make_move(moves[i])
-            self.white_to_move = not self.white_to_move
-            if not self.check():
-                valid_moves.append(moves[i])
-            self.white_to_move = not self.white_to_move
-            self.undo()
+            pin = pinned.get((move.start_r, move.start_c))
+            if pin is not None:
+                # A pinned piece may only move along the pin line
+                if (move.end_r - move.start_r) * pin[1] != (
+                    move.end_c - move.start_c
+                ) * pin[0]:
+                    continue
+
+            if move.is_enpassant and self.enpassant_exposes_king(move, enemy_white):
+                continue
+            valid_moves.append(move)
+
+        # Add castling moves
+        if not in_check:
+            self.get_castling_moves(king_r, king_c, valid_moves)
+        self.in_check = in_check
 
         # Detect game-ending conditions
         if len(valid_moves) == 0:
-            if self.check():
-                self.checkmate = True
-                self.stalemate = False
-            else:
-                self.stalemate = True
-                self.checkmate = False
+            self.checkmate = in_check
+            self.stalemate = not in_check
         else:
             self.checkmate = False
             self.stalemate = False
         return valid_moves
 
-    def square_under_att(self, r, c):
-        """Check if square (r, c) is under attack by opponent."""
-        self.white_to_move = not self.white_to_move
-        for move in self.all_possible_moves():
-            if move.end_r == r and move.end_c == c:
-                self.white_to_move = not self.white_to_move
+    def king_move_attacked(self, move, by_white):
+        """Check if the king would be attacked on the move's end square."""
+        king = self.board[move.start_r][move.start_c]
+        # Lift the king so it cannot block a slider looking through it
+        self.board[move.start_r][move.start_c] = "--"
+        attacked = self.is_square_attacked(move.end_r, move.end_c, by_white)
+        self.board[move.start_r][move.start_c] = king
+        return attacked
+
+    def enpassant_exposes_king(self, move, by_white):
+        """
+        En passant removes two pawns from one rank, which can uncover a rook or
+        queen on the king's rank that no ordinary pin would catch.
+        """
+        captured = self.board[move.start_r][move.end_c]
+        self.board[move.start_r][move.start_c] = "--"
+        self.board[move.start_r][move.end_c] = "--"
+        self.board[move.end_r][move.end_c] = move.piece_moved
+        if self.white_to_move:
+            exposed = self.is_square_attacked(*self.w_king_loc, by_white)
+        else:
+            exposed = self.is_square_attacked(*self.b_king_loc, by_white)
+        self.board[move.end_r][move.end_c] = "--"
+        self.board[move.start_r][move.end_c] = captured
+        self.board[move.start_r][move.start_c] = move.piece_moved
+        return exposed
+
+    def get_pins_and_checks(self):
+        """
+        Look outward from the side-to-move's king.
+        Returns (in_check, pins, checks); pins and checks are lists of
+        (row, col, d_row, d_col) with the direction pointing away from the king.
+        """
+        pins = []
+        checks = []
+        if self.white_to_move:
+            ally, enemy = "w", "b"
+            start_r, start_c = self.w_king_loc
+        else:
+            ally, enemy = "b", "w"
+            start_r, start_c = self.b_king_loc
+
+        for j, (d_r, d_c) in enumerate(self.queen_directions):
+            possible_pin = ()
+            for i in range(1, 8):
+                end_r = start_r + d_r * i
+                end_c = start_c + d_c * i
+                if not (0 <= end_r < 8 and 0 <= end_c < 8):
+                    break
+                end_piece = self.board[end_r][end_c]
+                if end_piece[0] == ally and end_piece[1] != "k":
+                    if possible_pin == ():
+                        possible_pin = (end_r, end_c, d_r, d_c)
+                    else:
+                        # Second own piece: no pin or check on this line
+                        break
+                elif end_piece[0] == enemy:
+                    if self.slider_attacks_along(end_piece, j, i):
+                        if possible_pin == ():
+                            checks.append((end_r, end_c, d_r, d_c))
+                        else:
+                            pins.append(possible_pin)
+                    break
+
+        for d_r, d_c in self.knight_directions:
+            end_r = start_r + d_r
+            end_c = start_c + d_c
+            if 0 <= end_r < 8 and 0 <= end_c < 8:
+                if self.board[end_r][end_c] == enemy + "n":
+                    checks.append((end_r, end_c, d_r, d_c))
+
+        return len(checks) > 0, pins, checks
+
+    def slider_attacks_along(self, piece, direction_index, distance):
+        """
+        Does piece, seen from a square along queen_directions[direction_index],
+        attack back along that line from the given distance?
+        """
+        kind = piece[1]
+        if kind == "q":
+            return True
+        if kind == "r":
+            return direction_index >= 4
+        if kind == "b":
+            return direction_index < 4
+        if distance == 1:
+            if kind == "k":
                 return True
-        self.white_to_move = not self.white_to_move
+            if kind == "p":
+                # The direction points from the king towards the pawn
+                d_r = self.queen_directions[direction_index][0]
+                if direction_index < 4:
+                    return (piece[0] == "b" and d_r == -1) or (
+                        piece[0] == "w" and d_r == 1
+                    )
+        return False
+
+    def is_square_attacked(self, r, c, by_white):
+        """
+        Check if square (r, c) is attacked by the given side, by casting rays
+        and knight/pawn offsets outward from the square.
+        """
+        attacker = "w" if by_white else "b"
+        board = self.board
+
+        for d_r, d_c in self.knight_directions:
+            end_r, end_c = r + d_r, c + d_c
+            if 0 <= end_r < 8 and 0 <= end_c < 8:
+                if board[end_r][end_c] == attacker + "n":
+                    return True
+
+        for j, (d_r, d_c) in enumerate(self.queen_directions):
+            end_r, end_c = r + d_r, c + d_c
+            i = 1
+            while 0 <= end_r < 8 and 0 <= end_c < 8:
+                end_piece = board[end_r][end_c]
+                if end_piece != "--":
+                    if end_piece[0] == attacker and self.slider_attacks_along(
+                        end_piece, j, i
+                    ):
+                        return True
+                    break
+                end_r += d_r
+                end_c += d_c
+                i += 1
         return False
 
+    def square_under_att(self, r, c):
+        """Check if square (r, c) is under attack by opponent."""
+        return self.is_square_attacked(r, c, not self.white_to_move)
+
     def check(self):
         """Check if current player's king is in check."""
         if self.white_to_move:
-            return self.square_under_att(self.w_king_loc[0], self.w_king_loc[1])
+            return self.is_square_attacked(
+                self.w_king_loc[0], self.w_king_loc[1], False
+            )
         else:
-            return self.square_under_att(self.b_king_loc[0], self.b_king_loc[1])
+            return self.is_square_attacked(self.b_king_loc[0], self.b_king_loc[1], True)
 
-    def all_possible_moves(self):
-        """Generate all pseudo-legal moves (may leave king in check)."""
-        moves = []
+    def least_valuable_attacker(self, r, c, by_white, removed=0):
+        """
+        Square (r * 8 + c numbering) of the cheapest by_white piece attacking
+        (r, c), or None. Squares set in the removed bitmask count as empty, so
+        pieces behind them (x-rays) are found too.
+        """
+        attacker = "w" if by_white else "b"
+        board = self.board
+
+        for d_c in (-1, 1):
+            # A white pawn attacks from the row below, a black one from above
+            end_r, end_c = (r + 1 if by_white else r - 1), c + d_c
+            if 0 <= end_r < 8 and 0 <= end_c < 8:
+                if board[end_r][end_c] == attacker + "p" and not (
+                    removed >> (end_r * 8 + end_c) & 1
+                ):
+                    return end_r * 8 + end_c
+
+        for d_r, d_c in self.knight_directions:
+            end_r, end_c = r + d_r, c + d_c
+            if 0 <= end_r < 8 and 0 <= end_c < 8:
+                if board[end_r][end_c] == attacker + "n" and not (
+                    removed >> (end_r * 8 + end_c) & 1
+                ):
+                    return end_r * 8 + end_c
+
+        best_sq, best_value = None, None
+        for j, (d_r, d_c) in enumerate(self.queen_directions):
+            end_r, end_c = r + d_r, c + d_c
+            i = 1
+            while 0 <= end_r < 8 and 0 <= end_c < 8:
+                end_piece = board[end_r][end_c]
+                if end_piece != "--" and not removed >> (end_r * 8 + end_c) & 1:
+                    if (
+                        end_piece[0] == attacker
+                        and end_piece[1] != "p"
+                        and self.slider_attacks_along(end_piece, j, i)
+                        and (best_value is None or SEE_VALUES[end_piece[1]] < best_value)
+                    ):
+                        best_sq, best_value = end_r * 8 + end_c, SEE_VALUES[end_piece[1]]
+                    break
+                end_r += d_r
+                end_c += d_c
+                i += 1
+        return best_sq
+
+    def see(self, move):
+        """
+        Static exchange evaluation: material the side to move wins (in pawns)
+        by playing move and then both sides recapturing on the target square
+        with their cheapest piece for as long as it pays.
+        """
+        r, c = move.end_r, move.end_c
+        removed = 1 << (move.start_r * 8 + move.start_c)
+        if move.is_enpassant:
+            gain = SEE_VALUES["p"]
+            removed |= 1 << (move.start_r * 8 + c)
+        elif move.piece_captured != "--":
+            gain = SEE_VALUES[move.piece_captured[1]]
+        else:
+            gain = 0
+        on_square = SEE_VALUES[move.piece_moved[1]]
+        if move.is_pawn_promotion:
+            on_square = SEE_VALUES[move.promotion_piece]
+            gain += on_square - SEE_VALUES["p"]
+
+        # gains[i]: material balance for the side making capture i if the
+        # exchange stopped there
+        gains = [gain]
+        by_white = move.piece_moved[0] == "b"
+        while True:
+            sq = self.least_valuable_attacker(r, c, by_white, removed)
+            if sq is None:
+                break
+            gains.append(on_square - gains[-1])
+            on_square = SEE_VALUES[self.board[sq // 8][sq % 8][1]]
+            removed |= 1 << sq
+            by_white = not by_white
+
+        # Either side may stop recapturing when continuing loses material
+        for i in range(len(gains) - 1, 0, -1):
+            gains[i - 1] = -max(-gains[i - 1], gains[i])
+        return gains[0]
+
+    def all_possible_moves(self, moves=None):
+        """
+        Generate all pseudo-legal moves (may leave king in check).
+        If a list is passed in it is cleared and reused instead of allocating one.
+        """
+        if moves is None:
+            moves = []
+        else:
+            moves.clear()
         for r in range(len(self.board)):
             for c in range(len(self.board[r])):
                 turn = self.board[r][c][0]
@@ -387,7 +974,7 @@ class GameState:
         if self.white_to_move:
             # Forward move
             if r > 0 and self.board[r - 1][c] == "--":
-                moves.append(Move((r, c), (r - 1, c), self.board))
+                self.add_pawn_move((r, c), (r - 1, c), moves)
                 # Double move from starting position
                 if r == 6 and self.board[r - 2][c] == "--":
                     moves.append(Move((r, c), (r - 2, c), self.board))
@@ -397,7 +984,7 @@ class GameState:
                 end_c = c + d_col
                 if 0 <= end_c < 8 and r > 0:
                     if self.board[r - 1][end_c][0] == "b":
-                        moves.append(Move((r, c), (r - 1, end_c), self.board))
+                        self.add_pawn_move((r, c), (r - 1, end_c), moves)
                     elif (r - 1, end_c) == self.enpassant_possible:
                         moves.append(
                             Move((r, c), (r - 1, end_c), self.board, is_enpassant=True)
@@ -405,7 +992,7 @@ class GameState:
 
         else:  # Black
             if r < 7 and self.board[r + 1][c] == "--":
-                moves.append(Move((r, c), (r + 1, c), self.board))
+                self.add_pawn_move((r, c), (r + 1, c), moves)
                 if r == 1 and self.board[r + 2][c] == "--":
                     moves.append(Move((r, c), (r + 2, c), self.board))
 
@@ -413,12 +1000,20 @@ class GameState:
                 end_c = c + d_col
                 if 0 <= end_c < 8 and r < 7:
                     if self.board[r + 1][end_c][0] == "w":
-                        moves.append(Move((r, c), (r + 1, end_c), self.board))
+                        self.add_pawn_move((r, c), (r + 1, end_c), moves)
                     elif (r + 1, end_c) == self.enpassant_possible:
                         moves.append(
                             Move((r, c), (r + 1, end_c), self.board, is_enpassant=True)
                         )
 
+    def add_pawn_move(self, start_sq, end_sq, moves):
+        """Append a pawn move; on the last rank add one move per promotion piece."""
+        if end_sq[0] == 0 or end_sq[0] == 7:
+            for piece in PROMOTION_PIECES:
+                moves.append(Move(start_sq, end_sq, self.board, promotion_piece=piece))
+        else:
+            moves.append(Move(start_sq, end_sq, self.board))
+
     def get_rook_moves(self, r, c, moves):
         """Generate rook moves (horizontal and vertical lines)."""
         directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
@@ -607,8 +1202,36 @@ class Castle_R:
         self.b_q_s = black_queen_side
 
 
+# Packed move encoding: bits 0-5 start square, 6-11 end square (square =
+# row * 8 + col), 12-14 flags, 15-17 promotion piece.
+FLAG_ENPASSANT = 1 << 12
+FLAG_CASTLE = 1 << 13
+FLAG_PROMOTION = 1 << 14
+PROMOTION_SHIFT = 15
+PROMOTION_PIECES = ["q", "r", "b", "n"]
+PROMOTION_CODES = {"q": 1, "r": 2, "b": 3, "n": 4}
+
+
 class Move:
-    """Represents a single chess move with notation support."""
+    """
+    Represents a single chess move with notation support.
+    Uses __slots__ to avoid a per-instance __dict__; move_id packs the move into
+    one int for hashing, comparison and storage in tables.
+    """
+
+    __slots__ = (
+        "start_r",
+        "start_c",
+        "end_r",
+        "end_c",
+        "piece_moved",
+        "piece_captured",
+        "is_enpassant",
+        "is_castle",
+        "is_pawn_promotion",
+        "promotion_piece",
+        "move_id",
+    )
 
     # Board coordinate mappings
     cols_to_files = {0: "a", 1: "b", 2: "c", 3: "d", 4: "e", 5: "f", 6: "g", 7: "h"}
@@ -627,6 +1250,7 @@ class Move:
         is_enpassant=False,
         double_move=False,
         is_castle=False,
+        promotion_piece=None,
     ):
         self.start_r, self.start_c = start_sq
         self.end_r, self.end_c = end_sq
@@ -637,34 +1261,66 @@ class Move:
 
         # enpassant and castle booleans
         self.is_enpassant = is_enpassant
-        self.double_move = double_move
         self.is_castle = is_castle
 
-        # get which piece is captured, moved and if is captured for engine
-        self.is_capture = (self.piece_captured != "--") or self.is_enpassant
-        self.captured_piece_type = None
-        if self.piece_captured != "--":
-            self.captured_piece_type = self.piece_captured[1]  # 'p','n','b','r','q','k'
-        self.moved_piece_type = self.piece_moved[1]
+        move_id = (self.start_r << 3 | self.start_c) | (
+            self.end_r << 3 | self.end_c
+        ) << 6
+        if is_enpassant:
+            move_id |= FLAG_ENPASSANT
+        if is_castle:
+            move_id |= FLAG_CASTLE
 
-        # Check if pawn reaches promotion rank
-        self.is_pawn_promotion = False
+        # Check if pawn reaches promotion rank; default to a queen
         if (self.piece_moved == "wp" and self.end_r == 0) or (
             self.piece_moved == "bp" and self.end_r == 7
         ):
             self.is_pawn_promotion = True
+            self.promotion_piece = promotion_piece or "q"
+            move_id |= FLAG_PROMOTION | (
+                PROMOTION_CODES[self.promotion_piece] << PROMOTION_SHIFT
+            )
+        else:
+            self.is_pawn_promotion = False
+            self.promotion_piece = None
+        self.move_id = move_id
+
+    # get which piece is captured, moved and if is captured for engine
+    @property
+    def is_capture(self):
+        return self.piece_captured != "--" or self.is_enpassant
+
+    @property
+    def captured_piece_type(self):
+        if self.piece_captured != "--":
+            return self.piece_captured[1]  # 'p','n','b','r','q','k'
+        return None
+
+    @property
+    def moved_piece_type(self):
+        return self.piece_moved[1]
+
+    @property
+    def double_move(self):
+        return self.piece_moved[1] == "p" and abs(self.start_r - self.end_r) == 2
+
+    @property
+    def start_sq(self):
+        return self.move_id & 63
+
+    @property
+    def end_sq(self):
+        return (self.move_id >> 6) & 63
 
     def __eq__(self, other):
-        """Compare moves by start and end positions."""
+        """Compare moves by start and end positions (and promotion piece)."""
         if isinstance(other, Move):
-            return (
-                self.start_r == other.start_r
-                and self.start_c == other.start_c
-                and self.end_r == other.end_r
-                and self.end_c == other.end_c
-            )
+            return self.move_id == other.move_id
         return False
 
+    def __hash__(self):
+        return self.move_id
+
     def get_chess_notation(self):
         """Convert move to standard chess notation (e.g., 'e4', 'Nf3', 'exd5')."""
         move_str = ""
@@ -680,6 +1336,8 @@ class Move:
                 )
             else:
                 move_str += self.get_rank_file(self.end_r, self.end_c)
+            if self.is_pawn_promotion:
+                move_str += "=" + self.promotion_piece.upper()
         else:
             # Piece moves
             if self.piece_captured != "--":
@@ -689,6 +1347,15 @@ class Move:
 
         return move_str
 
+    def get_uci_notation(self):
+        """Long algebraic / UCI notation (e.g. 'e2e4', 'e7e8q')."""
+        move_str = self.get_rank_file(self.start_r, self.start_c) + self.get_rank_file(
+            self.end_r, self.end_c
+        )
+        if self.is_pawn_promotion:
+            move_str += self.promotion_piece
+        return move_str
+
     def get_rank_file(self, r, c):
         """Convert row/col to chess notation (e.g., (0,4) -> 'e8')."""
         return self.cols_to_files[c] + self.rows_to_ranks[r]
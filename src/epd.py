@@ -0,0 +1,221 @@
+"""
+EPD test-suite runner: how many positions the search solves, and how fast.
+
+Each EPD line is a FEN (the first four fields, plus hmvc/fmvn operations if
+present) followed by operations such as bm (best moves), am (moves to avoid)
+and id. Positions are solved in parallel, one per worker process, each with a
+time limit. A position counts as solved when the search's final move is a bm
+move (or not an am move), and its time and nodes to solution are taken from
+the first iteration after which the best move stayed correct.
+
+    python -m src.epd suites/wac.epd --time 5 --workers 8
+"""
+
+import argparse
+import os
+import re
+import time
+from multiprocessing import Pool
+
+from src.bitbase import bitbases
+from src.book_compiler import san_to_move
+from src.Engine_Move import MAX_PLY
+from src.perft import new_state
+from src.search import Searcher, SearchOptions
+
+OPERATION = re.compile(r'\s*(\w+)((?:\s+(?:"[^"]*"|[^;"\s]+))*)\s*;')
+
+
+class EPDPosition:
+    """One EPD record: its FEN, operations and the parsed bm/am moves (as UCI)."""
+
+    def __init__(self, fen, operations, best=(), avoid=()):
+        self.fen = fen
+        self.operations = operations
+        self.best = list(best)
+        self.avoid = list(avoid)
+
+    @property
+    def id(self):
+        return self.operations.get("id", "").strip('"') or self.fen
+
+    def is_correct(self, uci):
+        if self.best and uci not in self.best:
+            return False
+        return uci not in self.avoid
+
+
+def parse_operations(text):
+    """{opcode: operand string} for the operations part of an EPD line."""
+    return {opcode: operand.strip() for opcode, operand in OPERATION.findall(text)}
+
+
+def parse_move(text, valid_moves):
+    """A move in SAN (as in EPD) or UCI notation, or None."""
+    move = san_to_move(text, valid_moves)
+    if move is None:
+        for candidate in valid_moves:
+            if candidate.get_uci_notation() == text:
+                return candidate
+    return move
+
+
+def parse_epd(line):
+    """EPDPosition for one EPD line, or None for blank lines and comments."""
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    fields = line.split(None, 4)
+    operations = parse_operations(fields[4] if len(fields) > 4 else "")
+    fen = " ".join(fields[:4])
+    fen += f" {operations.get('hmvc', '0')} {operations.get('fmvn', '1')}"
+
+    gs = new_state(fen)
+    valid_moves = gs.get_valid_moves()
+    moves = {}
+    for opcode in ("bm", "am"):
+        moves[opcode] = []
+        for text in operations.get(opcode, "").split():
+            move = parse_move(text, valid_moves)
+            if move is None:
+                raise ValueError(f"{opcode} {text} is not a legal move in {fen}")
+            moves[opcode].append(move.get_uci_notation())
+    return EPDPosition(fen, operations, moves["bm"], moves["am"])
+
+
+def load_epd(path):
+    positions = []
+    with open(path) as f:
+        for line in f:
+            position = parse_epd(line)
+            if position is not None:
+                positions.append(position)
+    return positions
+
+
+# Per-process searcher, so its tables are allocated once per worker
+_searcher = None
+
+
+def _init_worker(options):
+    # Tables the parent generated are mapped; workers never generate
+    if options.bitbases:
+        bitbases.load(generate_missing=False)
+
+
+def solve(args):
+    """
+    Pool worker: search one position. Returns (index, move, solved, seconds
+    to solution, nodes to solution, depth reached, total nodes).
+    """
+    global _searcher
+    index, position, options, time_limit, node_limit, bitboard = args
+    if _searcher is None or vars(_searcher.options) != vars(options):
+        _searcher = Searcher(options)
+    _searcher.tt.clear()
+    gs = new_state(position.fen, bitboard)
+    solution = None
+    start = time.perf_counter()
+
+    def iteration(result):
+        nonlocal solution
+        if not position.is_correct(result.move.get_uci_notation()):
+            solution = None
+        elif solution is None:
+            solution = (time.perf_counter() - start, result.nodes)
+
+    result = _searcher.search(
+        gs, gs.get_valid_moves(), MAX_PLY, time_limit, node_limit, on_iteration=iteration
+    )
+    uci = result.move.get_uci_notation() if result.move else None
+    solved = uci is not None and position.is_correct(uci)
+    if solved and solution is None:
+        # Found in the iteration the budget cut short
+        solution = (time.perf_counter() - start, result.nodes)
+    seconds, nodes = solution if solved else (None, None)
+    return index, uci, solved, seconds, nodes, result.depth, result.nodes
+
+
+def run_suite(
+    positions,
+    time_limit=1.0,
+    node_limit=None,
+    workers=None,
+    options=None,
+    bitboard=True,
+    verbose=True,
+):
+    """
+    Solve every position and return a list of result tuples (see solve) in
+    suite order, printing one line per position as it finishes and a
+    summary: solved count, mean time and nodes to solution, and a time score
+    that gives each solved position 1 - time to solution / time limit.
+    """
+    workers = workers or os.cpu_count() or 1
+    options = options if options is not None else SearchOptions()
+    jobs = [
+        (i, position, options, time_limit, node_limit, bitboard)
+        for i, position in enumerate(positions)
+    ]
+    results = [None] * len(positions)
+    start = time.perf_counter()
+    with Pool(workers, initializer=_init_worker, initargs=(options,)) as pool:
+        for row in pool.imap_unordered(solve, jobs):
+            index, uci, solved, seconds, nodes, depth, total_nodes = row
+            results[index] = row
+            if verbose:
+                position = positions[index]
+                expected = " ".join(position.best) or "not " + " ".join(position.avoid)
+                status = f"solved in {seconds:.2f}s / {nodes} nodes" if solved else "failed"
+                print(f"{position.id}: {uci} ({expected}) {status}, depth {depth}")
+    elapsed = time.perf_counter() - start
+
+    solved = [row for row in results if row[2]]
+    print(f"solved {len(solved)}/{len(positions)} in {elapsed:.1f}s")
+    if solved:
+        mean_time = sum(row[3] for row in solved) / len(solved)
+        mean_nodes = sum(row[4] for row in solved) / len(solved)
+        print(f"mean time to solution {mean_time:.2f}s, mean nodes to solution {mean_nodes:.0f}")
+    if time_limit:
+        score = sum(max(0.0, 1 - row[3] / time_limit) for row in solved)
+        print(f"time score {score:.2f} of {len(positions)}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Solve an EPD test suite")
+    parser.add_argument("suite", help="EPD file with bm/am operations")
+    parser.add_argument("--time", type=float, default=1.0, help="seconds per position")
+    parser.add_argument("--nodes", type=int, help="node limit per position")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--mailbox", action="store_true", help="use the GameState backend")
+    for name in (
+        "pvs",
+        "aspiration",
+        "null-move",
+        "lmr",
+        "check-extensions",
+        "quiescence",
+        "bitbases",
+    ):
+        parser.add_argument(f"--no-{name}", action="store_true", help=f"disable {name}")
+    args = parser.parse_args()
+
+    options = SearchOptions(
+        pvs=not args.no_pvs,
+        aspiration=not args.no_aspiration,
+        null_move=not args.no_null_move,
+        lmr=not args.no_lmr,
+        check_extensions=not args.no_check_extensions,
+        quiescence=not args.no_quiescence,
+        bitbases=not args.no_bitbases,
+    )
+    if options.bitbases:
+        bitbases.load()
+    run_suite(
+        load_epd(args.suite), args.time, args.nodes, args.workers, options, not args.mailbox
+    )
+
+
+if __name__ == "__main__":
+    main()
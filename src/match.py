@@ -0,0 +1,362 @@
+"""
+Headless engine-vs-engine matches over a process pool, to tell whether a
+search or evaluation change is an improvement.
+
+Each opening is played twice with colours swapped. The result is reported as
+an Elo difference for engine A with a 95% error bar, and as a sequential
+probability ratio test (SPRT) of elo0 against elo1, which can stop the match
+as soon as it reaches a verdict. Engines are given as name:key=value,...
+with the keys time, nodes, depth and search (negamax or minimax), plus any
+SearchOptions switch set to 0 or 1:
+
+    python -m src.match --a "new:time=0.1" --b "old:time=0.1,lmr=0" --games 2000 --sprt
+"""
+
+import argparse
+import math
+import os
+import random
+import time
+from collections import Counter
+from multiprocessing import Pool
+
+import book
+import polyglot_book
+import src.Engine_Move as E
+from src.bitbase import bitbases
+from src.perft import new_state
+from src.search import Searcher, SearchOptions
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+DEFAULT_MAX_PLIES = 300
+OPENING_PLIES = 8
+
+# Each side's score for a result from white's point of view
+RESULT_SCORES = {"1-0": 1.0, "1/2-1/2": 0.5, "0-1": 0.0}
+
+
+class Player:
+    """One engine configuration: search budget and SearchOptions switches."""
+
+    def __init__(
+        self,
+        name="engine",
+        time_limit=None,
+        node_limit=None,
+        depth=E.MAX_PLY,
+        search="negamax",
+        options=None,
+    ):
+        if time_limit is None and node_limit is None and depth >= E.MAX_PLY:
+            time_limit = 0.1  # Some budget is needed to ever finish a move
+        self.name = name
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.depth = depth
+        self.search = search
+        self.options = options if options is not None else SearchOptions()
+
+    @classmethod
+    def parse(cls, spec):
+        """Player from "name:key=value,..." (see the module docstring)."""
+        name, _, settings = spec.partition(":")
+        kwargs = {}
+        switches = {}
+        for item in filter(None, settings.split(",")):
+            key, _, value = item.partition("=")
+            key = key.strip().replace("-", "_")
+            if key == "time":
+                kwargs["time_limit"] = float(value)
+            elif key == "nodes":
+                kwargs["node_limit"] = int(value)
+            elif key == "depth":
+                kwargs["depth"] = int(value)
+            elif key == "search":
+                kwargs["search"] = value
+            elif hasattr(SearchOptions(), key):
+                switches[key] = value not in ("0", "false", "off")
+            else:
+                raise ValueError(f"unknown engine setting {key!r} in {spec!r}")
+        return cls(name or "engine", options=SearchOptions(**switches), **kwargs)
+
+    def __repr__(self):
+        return f"Player({self.name!r})"
+
+
+# Per-process searchers, one per player name, set up on first use
+_searchers = {}
+
+
+def _init_worker():
+    # Tables the parent generated are mapped; workers never generate
+    bitbases.load(generate_missing=False)
+
+
+def _best_move(player, gs):
+    moves = gs.get_valid_moves()
+    if player.search == "minimax":
+        result = E.search(gs, moves, player.depth, player.time_limit, player.node_limit)
+    else:
+        searcher = _searchers.get(player.name)
+        if searcher is None:
+            searcher = _searchers[player.name] = Searcher(player.options)
+        result = searcher.search(
+            gs, moves, player.depth, player.time_limit, player.node_limit
+        )
+    return result.move or E.find_random(moves)
+
+
+def insufficient_material(gs):
+    """Only kings, or kings and a single knight or bishop."""
+    minors = 0
+    for row in gs.board:
+        for piece in row:
+            if piece == "--" or piece[1] == "k":
+                continue
+            if piece[1] not in "nb":
+                return False
+            minors += 1
+    return minors <= 1
+
+
+def play_game(args):
+    """
+    Pool worker: play one game from the opening FEN. Returns (result, plies,
+    a_white) with result "1-0", "0-1" or "1/2-1/2".
+    """
+    fen, white, black, a_white, max_plies, bitboard = args
+    for player in (white, black):
+        if player.name in _searchers:
+            _searchers[player.name].tt.clear()
+    gs = new_state(fen, bitboard)
+    seen = Counter([gs.zobrist_key])
+    for ply in range(max_plies):
+        moves = gs.get_valid_moves()
+        if not moves:
+            if gs.checkmate:
+                return ("0-1" if gs.white_to_move else "1-0"), ply, a_white
+            return "1/2-1/2", ply, a_white
+        if gs.halfmove_clock >= 100 or insufficient_material(gs):
+            return "1/2-1/2", ply, a_white
+        gs.make_move(_best_move(white if gs.white_to_move else black, gs))
+        seen[gs.zobrist_key] += 1
+        if seen[gs.zobrist_key] >= 3:
+            return "1/2-1/2", ply + 1, a_white
+    return "1/2-1/2", max_plies, a_white
+
+
+def book_openings(count, plies=OPENING_PLIES, seed=0, path=polyglot_book.BOOK_PATH):
+    """
+    Up to count distinct opening FENs, walked from the start position with
+    weighted random Polyglot book moves for plies plies. Without a usable
+    book the built-in lines of book.py are walked instead, which gives only
+    a handful of openings.
+    """
+    rng = random.Random(seed)
+    polyglot = polyglot_book.open_book(path)
+    openings = []
+    seen = set()
+    for _ in range(count * 20):
+        gs = new_state(START_FEN)
+        for _ in range(plies):
+            if polyglot is not None:
+                move = polyglot.choose(gs, weighted=True, rng=rng)
+            else:
+                valid = gs.get_valid_moves()
+                candidates = book.BOOK_INDEX.get(book.polyglot_key(gs), [])
+                moves = [book.string_to_move(c, gs, valid) for c in candidates]
+                moves = [m for m in moves if m is not None]
+                move = rng.choice(moves) if moves else None
+            if move is None:
+                break
+            gs.make_move(move)
+        fen = gs.board_to_fen()
+        if fen not in seen:
+            seen.add(fen)
+            openings.append(fen)
+            if len(openings) == count:
+                break
+    return openings
+
+
+def score_to_elo(score):
+    """Elo difference for an expected score strictly between 0 and 1."""
+    return -400 * math.log10(1 / score - 1)
+
+
+def elo_to_score(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+class MatchStats:
+    """Wins, draws and losses of engine A, with Elo and SPRT estimates."""
+
+    def __init__(self, elo0=0.0, elo1=5.0, alpha=0.05, beta=0.05):
+        self.wins = self.draws = self.losses = 0
+        self.elo0, self.elo1 = elo0, elo1
+        # SPRT bounds on the log-likelihood ratio
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+
+    @property
+    def games(self):
+        return self.wins + self.draws + self.losses
+
+    def add(self, a_score):
+        if a_score == 1:
+            self.wins += 1
+        elif a_score == 0:
+            self.losses += 1
+        else:
+            self.draws += 1
+
+    def _mean_var(self):
+        n = self.games
+        mean = (self.wins + 0.5 * self.draws) / n
+        var = (self.wins + 0.25 * self.draws) / n - mean**2
+        return mean, var
+
+    def elo(self):
+        """(Elo difference, 95% error margin); infinite while all games agree."""
+        if self.games == 0:
+            return 0.0, math.inf
+        mean, var = self._mean_var()
+        if not 0 < mean < 1:
+            return math.copysign(math.inf, mean - 0.5), math.inf
+        # score_to_elo(0.5) is -0.0; + 0.0 makes it print as +0.0
+        elo = score_to_elo(mean) + 0.0
+        if var <= 0:
+            return elo, math.inf  # All draws: no spread to estimate a margin from
+        margin = 1.96 * math.sqrt(var / self.games)
+        low, high = max(mean - margin, 1e-6), min(mean + margin, 1 - 1e-6)
+        return elo, (score_to_elo(high) - score_to_elo(low)) / 2
+
+    def llr(self):
+        """
+        Log-likelihood ratio of elo1 against elo0, in the normal
+        approximation to the trinomial game results.
+        """
+        if self.games == 0:
+            return 0.0
+        mean, var = self._mean_var()
+        if var <= 0:
+            return 0.0
+        s0, s1 = elo_to_score(self.elo0), elo_to_score(self.elo1)
+        return self.games * (s1 - s0) * (2 * mean - s0 - s1) / (2 * var)
+
+    def verdict(self):
+        """'H1' (A is stronger by elo1), 'H0' (not by more than elo0) or None."""
+        llr = self.llr()
+        if llr >= self.upper:
+            return "H1"
+        if llr <= self.lower:
+            return "H0"
+        return None
+
+    def summary(self):
+        elo, margin = self.elo()
+        return (
+            f"{self.games} games  +{self.wins} ={self.draws} -{self.losses}"
+            f"  Elo {elo:+.1f} +/- {margin:.1f}"
+            f"  LLR {self.llr():.2f} [{self.lower:.2f}, {self.upper:.2f}]"
+        )
+
+
+def run_match(
+    a,
+    b,
+    games,
+    workers=None,
+    openings=None,
+    max_plies=DEFAULT_MAX_PLIES,
+    bitboard=True,
+    sprt=False,
+    stats=None,
+    report_every=10,
+):
+    """
+    Play games between Players a and b over a process pool, alternating
+    colours on each opening, and return the MatchStats. With sprt the match
+    stops as soon as the test reaches a verdict.
+    """
+    if a.name == b.name:
+        raise ValueError("the two engines need different names")
+    workers = workers or os.cpu_count() or 1
+    stats = stats if stats is not None else MatchStats()
+    openings = openings or book_openings((games + 1) // 2)
+    jobs = []
+    for i in range(games):
+        fen = openings[(i // 2) % len(openings)]
+        a_white = i % 2 == 0
+        white, black = (a, b) if a_white else (b, a)
+        jobs.append((fen, white, black, a_white, max_plies, bitboard))
+
+    start = time.perf_counter()
+    plies = 0
+    with Pool(workers, initializer=_init_worker) as pool:
+        for result, game_plies, a_white in pool.imap_unordered(play_game, jobs):
+            score = RESULT_SCORES[result]
+            stats.add(score if a_white else 1 - score)
+            plies += game_plies
+            elapsed = time.perf_counter() - start
+            if stats.games % report_every == 0 or stats.games == games:
+                print(f"{stats.summary()}  {stats.games / elapsed:.2f} games/s")
+            if sprt and stats.verdict() is not None:
+                pool.terminate()
+                break
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"{a.name} vs {b.name}: {stats.summary()}"
+        f"  ({stats.games / elapsed:.2f} games/s, {plies / max(1, stats.games):.0f} plies/game)"
+    )
+    if sprt:
+        verdict = stats.verdict()
+        if verdict == "H1":
+            print(f"SPRT: accept, {a.name} is stronger (elo1 = {stats.elo1})")
+        elif verdict == "H0":
+            print(f"SPRT: reject, {a.name} is not stronger (elo0 = {stats.elo0})")
+        else:
+            print("SPRT: no verdict yet, play more games")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Engine-vs-engine match with Elo and SPRT")
+    parser.add_argument("--a", default="a:time=0.1", help="engine A, name:key=value,...")
+    parser.add_argument("--b", default="b:time=0.1", help="engine B, name:key=value,...")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--max-plies", type=int, default=DEFAULT_MAX_PLIES)
+    parser.add_argument("--openings", help="file with one opening FEN per line")
+    parser.add_argument("--opening-plies", type=int, default=OPENING_PLIES)
+    parser.add_argument("--mailbox", action="store_true", help="use the GameState backend")
+    parser.add_argument("--sprt", action="store_true", help="stop at an SPRT verdict")
+    parser.add_argument("--elo0", type=float, default=0.0)
+    parser.add_argument("--elo1", type=float, default=5.0)
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    args = parser.parse_args()
+
+    # Mapped before the pool starts, so every worker shares the tables
+    bitbases.load()
+    if args.openings:
+        with open(args.openings) as f:
+            openings = [line.strip() for line in f if line.strip()]
+    else:
+        openings = book_openings((args.games + 1) // 2, args.opening_plies)
+    run_match(
+        Player.parse(args.a),
+        Player.parse(args.b),
+        args.games,
+        args.workers,
+        openings,
+        args.max_plies,
+        not args.mailbox,
+        args.sprt,
+        MatchStats(args.elo0, args.elo1, args.alpha, args.beta),
+    )
+
+
+if __name__ == "__main__":
+    main()
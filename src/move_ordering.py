@@ -0,0 +1,83 @@
+"""
+Move ordering for alpha-beta search.
+
+The best move searched first gives the most cutoffs, so moves are scored
+without generating anything: TT move, then captures by MVV-LVA (most valuable
+victim, least valuable attacker), then killer moves, then quiet moves by their
+history score.
+"""
+
+# Piece ranks for MVV-LVA
+ORDER_VALUE = {"p": 1, "n": 2, "b": 3, "r": 4, "q": 5, "k": 6}
+
+TT_MOVE_SCORE = 1_000_000
+CAPTURE_SCORE = 100_000
+KILLER_SCORES = (90_000, 80_000)
+# History scores are halved once any of them reaches this, so they always
+# rank below killers
+HISTORY_LIMIT = 50_000
+
+# Lower 12 bits of Move.move_id: start and end square
+FROM_TO_MASK = 0xFFF
+
+
+class MoveOrderer:
+    """Killer slots per ply and a butterfly history table, kept across a search."""
+
+    def __init__(self, max_ply=64):
+        self.max_ply = max_ply
+        self.killers = [[None, None] for _ in range(max_ply)]
+        # history[color][from_to]: credit for quiet moves that caused cutoffs
+        self.history = [[0] * 4096, [0] * 4096]
+
+    def new_search(self):
+        """Forget killers and age the history before a new root search."""
+        self.killers = [[None, None] for _ in range(self.max_ply)]
+        for table in self.history:
+            for i in range(4096):
+                table[i] >>= 1
+
+    def score(self, move, ply, tt_move_id=None):
+        if move.move_id == tt_move_id:
+            return TT_MOVE_SCORE
+        if move.piece_captured != "--":
+            return (
+                CAPTURE_SCORE
+                + ORDER_VALUE[move.piece_captured[1]] * 10
+                - ORDER_VALUE[move.piece_moved[1]]
+            )
+        if move.is_enpassant:
+            return CAPTURE_SCORE + ORDER_VALUE["p"] * 10 - ORDER_VALUE["p"]
+        if move.is_pawn_promotion:
+            # Rank promotions with captures, queen first
+            return CAPTURE_SCORE + ORDER_VALUE[move.promotion_piece]
+        if ply < self.max_ply:
+            killers = self.killers[ply]
+            if move.move_id == killers[0]:
+                return KILLER_SCORES[0]
+            if move.move_id == killers[1]:
+                return KILLER_SCORES[1]
+        color = 0 if move.piece_moved[0] == "w" else 1
+        return self.history[color][move.move_id & FROM_TO_MASK]
+
+    def order(self, moves, ply=0, tt_move_id=None):
+        """Sort moves in place, best first, and return the list."""
+        moves.sort(key=lambda m: self.score(m, ply, tt_move_id), reverse=True)
+        return moves
+
+    def record_cutoff(self, move, ply, depth):
+        """Credit a quiet move that caused a beta cutoff."""
+        if move.is_capture or move.is_pawn_promotion:
+            return
+        if ply < self.max_ply:
+            killers = self.killers[ply]
+            if killers[0] != move.move_id:
+                killers[1] = killers[0]
+                killers[0] = move.move_id
+        table = self.history[0 if move.piece_moved[0] == "w" else 1]
+        index = move.move_id & FROM_TO_MASK
+        table[index] += depth * depth
+        if table[index] >= HISTORY_LIMIT:
+            for t in self.history:
+                for i in range(4096):
+                    t[i] >>= 1
@@ -0,0 +1,275 @@
+"""
+Multi-core search by splitting the root moves over a process pool.
+
+Every iteration searches the first (best so far) root move in this process
+with a full window, then hands the remaining root moves to the workers. Each
+worker owns its GameState and Searcher and tests its move with a null window
+against the best score found so far, which is kept in a shared value so a
+better move found by one worker tightens the window of all the others. Only
+moves that beat it are searched again with an open window. By default all
+processes share one transposition table in shared memory.
+
+    python -m src.parallel --workers 8 --depth 5
+"""
+
+import argparse
+import math
+import os
+import time
+from multiprocessing import Event, Pool, TimeoutError, Value
+
+from src.bitbase import bitbases
+from src.Engine_Move import (
+    MATE,
+    MAX_PLY,
+    SearchLimits,
+    SearchResult,
+    SearchStats,
+    SearchTimeout,
+)
+from src.perft import POSITIONS, new_state
+from src.search import NULL_WINDOW, Searcher, SearchOptions
+from src.transposition import SharedTranspositionTable
+
+# Per-process state of a pool worker, set by _init_worker
+_searcher = None
+_shared_alpha = None
+_search_id = None
+_stop = None
+
+
+def _init_worker(shared_alpha, stop, options, tt):
+    global _searcher, _shared_alpha, _stop
+    _searcher = Searcher(options, tt)
+    # Tables the parent generated are mapped; workers never generate
+    if options.bitbases:
+        bitbases.load(generate_missing=False)
+    _shared_alpha = shared_alpha
+    _stop = stop
+
+
+def _raise_alpha(shared_alpha, score):
+    with shared_alpha.get_lock():
+        if score > shared_alpha.value:
+            shared_alpha.value = score
+
+
+def _search_root_move(args):
+    """
+    Pool worker: search one root move to depth. Returns (move_id, score, pv,
+    nodes, exact, stats) where exact is False when the move only failed low
+    (its score is an upper bound), or score None if the deadline passed first.
+    """
+    global _search_id
+    search_id, fen, bitboard, move_id, depth, deadline, node_limit = args
+    if search_id != _search_id:
+        # First task of a new root search: age the TT, reset killers
+        _search_id = search_id
+        _searcher.tt.new_search()
+        _searcher.orderer.new_search()
+    gs = new_state(fen, bitboard)
+    _searcher.set_root(gs)
+    move = next(m for m in gs.get_valid_moves() if m.move_id == move_id)
+    gs.make_move(move)
+    time_limit = None if deadline is None else max(0.0, deadline - time.time())
+    _searcher.limits = SearchLimits(time_limit, node_limit, _stop)
+    _searcher.stats = SearchStats()
+    try:
+        alpha = _shared_alpha.value
+        score = -_searcher.negamax(gs, depth - 1, -alpha - NULL_WINDOW, -alpha, 1)
+        exact = False
+        if score > alpha:
+            # Better than everything so far: get its real score
+            alpha = _shared_alpha.value
+            score = -_searcher.negamax(gs, depth - 1, -float("inf"), -alpha, 1)
+            exact = score > alpha
+            if exact:
+                _raise_alpha(_shared_alpha, score)
+        pv = [move] + _searcher.pv_table[1]
+    except SearchTimeout:
+        score, pv, exact = None, [], False
+    nodes = _searcher.limits.nodes
+    _searcher.limits = None
+    return move_id, score, pv, nodes, exact, _searcher.stats
+
+
+class ParallelSearcher:
+    """
+    Root-splitting search over a pool of worker processes. search() has the
+    same contract as Searcher.search; node_limit applies to each root move.
+    With shared_tt every process uses one SharedTranspositionTable of hash_mb
+    MB instead of a private table each.
+    """
+
+    def __init__(self, workers=None, options=None, bitboard=True, shared_tt=True, hash_mb=32):
+        self.workers = workers or os.cpu_count() or 1
+        self.options = options if options is not None else SearchOptions()
+        self.bitboard = bitboard
+        self.tt = SharedTranspositionTable(hash_mb) if shared_tt else None
+        self.shared_alpha = Value("d", -math.inf)
+        # Set to stop the workers when the caller cancels a search
+        self.stop_event = Event()
+        self.pool = Pool(
+            self.workers,
+            initializer=_init_worker,
+            initargs=(self.shared_alpha, self.stop_event, self.options, self.tt),
+        )
+        # Searches the first root move of each iteration in this process
+        self.searcher = Searcher(self.options, self.tt)
+        self.search_id = 0
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+        if self.tt is not None:
+            self.tt.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def search(
+        self,
+        gs,
+        valid_moves,
+        depth,
+        time_limit=None,
+        node_limit=None,
+        on_iteration=None,
+        cancel=None,
+    ):
+        if depth == 0 or len(valid_moves) == 0:
+            return self.searcher.search(gs, valid_moves, depth)
+
+        self.stop_event.clear()
+        self.search_id += 1
+        self.searcher.tt.new_search()
+        self.searcher.orderer.new_search()
+        self.searcher.set_root(gs)
+        fen = gs.board_to_fen()
+        sign = 1 if gs.white_to_move else -1
+        deadline = None if time_limit is None else time.time() + time_limit
+        root_moves = list(valid_moves)
+        stats = self.searcher.stats = SearchStats()
+        result = SearchResult(root_moves[0], stats=stats)
+        nodes = 0
+
+        for d in range(1, depth + 1):
+            # Young brothers wait: the first move sets the window for the rest
+            remaining = None if deadline is None else deadline - time.time()
+            if remaining is not None and remaining <= 0:
+                break
+            first = root_moves[0]
+            self.searcher.limits = SearchLimits(remaining, node_limit, cancel)
+            gs.make_move(first)
+            root_len = len(gs.move_log)
+            try:
+                best = -self.searcher.negamax(gs, d - 1, -float("inf"), float("inf"), 1)
+                best_pv = [first] + self.searcher.pv_table[1]
+            except SearchTimeout:
+                while len(gs.move_log) > root_len:
+                    gs.undo()
+                best = None
+            gs.undo()
+            nodes += self.searcher.limits.nodes
+            self.searcher.limits = None
+            if best is None:
+                break
+            self.shared_alpha.value = best
+
+            jobs = [
+                (self.search_id, fen, self.bitboard, move.move_id, d, deadline, node_limit)
+                for move in root_moves[1:]
+            ]
+            scores = {first.move_id: best}
+            finished = True
+            best_move = first
+            for move_id, score, pv, move_nodes, exact, move_stats in self._results(
+                jobs, cancel
+            ):
+                nodes += move_nodes
+                stats.merge(move_stats)
+                if score is None:
+                    finished = False
+                    continue
+                scores[move_id] = score
+                if exact and score > best:
+                    best, best_pv, best_move = score, pv, pv[0]
+
+            # A move that beat the first one is good even in an unfinished
+            # iteration, as the first move was fully searched
+            if finished:
+                stats.end_iteration(d, nodes)
+            if finished or best_move is not first:
+                result = SearchResult(best_move, best * sign, d, best_pv, nodes, stats)
+                if on_iteration is not None:
+                    on_iteration(result)
+            if not finished or abs(best) >= MATE - MAX_PLY:
+                break
+            # Next iteration: best move first, the others by their scores
+            root_moves.sort(key=lambda m: scores.get(m.move_id, -float("inf")), reverse=True)
+
+        result.nodes = stats.nodes = nodes
+        return result
+
+    def _results(self, jobs, cancel):
+        """Worker results as they arrive, passing a cancel on to the workers."""
+        results = self.pool.imap_unordered(_search_root_move, jobs)
+        for _ in jobs:
+            while True:
+                try:
+                    yield results.next(timeout=0.05)
+                    break
+                except TimeoutError:
+                    if cancel is not None and cancel.is_set():
+                        self.stop_event.set()
+
+
+def speedup_report(workers, depth, time_limit=None, names=None, shared_tt=True):
+    """
+    Time a single-process Searcher and a ParallelSearcher to the same depth on
+    the reference positions and print the speedup of each.
+    """
+    names = names or ["initial", "kiwipete", "position3", "position4", "position6"]
+    total_single = total_parallel = 0.0
+    with ParallelSearcher(workers, shared_tt=shared_tt) as parallel:
+        for name in names:
+            fen = POSITIONS[name][0]
+            gs = new_state(fen)
+            start = time.perf_counter()
+            single = Searcher().search(gs, gs.get_valid_moves(), depth, time_limit)
+            single_time = time.perf_counter() - start
+
+            gs = new_state(fen)
+            start = time.perf_counter()
+            par = parallel.search(gs, gs.get_valid_moves(), depth, time_limit)
+            parallel_time = time.perf_counter() - start
+
+            total_single += single_time
+            total_parallel += parallel_time
+            print(
+                f"{name}: 1 core {single_time:.2f}s ({single.move.get_uci_notation()}"
+                f" {single.score:.2f})  {workers} workers {parallel_time:.2f}s"
+                f" ({par.move.get_uci_notation()} {par.score:.2f})"
+                f"  speedup {single_time / parallel_time:.2f}x"
+            )
+    print(f"total speedup {total_single / total_parallel:.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel root-split search speedup")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--time", type=float, help="time limit per search in seconds")
+    parser.add_argument("--position", action="append", choices=sorted(POSITIONS))
+    parser.add_argument(
+        "--private-tt", action="store_true", help="one table per process instead of shared"
+    )
+    args = parser.parse_args()
+    speedup_report(args.workers, args.depth, args.time, args.position, not args.private_tt)
+
+
+if __name__ == "__main__":
+    main()
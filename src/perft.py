@@ -0,0 +1,168 @@
+"""
+Perft: count the leaf nodes of the legal move tree to a fixed depth.
+
+Counts are compared against published reference numbers, so any bug in move
+generation, make_move or undo (en passant, castling, promotion...) shows up as
+a mismatch. Run from the repository root:
+
+    python -m src.perft --position kiwipete --depth 3
+    python -m src.perft --suite --depth 3 --mailbox
+    python -m src.perft --fen "<fen>" --depth 4 --divide --workers 4
+"""
+
+import argparse
+import time
+from multiprocessing import Pool
+
+from src.bitboard import BitboardGameState
+from src.chess_engine import GameState
+
+
+# Reference positions and their known node counts per depth
+POSITIONS = {
+    "initial": (
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+        {1: 20, 2: 400, 3: 8902, 4: 197281, 5: 4865609},
+    ),
+    "kiwipete": (
+        "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        {1: 48, 2: 2039, 3: 97862, 4: 4085603},
+    ),
+    "position3": (
+        "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+        {1: 14, 2: 191, 3: 2812, 4: 43238, 5: 674624},
+    ),
+    "position4": (
+        "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+        {1: 6, 2: 264, 3: 9467, 4: 422333},
+    ),
+    "position5": (
+        "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+        {1: 44, 2: 1486, 3: 62379, 4: 2103487},
+    ),
+    "position6": (
+        "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+        {1: 46, 2: 2079, 3: 89890, 4: 3894594},
+    ),
+}
+
+
+def new_state(fen, bitboard=True):
+    return (BitboardGameState if bitboard else GameState).from_fen(fen)
+
+
+def perft(gs, depth, table=None, buffers=None):
+    """
+    Number of leaf nodes depth plies below gs. Moves at the last ply are
+    counted rather than made (bulk counting). table, if given, is a dict
+    caching counts by (zobrist_key, depth).
+    """
+    if depth == 0:
+        return 1
+    if buffers is None:
+        buffers = [[] for _ in range(depth + 1)]
+    if table is not None:
+        key = (gs.zobrist_key, depth)
+        if key in table:
+            return table[key]
+
+    moves = gs.get_valid_moves(buffers[depth])
+    if depth == 1:
+        nodes = len(moves)
+    else:
+        nodes = 0
+        for move in moves:
+            gs.make_move(move)
+            nodes += perft(gs, depth - 1, table, buffers)
+            gs.undo()
+
+    if table is not None:
+        table[key] = nodes
+    return nodes
+
+
+def _perft_root_move(args):
+    """Pool worker: play one root move on a fresh state and count below it."""
+    fen, move_id, depth, bitboard, use_hash = args
+    gs = new_state(fen, bitboard)
+    for move in gs.get_valid_moves():
+        if move.move_id == move_id:
+            gs.make_move(move)
+            return move_id, perft(gs, depth - 1, {} if use_hash else None)
+    raise ValueError("root move not found")
+
+
+def divide(fen, depth, bitboard=True, use_hash=False, workers=1):
+    """
+    Per-root-move node counts as a list of (uci, nodes). With workers > 1 the
+    root moves are split across a process pool.
+    """
+    gs = new_state(fen, bitboard)
+    moves = gs.get_valid_moves()
+    if depth <= 1:
+        return [(move.get_uci_notation(), 1) for move in moves]
+
+    jobs = [(fen, move.move_id, depth, bitboard, use_hash) for move in moves]
+    if workers > 1:
+        with Pool(workers) as pool:
+            results = dict(pool.map(_perft_root_move, jobs))
+    else:
+        results = dict(map(_perft_root_move, jobs))
+    return [(move.get_uci_notation(), results[move.move_id]) for move in moves]
+
+
+def run(fen, depth, bitboard=True, use_hash=False, workers=1, show_divide=False):
+    """Run perft (or divide) and print nodes, time and nodes per second."""
+    start = time.perf_counter()
+    if show_divide or workers > 1:
+        counts = divide(fen, depth, bitboard, use_hash, workers)
+        nodes = sum(n for _, n in counts)
+        if show_divide:
+            for uci, n in sorted(counts):
+                print(f"{uci}: {n}")
+    else:
+        nodes = perft(new_state(fen, bitboard), depth, {} if use_hash else None)
+    elapsed = time.perf_counter() - start
+    nps = nodes / elapsed if elapsed > 0 else 0.0
+    print(f"depth {depth}  nodes {nodes}  time {elapsed:.3f}s  nps {nps:.0f}")
+    return nodes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perft / divide for GameState")
+    parser.add_argument("--position", choices=sorted(POSITIONS), default="initial")
+    parser.add_argument("--fen", help="FEN to search instead of a named position")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--divide", action="store_true", help="print per-move counts")
+    parser.add_argument("--hash", action="store_true", help="cache counts by Zobrist key")
+    parser.add_argument("--workers", type=int, default=1, help="split root moves")
+    parser.add_argument("--mailbox", action="store_true", help="use the GameState backend")
+    parser.add_argument(
+        "--suite", action="store_true", help="check every reference position"
+    )
+    args = parser.parse_args()
+
+    if args.suite:
+        failed = 0
+        for name, (fen, expected) in POSITIONS.items():
+            depth = min(args.depth, max(expected))
+            print(f"{name}: ", end="")
+            nodes = run(fen, depth, not args.mailbox, args.hash, args.workers)
+            if nodes != expected[depth]:
+                print(f"  MISMATCH: expected {expected[depth]}")
+                failed += 1
+        print("all positions match" if failed == 0 else f"{failed} position(s) failed")
+        raise SystemExit(1 if failed else 0)
+
+    if args.fen:
+        fen, expected = args.fen, {}
+    else:
+        fen, expected = POSITIONS[args.position]
+    nodes = run(fen, args.depth, not args.mailbox, args.hash, args.workers, args.divide)
+    if args.depth in expected and nodes != expected[args.depth]:
+        print(f"MISMATCH: expected {expected[args.depth]}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+Opt-in profiling of the engine's hot paths.
+
+enable() wraps make_move, undo, move generation, the pin/check and attack
+queries, SEE, evaluate_board and move ordering with timers; disable() puts
+the original functions back, so nothing is measured (or slowed down) unless
+profiling is on. Every call is recorded under its stack of instrumented
+callers, which gives call counts, total and self time per function, and can
+be written as collapsed stacks (flamegraph.pl, inferno) or as a speedscope
+profile.
+
+Profile a headless search:
+
+    python -m src.profiling --position kiwipete --depth 4 --speedscope search.json
+
+or set CHESS_PROFILE to an output file (".json" for speedscope, anything
+else for collapsed stacks) before starting the game or the UCI engine.
+"""
+
+import argparse
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+import src.Engine_Move as E
+from src.bitboard import BitboardGameState
+from src.chess_engine import GameState
+from src.move_ordering import MoveOrderer
+
+ENV_VAR = "CHESS_PROFILE"
+ROOT = "search"
+
+# (owner, attribute, label) of everything instrumented
+TARGETS = [
+    (GameState, "make_move", "make_move"),
+    (GameState, "undo", "undo"),
+    (GameState, "get_valid_moves", "get_valid_moves"),
+    (GameState, "all_possible_moves", "all_possible_moves"),
+    (GameState, "get_pins_and_checks", "get_pins_and_checks"),
+    (GameState, "is_square_attacked", "is_square_attacked"),
+    (GameState, "square_under_att", "square_under_att"),
+    (GameState, "see", "see"),
+    (BitboardGameState, "make_move", "bitboard.make_move"),
+    (BitboardGameState, "undo", "bitboard.undo"),
+    (BitboardGameState, "get_valid_moves", "bitboard.get_valid_moves"),
+    (BitboardGameState, "all_possible_moves", "bitboard.all_possible_moves"),
+    (BitboardGameState, "attackers_to", "bitboard.attackers_to"),
+    (BitboardGameState, "pinned_pieces", "bitboard.pinned_pieces"),
+    (BitboardGameState, "is_attacked", "bitboard.is_attacked"),
+    (E, "evaluate_board", "evaluate_board"),
+    (E, "order_moves", "order_moves"),
+    (MoveOrderer, "order", "MoveOrderer.order"),
+]
+
+
+class Profile:
+    """
+    Timings by call stack: records maps a tuple of labels (outermost first)
+    to [calls, total ns, self ns].
+    """
+
+    def __init__(self):
+        self.records = {}
+        self.local = threading.local()
+        self.start = time.perf_counter_ns()
+        self.stop = None
+
+    def wrap(self, label, func):
+        records = self.records
+        local = self.local
+        clock = time.perf_counter_ns
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            parent = getattr(local, "path", ())
+            path = parent + (label,)
+            local.path = path
+            children = getattr(local, "children", None)
+            if children is None:
+                children = local.children = []
+            children.append(0)
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                inner = children.pop()
+                if children:
+                    children[-1] += elapsed
+                local.path = parent
+                record = records.get(path)
+                if record is None:
+                    record = records[path] = [0, 0, 0]
+                record[0] += 1
+                record[1] += elapsed
+                record[2] += elapsed - inner
+
+        timed.__profiled__ = func
+        return timed
+
+    def wall_ns(self):
+        return (self.stop or time.perf_counter_ns()) - self.start
+
+    def functions(self):
+        """{label: [calls, total ns, self ns]}, recursion counted once in total."""
+        totals = {}
+        for path, (calls, total, own) in self.records.items():
+            label = path[-1]
+            entry = totals.setdefault(label, [0, 0, 0])
+            entry[0] += calls
+            entry[2] += own
+            if label not in path[:-1]:
+                entry[1] += total
+        return totals
+
+    def stacks(self):
+        """(stack labels, self ns) with ROOT at the bottom of every stack."""
+        instrumented = 0
+        stacks = []
+        for path, (_, total, own) in self.records.items():
+            stacks.append(((ROOT,) + path, own))
+            if len(path) == 1:
+                instrumented += total
+        # Time outside every instrumented function: search logic, Python overhead
+        stacks.append(((ROOT,), max(0, self.wall_ns() - instrumented)))
+        return stacks
+
+    def report(self, nodes=None, out=None):
+        out = out or sys.stdout
+        wall = self.wall_ns()
+        out.write(f"{'function':28} {'calls':>10} {'total ms':>10} {'self ms':>10}"
+                  f" {'self %':>7} {'us/call':>8}")
+        out.write(f" {'us/node':>8}\n" if nodes else "\n")
+        rows = sorted(self.functions().items(), key=lambda item: -item[1][2])
+        for label, (calls, total, own) in rows:
+            out.write(
+                f"{label:28} {calls:10d} {total / 1e6:10.1f} {own / 1e6:10.1f}"
+                f" {100 * own / wall:6.1f}% {own / calls / 1e3:8.2f}"
+            )
+            out.write(f" {own / nodes / 1e3:8.2f}\n" if nodes else "\n")
+        out.write(f"wall time {wall / 1e6:.1f} ms\n")
+
+    def write_collapsed(self, path):
+        """One "root;caller;callee microseconds" line per stack."""
+        with open(path, "w") as f:
+            for stack, own in self.stacks():
+                if own >= 1000:
+                    f.write(f"{';'.join(stack)} {own // 1000}\n")
+
+    def write_speedscope(self, path, name="chess-engine search"):
+        """A speedscope "sampled" profile weighted by self time."""
+        frames = []
+        index = {}
+        samples = []
+        weights = []
+        for stack, own in self.stacks():
+            for label in stack:
+                if label not in index:
+                    index[label] = len(frames)
+                    frames.append({"name": label})
+            samples.append([index[label] for label in stack])
+            weights.append(own)
+        document = {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": name,
+                    "unit": "nanoseconds",
+                    "startValue": 0,
+                    "endValue": sum(weights),
+                    "samples": samples,
+                    "weights": weights,
+                }
+            ],
+        }
+        with open(path, "w") as f:
+            json.dump(document, f)
+
+    def write(self, path):
+        """Speedscope for .json paths, collapsed stacks otherwise."""
+        if path.endswith(".json"):
+            self.write_speedscope(path)
+        else:
+            self.write_collapsed(path)
+
+
+# The running Profile, None while disabled
+active = None
+
+
+def enable():
+    """Start a new Profile and instrument every target; returns the Profile."""
+    global active
+    if active is not None:
+        disable()
+    active = Profile()
+    for owner, attribute, label in TARGETS:
+        original = getattr(owner, attribute)
+        if isinstance(owner, type):
+            original = owner.__dict__[attribute]
+        wrapped = active.wrap(label, original)
+        setattr(owner, attribute, wrapped)
+        if owner is E:
+            _rebind(original, wrapped)
+    return active
+
+
+def disable():
+    """Restore the original functions; returns the finished Profile."""
+    global active
+    profile, active = active, None
+    if profile is None:
+        return None
+    profile.stop = time.perf_counter_ns()
+    for owner, attribute, _ in TARGETS:
+        wrapped = owner.__dict__[attribute] if isinstance(owner, type) else getattr(owner, attribute)
+        original = getattr(wrapped, "__profiled__", None)
+        if original is None:
+            continue
+        setattr(owner, attribute, original)
+        if owner is E:
+            _rebind(wrapped, original)
+    return profile
+
+
+def _rebind(old, new):
+    # Other modules imported the function by name (from src.Engine_Move import ...)
+    for module in list(sys.modules.values()):
+        namespace = getattr(module, "__dict__", None)
+        if namespace is None or module is E:
+            continue
+        for name, value in list(namespace.items()):
+            if value is old:
+                namespace[name] = new
+
+
+def enable_from_env():
+    """
+    Enable profiling if CHESS_PROFILE is set, writing the profile to the file
+    it names when the program exits.
+    """
+    path = os.environ.get(ENV_VAR)
+    if not path:
+        return None
+    profile = enable()
+
+    def write():
+        finished = disable() or profile
+        finished.write(path)
+
+    atexit.register(write)
+    return profile
+
+
+def main():
+    from src.perft import POSITIONS, new_state
+    from src.search import Searcher
+
+    parser = argparse.ArgumentParser(description="Profile a headless search")
+    parser.add_argument("--position", choices=sorted(POSITIONS), default="kiwipete")
+    parser.add_argument("--fen", help="FEN to search instead of a named position")
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--time", type=float, help="time limit in seconds")
+    parser.add_argument("--mailbox", action="store_true", help="use the GameState backend")
+    parser.add_argument("--minimax", action="store_true", help="profile Engine_Move.search")
+    parser.add_argument("--collapsed", help="write collapsed stacks here")
+    parser.add_argument("--speedscope", help="write a speedscope JSON profile here")
+    args = parser.parse_args()
+
+    gs = new_state(args.fen or POSITIONS[args.position][0], not args.mailbox)
+    moves = gs.get_valid_moves()
+    searcher = None if args.minimax else Searcher()
+    enable()
+    try:
+        if searcher is None:
+            result = E.search(gs, moves, args.depth, args.time)
+        else:
+            result = searcher.search(gs, moves, args.depth, args.time)
+    finally:
+        profile = disable()
+
+    print(f"depth {result.depth}  nodes {result.nodes}  pv {result.pv_notation()}")
+    profile.report(result.nodes)
+    if args.collapsed:
+        profile.write_collapsed(args.collapsed)
+    if args.speedscope:
+        profile.write_speedscope(args.speedscope)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,483 @@
+"""
+Negamax alpha-beta search with selective search techniques.
+
+A drop-in alternative to Engine_Move.minimax: scores inside the search are
+from the side to move's point of view, so there is a single code path instead
+of separate max and min branches. On top of plain alpha-beta it has principal
+variation search, aspiration windows, null-move pruning, late-move reductions
+and check extensions. Each can be switched off through SearchOptions to
+measure what it is worth:
+
+    python -m src.search --position kiwipete --depth 5
+    python -m src.search --position kiwipete --depth 5 --no-null-move --no-lmr
+"""
+
+import argparse
+import math
+import time
+
+import polyglot_book as p
+from src.bitbase import DRAW, KNOWN_WIN, bitbases
+from src.Engine_Move import (
+    MATE,
+    MAX_PLY,
+    STALEMATE,
+    SearchLimits,
+    SearchResult,
+    SearchStats,
+    SearchTimeout,
+    evaluate_board,
+    piece_value,
+    score_from_tt,
+    score_to_tt,
+)
+from src.move_ordering import MoveOrderer
+from src.perft import POSITIONS, new_state
+from src.transposition import EXACT, LOWER, UPPER, TranspositionTable
+
+# Scores are floats in pawns; a window this narrow only answers "better than
+# alpha or not" (null-window searches in PVS and null-move pruning)
+NULL_WINDOW = 1e-6
+
+# Aspiration: search around the previous score, starting at this depth
+ASPIRATION_WINDOW = 0.5
+ASPIRATION_MIN_DEPTH = 4
+
+# Null move: skip our turn and search depth - 1 - R; if that still fails
+# high the position is good enough to cut
+NULL_MOVE_MIN_DEPTH = 3
+
+# Late-move reductions: quiet moves ordered after the first few are searched
+# shallower, by more the later the move and the deeper the search
+LMR_MIN_DEPTH = 3
+LMR_MIN_MOVES = 3
+LMR_TABLE = [
+    [max(1, int(0.75 + math.log(d) * math.log(i) / 2.25)) if d and i else 0 for i in range(64)]
+    for d in range(64)
+]
+
+# Captures worth less than this above alpha are not searched in quiescence
+DELTA_MARGIN = 2
+
+
+class SearchOptions:
+    """Switches for each search technique, all on by default."""
+
+    def __init__(
+        self,
+        pvs=True,
+        aspiration=True,
+        null_move=True,
+        lmr=True,
+        check_extensions=True,
+        quiescence=True,
+        bitbases=True,
+    ):
+        self.pvs = pvs
+        self.aspiration = aspiration
+        self.null_move = null_move
+        self.lmr = lmr
+        self.check_extensions = check_extensions
+        self.quiescence = quiescence
+        self.bitbases = bitbases
+
+
+def relative_eval(gs):
+    """evaluate_board from the side to move's point of view."""
+    score = evaluate_board(gs)
+    return score if gs.white_to_move else -score
+
+
+def has_non_pawn_material(gs, white):
+    """Null-move pruning is unsafe in pawn endings (zugzwang)."""
+    color = "w" if white else "b"
+    for row in gs.board:
+        for piece in row:
+            if piece[0] == color and piece[1] in "nbrq":
+                return True
+    return False
+
+
+class Searcher:
+    """
+    Iterative-deepening negamax search with its own transposition table,
+    move ordering tables and per-ply move lists.
+    """
+
+    def __init__(self, options=None, tt=None, orderer=None):
+        self.options = options if options is not None else SearchOptions()
+        self.tt = tt if tt is not None else TranspositionTable()
+        self.orderer = orderer if orderer is not None else MoveOrderer(MAX_PLY)
+        self.limits = None
+        self.stats = SearchStats()
+        self.pv_table = [[] for _ in range(MAX_PLY + 2)]
+        # One reusable move list per ply; each ply is live once on the path
+        self.buffers = [[] for _ in range(MAX_PLY + 2)]
+        # When the root is in a bitbase, won positions are searched to the
+        # mate instead of being cut off with KNOWN_WIN
+        self.root_in_bitbase = False
+
+    def set_root(self, gs):
+        """Per-search state that depends on the root position."""
+        self.root_in_bitbase = self.options.bitbases and bitbases.probe(gs) is not None
+
+    def search(
+        self,
+        gs,
+        valid_moves,
+        depth,
+        time_limit=None,
+        node_limit=None,
+        on_iteration=None,
+        cancel=None,
+    ):
+        """
+        Search depth 1, 2, ... up to depth within the time/node budget, or
+        until cancel (a token with is_set()) is set, and return a SearchResult
+        (score from white's point of view, like Engine_Move.search).
+        on_iteration is called after every completed depth.
+        """
+        if depth == 0:
+            return SearchResult(score=evaluate_board(gs))
+        if len(valid_moves) == 0:
+            return SearchResult()
+
+        self.orderer.new_search()
+        self.tt.new_search()
+        key = gs.zobrist_key
+        entry = self.tt.probe(key)
+        root_moves = self.orderer.order(list(valid_moves), 0, entry[4] if entry else None)
+        root_len = len(gs.move_log)
+        sign = 1 if gs.white_to_move else -1
+        self.limits = SearchLimits(time_limit, node_limit, cancel)
+        self.stats = stats = SearchStats()
+        self.set_root(gs)
+        result = SearchResult(root_moves[0], stats=stats)
+        score = None
+
+        try:
+            for d in range(1, depth + 1):
+                partial = SearchResult(depth=d, stats=stats)
+                try:
+                    score = self.aspiration_search(gs, root_moves, d, score, partial)
+                except SearchTimeout:
+                    # Unwind the moves the search had made when it was interrupted
+                    while len(gs.move_log) > root_len:
+                        gs.undo()
+                    if partial.move is not None:
+                        result = partial
+                    break
+                partial.score = score * sign
+                result = partial
+                result.nodes = self.limits.nodes
+                stats.end_iteration(d, self.limits.nodes)
+                self.tt.store(key, d, EXACT, score_to_tt(score, 0), result.move.move_id)
+                if on_iteration is not None:
+                    on_iteration(result)
+                # A forced mate will not change with more depth
+                if abs(score) >= MATE - MAX_PLY:
+                    break
+                self.orderer.order(root_moves, 0, result.move.move_id)
+        finally:
+            result.nodes = stats.nodes = self.limits.nodes
+            self.limits = None
+        return result
+
+    def aspiration_search(self, gs, root_moves, depth, previous, result):
+        """
+        Search the root in a window around the previous iteration's score,
+        opening the failing side of the window and searching again when the
+        score falls outside it.
+        """
+        alpha, beta = -float("inf"), float("inf")
+        if (
+            self.options.aspiration
+            and previous is not None
+            and depth >= ASPIRATION_MIN_DEPTH
+            and abs(previous) < MATE - MAX_PLY
+        ):
+            alpha, beta = previous - ASPIRATION_WINDOW, previous + ASPIRATION_WINDOW
+        while True:
+            score = self.search_root(gs, root_moves, depth, alpha, beta, result)
+            if score <= alpha:
+                alpha = -float("inf")
+            elif score >= beta:
+                beta = float("inf")
+            else:
+                return score
+
+    def search_root(self, gs, root_moves, depth, alpha, beta, result):
+        """Search the root moves in order; improvements are recorded in result."""
+        pvs = self.options.pvs
+        best = -float("inf")
+        sign = 1 if gs.white_to_move else -1
+        for i, move in enumerate(root_moves):
+            gs.make_move(move)
+            if i == 0 or not pvs:
+                score = -self.negamax(gs, depth - 1, -beta, -alpha, 1)
+            else:
+                score = -self.negamax(gs, depth - 1, -alpha - NULL_WINDOW, -alpha, 1)
+                if alpha < score < beta:
+                    score = -self.negamax(gs, depth - 1, -beta, -alpha, 1)
+            gs.undo()
+            if score > best:
+                best = score
+                if score > alpha:
+                    alpha = score
+                    result.move, result.score = move, score * sign
+                    result.pv = [move] + self.pv_table[1]
+            if alpha >= beta:
+                break
+        return best
+
+    def negamax(self, gs, depth, alpha, beta, ply, allow_null=True):
+        if depth <= 0 or ply >= MAX_PLY:
+            return self.quiescence(gs, alpha, beta, ply)
+        self.limits.count_node()
+        self.pv_table[ply] = []
+        options = self.options
+        pv_node = beta - alpha > NULL_WINDOW
+
+        # Endgame bitbases: draws are exact, wins are cut off unless the root
+        # is already in the same ending
+        if options.bitbases:
+            outcome = bitbases.probe(gs)
+            if outcome == DRAW:
+                return STALEMATE
+            if outcome is not None and not self.root_in_bitbase:
+                return outcome * KNOWN_WIN + relative_eval(gs)
+
+        # Transposition table: settle the node or narrow the window
+        alpha_orig = alpha
+        key = gs.zobrist_key
+        tt_move_id = None
+        stats = self.stats
+        entry = self.tt.probe(key)
+        stats.tt_probes += 1
+        if entry is not None:
+            stats.tt_hits += 1
+            tt_move_id = entry[4]
+            if entry[1] >= depth and not pv_node:
+                score = score_from_tt(entry[3], ply)
+                if entry[2] == EXACT:
+                    return score
+                if entry[2] == LOWER:
+                    alpha = max(alpha, score)
+                else:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score
+
+        moves = gs.get_valid_moves(self.buffers[ply])
+        if len(moves) == 0:
+            if gs.checkmate:
+                return -MATE + ply
+            return STALEMATE
+        in_check = gs.in_check
+
+        # Null move: if passing still fails high, a real move will too
+        if (
+            options.null_move
+            and allow_null
+            and not pv_node
+            and not in_check
+            and depth >= NULL_MOVE_MIN_DEPTH
+            and relative_eval(gs) >= beta
+            and has_non_pawn_material(gs, gs.white_to_move)
+        ):
+            reduction = 3 if depth >= 6 else 2
+            gs.make_null_move()
+            base = len(gs.move_log)
+            try:
+                score = -self.negamax(
+                    gs, depth - 1 - reduction, -beta, -beta + NULL_WINDOW, ply + 1, False
+                )
+            except SearchTimeout:
+                # Moves made below the null move come off first
+                while len(gs.move_log) > base:
+                    gs.undo()
+                gs.undo_null_move()
+                raise
+            gs.undo_null_move()
+            if score >= beta:
+                # Do not trust a mate found after passing
+                return beta if score >= MATE - MAX_PLY else score
+
+        search_depth = depth
+        if in_check and options.check_extensions:
+            search_depth += 1
+
+        killers = self.orderer.killers[ply] if ply < self.orderer.max_ply else ()
+        best = -float("inf")
+        best_move_id = None
+        for i, move in enumerate(self.orderer.order(moves, ply, tt_move_id)):
+            gs.make_move(move)
+            if i == 0:
+                score = -self.negamax(gs, search_depth - 1, -beta, -alpha, ply + 1)
+            else:
+                reduction = 0
+                if (
+                    options.lmr
+                    and search_depth >= LMR_MIN_DEPTH
+                    and i >= LMR_MIN_MOVES
+                    and not in_check
+                    and not move.is_capture
+                    and not move.is_pawn_promotion
+                    and move.move_id not in killers
+                ):
+                    reduction = LMR_TABLE[min(search_depth, 63)][min(i, 63)]
+                if options.pvs:
+                    lo, hi = -alpha - NULL_WINDOW, -alpha
+                else:
+                    lo, hi = -beta, -alpha
+                score = -self.negamax(gs, search_depth - 1 - reduction, lo, hi, ply + 1)
+                # A reduced move that looks good is searched again at full depth
+                if reduction and score > alpha:
+                    score = -self.negamax(gs, search_depth - 1, lo, hi, ply + 1)
+                if options.pvs and alpha < score < beta:
+                    score = -self.negamax(gs, search_depth - 1, -beta, -alpha, ply + 1)
+            gs.undo()
+
+            if score > best:
+                best = score
+                best_move_id = move.move_id
+                if score > alpha:
+                    alpha = score
+                    self.pv_table[ply] = [move] + self.pv_table[ply + 1]
+            if alpha >= beta:
+                self.orderer.record_cutoff(move, ply, depth)
+                stats.cutoffs += 1
+                if i == 0:
+                    stats.first_move_cutoffs += 1
+                break
+
+        if best <= alpha_orig:
+            flag = UPPER
+        elif best >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.tt.store(key, depth, flag, score_to_tt(best, ply), best_move_id)
+        stats.tt_stores += 1
+        return best
+
+    def quiescence(self, gs, alpha, beta, ply):
+        """
+        Captures and queen promotions only, with stand-pat, delta and SEE
+        pruning; every evasion is searched when in check. Negamax form of
+        Engine_Move.quiescence.
+        """
+        self.limits.count_node()
+        self.stats.qnodes += 1
+        self.pv_table[ply] = []
+        if ply >= MAX_PLY or not self.options.quiescence:
+            return relative_eval(gs)
+
+        valid_moves = gs.get_valid_moves(self.buffers[ply])
+        if len(valid_moves) == 0:
+            if gs.checkmate:
+                return -MATE + ply
+            return STALEMATE
+
+        if gs.in_check:
+            moves = valid_moves
+            best = -float("inf")
+        else:
+            stand_pat = relative_eval(gs)
+            if stand_pat >= beta:
+                return stand_pat
+            alpha = max(alpha, stand_pat)
+            best = stand_pat
+            moves = []
+            for move in valid_moves:
+                if not (move.is_capture or move.is_pawn_promotion):
+                    continue
+                if move.is_pawn_promotion and move.promotion_piece != "q":
+                    continue
+                gain = piece_value[move.piece_captured[1]] if move.piece_captured != "--" else 1
+                if move.is_pawn_promotion:
+                    gain += piece_value["q"] - piece_value["p"]
+                if stand_pat + gain + DELTA_MARGIN <= alpha:
+                    continue
+                if gs.see(move) < 0:
+                    continue
+                moves.append(move)
+
+        for move in self.orderer.order(moves, ply):
+            gs.make_move(move)
+            score = -self.quiescence(gs, -beta, -alpha, ply + 1)
+            gs.undo()
+            if score > best:
+                best = score
+                if score > alpha:
+                    alpha = score
+                    self.pv_table[ply] = [move] + self.pv_table[ply + 1]
+            if alpha >= beta:
+                break
+        return best
+
+
+# Shared searcher for find_best_move, so the TT carries over between moves
+searcher = Searcher()
+
+
+def find_best_move(gs, valid_moves, depth, time_limit=None, node_limit=None):
+    """Same contract as Engine_Move.find_best_move, using the negamax search."""
+    if len(valid_moves) == 0:
+        return None
+    if len(gs.move_log) < 20:
+        book_move = p.get_polyglot_move(gs)
+        if book_move:
+            return book_move
+    return searcher.search(gs, valid_moves, depth, time_limit, node_limit).move
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the negamax search")
+    parser.add_argument("--position", choices=sorted(POSITIONS), default="initial")
+    parser.add_argument("--fen", help="FEN to search instead of a named position")
+    parser.add_argument("--depth", type=int, default=5)
+    parser.add_argument("--time", type=float, help="time limit in seconds")
+    parser.add_argument("--mailbox", action="store_true", help="use the GameState backend")
+    for name in (
+        "pvs",
+        "aspiration",
+        "null-move",
+        "lmr",
+        "check-extensions",
+        "quiescence",
+        "bitbases",
+    ):
+        parser.add_argument(f"--no-{name}", action="store_true", help=f"disable {name}")
+    args = parser.parse_args()
+
+    options = SearchOptions(
+        pvs=not args.no_pvs,
+        aspiration=not args.no_aspiration,
+        null_move=not args.no_null_move,
+        lmr=not args.no_lmr,
+        check_extensions=not args.no_check_extensions,
+        quiescence=not args.no_quiescence,
+        bitbases=not args.no_bitbases,
+    )
+    if options.bitbases:
+        bitbases.load()
+    fen = args.fen or POSITIONS[args.position][0]
+    gs = new_state(fen, not args.mailbox)
+    start = time.perf_counter()
+
+    def report(result):
+        elapsed = time.perf_counter() - start
+        print(
+            f"depth {result.depth}  score {result.score:.2f}  nodes {result.nodes}"
+            f"  time {elapsed:.2f}s  pv {result.pv_notation()}"
+        )
+
+    result = Searcher(options).search(
+        gs, gs.get_valid_moves(), args.depth, args.time, on_iteration=report
+    )
+    print(result.stats.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,404 @@
+"""
+Local analysis service: a long-running asyncio HTTP server in front of a warm
+pool of engine worker processes.
+
+    python -m src.service --port 8765 --workers 4
+
+    POST /analyse  {"fen": "...", "movetime": 500, "depth": 12, "nodes": 100000,
+                    "deadline": 2000}
+    -> {"bestmove": "e2e4", "score": {"cp": 31}, "depth": 9, "pv": [...],
+        "nodes": 51234, "time": 497, "coalesced": false}
+
+    GET /health, GET /stats
+
+Each worker keeps its Searcher, and so its transposition table, between
+requests. Requests wait in a bounded queue; when it is full the server
+answers 503 at once instead of piling up work. "deadline" (ms, from arrival)
+bounds queueing plus searching, and the search gets whatever is left of it.
+No search runs longer than MAX_MOVETIME_MS, whatever its depth or node limit.
+Identical concurrent requests (same position and limits) share one search.
+The server only listens on localhost unless told otherwise.
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from src.bitbase import bitbases
+from src.chess_engine import GameState
+from src.Engine_Move import MAX_PLY
+from src.perft import new_state
+from src.search import Searcher
+from src.transposition import TranspositionTable
+from src.uci import score_to_uci
+
+DEFAULT_PORT = 8765
+DEFAULT_MOVETIME_MS = 1000
+MAX_MOVETIME_MS = 60000
+DEFAULT_MAX_QUEUE = 64
+MAX_BODY = 64 * 1024
+# Time kept back from a deadline for sending the answer
+DEADLINE_MARGIN = 0.02
+# Latencies kept for the percentiles in /stats
+LATENCY_WINDOW = 1000
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+
+class RequestError(Exception):
+    """A request that gets an HTTP error status instead of an analysis."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# Per-process searcher of a pool worker, set by _init_worker
+_searcher = None
+_bitboard = True
+
+
+def _init_worker(hash_mb, bitboard):
+    global _searcher, _bitboard
+    _searcher = Searcher(tt=TranspositionTable(hash_mb))
+    _bitboard = bitboard
+    # Tables the server mapped before starting the pool; workers never generate
+    bitbases.load(generate_missing=False)
+
+
+def _warm_up():
+    return os.getpid()
+
+
+def analyse(fen, depth, time_limit, node_limit):
+    """Pool worker: search fen and return the JSON-ready result."""
+    start = time.perf_counter()
+    gs = new_state(fen, _bitboard)
+    moves = gs.get_valid_moves()
+    if not moves:
+        outcome = "checkmate" if gs.checkmate else "stalemate"
+        return {"bestmove": None, "result": outcome, "depth": 0, "pv": [], "nodes": 0}
+    result = _searcher.search(gs, moves, depth, time_limit, node_limit)
+    sign = 1 if gs.white_to_move else -1
+    kind, value = score_to_uci(result.score * sign).split()
+    return {
+        "bestmove": result.move.get_uci_notation(),
+        "score": {kind: int(value)},
+        "depth": result.depth,
+        "pv": [move.get_uci_notation() for move in result.pv],
+        "nodes": result.nodes,
+        "time": round((time.perf_counter() - start) * 1000),
+    }
+
+
+def parse_request(body):
+    """(fen, depth, movetime s, nodes, deadline s) from a JSON body."""
+    try:
+        request = json.loads(body or b"{}")
+    except ValueError:
+        raise RequestError(400, "body is not JSON")
+    if not isinstance(request, dict) or not isinstance(request.get("fen"), str):
+        raise RequestError(400, "fen is required")
+    fen = " ".join(request["fen"].split())
+    try:
+        gs = GameState.from_fen(fen)
+    except Exception:
+        raise RequestError(400, "invalid fen")
+    kings = [piece for row in gs.board for piece in row if piece[1:] == "k"]
+    if sorted(kings) != ["bk", "wk"]:
+        raise RequestError(400, "fen needs exactly one king per side")
+    r, c = gs.b_king_loc if gs.white_to_move else gs.w_king_loc
+    if gs.is_square_attacked(r, c, gs.white_to_move):
+        raise RequestError(400, "side not to move is in check")
+
+    def number(name, default=None):
+        value = request.get(name, default)
+        if value is not None and (not isinstance(value, (int, float)) or value <= 0):
+            raise RequestError(400, f"{name} must be a positive number")
+        return value
+
+    depth = min(MAX_PLY, int(number("depth", MAX_PLY)))
+    nodes = number("nodes")
+    movetime = number("movetime")
+    if movetime is None:
+        # Depth and node limits alone could hold a worker indefinitely
+        limited = nodes is not None or "depth" in request
+        movetime = MAX_MOVETIME_MS if limited else DEFAULT_MOVETIME_MS
+    movetime = min(movetime, MAX_MOVETIME_MS) / 1000
+    deadline = number("deadline")
+    deadline = None if deadline is None else deadline / 1000
+    return fen, depth, movetime, None if nodes is None else int(nodes), deadline
+
+
+class AnalysisService:
+    """Request queue, coalescing and deadlines in front of the worker pool."""
+
+    def __init__(self, workers=None, max_queue=DEFAULT_MAX_QUEUE, hash_mb=32, bitboard=True):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.executor = ProcessPoolExecutor(
+            self.workers, initializer=_init_worker, initargs=(hash_mb, bitboard)
+        )
+        # One search at a time per worker; the rest wait here
+        self.slots = asyncio.Semaphore(self.workers)
+        self.pending = 0  # Searches queued or running
+        self.inflight = {}  # key -> Task of the search shared by identical requests
+        self.counters = collections.Counter()
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+
+    async def start(self):
+        """Start every worker process now rather than on the first requests."""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(
+            *(loop.run_in_executor(self.executor, _warm_up) for _ in range(self.workers))
+        )
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+    async def analyse(self, body):
+        arrived = time.perf_counter()
+        fen, depth, movetime, nodes, deadline = parse_request(body)
+        expires = None if deadline is None else arrived + deadline
+        key = (" ".join(fen.split()[:4]), depth, movetime, nodes, deadline)
+
+        task = self.inflight.get(key)
+        coalesced = task is not None
+        if coalesced:
+            self.counters["coalesced"] += 1
+        else:
+            if self.pending >= self.max_queue + self.workers:
+                self.counters["rejected"] += 1
+                raise RequestError(503, "queue full")
+            self.pending += 1
+            task = asyncio.ensure_future(self._search(fen, depth, movetime, nodes, expires))
+            self.inflight[key] = task
+            task.add_done_callback(lambda _: self._finished(key))
+
+        try:
+            if expires is None:
+                result = await asyncio.shield(task)
+            else:
+                remaining = expires - time.perf_counter()
+                result = await asyncio.wait_for(asyncio.shield(task), max(0.0, remaining))
+        except asyncio.TimeoutError:
+            self.counters["timeouts"] += 1
+            raise RequestError(504, "deadline passed")
+        self.counters["requests"] += 1
+        self.latencies.append(time.perf_counter() - arrived)
+        return dict(result, coalesced=coalesced)
+
+    def _finished(self, key):
+        self.pending -= 1
+        self.inflight.pop(key, None)
+
+    async def _search(self, fen, depth, movetime, nodes, expires):
+        async with self.slots:
+            time_limit = movetime
+            if expires is not None:
+                remaining = expires - time.perf_counter() - DEADLINE_MARGIN
+                if remaining <= 0:
+                    # Expired while queued: not worth a worker
+                    raise asyncio.TimeoutError
+                time_limit = remaining if time_limit is None else min(time_limit, remaining)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.executor, analyse, fen, depth, time_limit, nodes
+            )
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1)
+
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_queue": self.max_queue,
+            "requests": self.counters["requests"],
+            "coalesced": self.counters["coalesced"],
+            "rejected": self.counters["rejected"],
+            "timeouts": self.counters["timeouts"],
+            "latency_ms": {"p50": percentile(0.5), "p99": percentile(0.99)},
+        }
+
+    async def handle_connection(self, reader, writer):
+        """HTTP/1.1 with keep-alive: one JSON response per request."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "bad request line"}, False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = headers.get("connection", "").lower() != "close"
+                length = headers.get("content-length") or "0"
+                if not length.isdecimal():
+                    # Without a length the body's end is unknown, so close
+                    await self._respond(writer, 400, {"error": "bad content-length"}, False)
+                    break
+                length = int(length)
+                if length > MAX_BODY:
+                    await self._respond(writer, 413, {"error": "body too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                status, payload = await self._route(method, path, body)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, path, body):
+        try:
+            if path == "/analyse":
+                if method != "POST":
+                    raise RequestError(405, "use POST")
+                return 200, await self.analyse(body)
+            if path == "/health" and method == "GET":
+                return 200, {"status": "ok"}
+            if path == "/stats" and method == "GET":
+                return 200, self.stats()
+            raise RequestError(404, "unknown path")
+        except RequestError as e:
+            return e.status, {"error": str(e)}
+        except Exception as e:  # A failed search must not take the connection down
+            return 500, {"error": repr(e)}
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode()
+        head = (
+            f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+        )
+        if status == 503:
+            head += "Retry-After: 1\r\n"
+        writer.write(head.encode() + b"\r\n" + body)
+        await writer.drain()
+
+
+async def serve(host="127.0.0.1", port=DEFAULT_PORT, **service_options):
+    service = AnalysisService(**service_options)
+    try:
+        await service.start()
+        server = await asyncio.start_server(service.handle_connection, host, port)
+        print(f"analysis service on http://{host}:{port} with {service.workers} workers")
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+async def _post(host, port, payload):
+    reader, writer = await asyncio.open_connection(host, port)
+    body = json.dumps(payload).encode()
+    writer.write(
+        f"POST /analyse HTTP/1.1\r\nHost: {host}\r\nContent-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+
+async def benchmark(host, port, fens, requests, concurrency, movetime):
+    """Send requests analyses, concurrency at a time; print throughput and latency."""
+    latencies = []
+    statuses = collections.Counter()
+    queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(fens[i % len(fens)])
+
+    async def client():
+        while not queue.empty():
+            fen = queue.get_nowait()
+            start = time.perf_counter()
+            status, _ = await _post(host, port, {"fen": fen, "movetime": movetime})
+            latencies.append(time.perf_counter() - start)
+            statuses[status] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(
+        f"{requests} requests in {elapsed:.1f}s ({requests / elapsed:.1f}/s)"
+        f"  p50 {latencies[len(latencies) // 2] * 1000:.0f} ms"
+        f"  p99 {latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))] * 1000:.0f} ms"
+        f"  statuses {dict(statuses)}"
+    )
+
+
+def main():
+    from src.perft import POSITIONS
+
+    parser = argparse.ArgumentParser(description="Local JSON analysis service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--max-queue", type=int, default=DEFAULT_MAX_QUEUE)
+    parser.add_argument("--hash", type=int, default=32, help="TT size per worker in MB")
+    parser.add_argument("--mailbox", action="store_true", help="use the GameState backend")
+    parser.add_argument("--bench", type=int, metavar="N", help="send N requests to a running server")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--movetime", type=int, default=100, help="ms per benchmark request")
+    args = parser.parse_args()
+
+    if args.bench:
+        fens = [fen for fen, _ in POSITIONS.values()]
+        asyncio.run(
+            benchmark(args.host, args.port, fens, args.bench, args.concurrency, args.movetime)
+        )
+        return
+    # Mapped before the pool starts, so every worker shares the tables
+    bitbases.load()
+    try:
+        asyncio.run(
+            serve(
+                args.host,
+                args.port,
+                workers=args.workers,
+                max_queue=args.max_queue,
+                hash_mb=args.hash,
+                bitboard=not args.mailbox,
+            )
+        )
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Fixed-size transposition table indexed by the Zobrist key.
+
+Each slot holds one entry (key, depth, flag, score, move_id, age). The table
+never grows, so its memory stays within the budget it was created with.
+SharedTranspositionTable keeps the same entries packed in a shared memory
+segment so every search process on the machine can use one table.
+"""
+
+import struct
+from multiprocessing import parent_process, resource_tracker, shared_memory
+
+# Bound types: the stored score is exact, a lower bound (fail high) or an
+# upper bound (fail low)
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Rough cost of one filled slot in CPython: the list pointer, the 6-tuple and
+# the key, score and move ints it holds
+ENTRY_BYTES = 160
+
+
+class TranspositionTable:
+    """
+    Depth-preferred table with aging: a slot is overwritten by a deeper search
+    of any position, by the same position, or when its entry is from an older
+    search.
+    """
+
+    def __init__(self, size_mb=32):
+        self.resize(size_mb)
+
+    def resize(self, size_mb):
+        """Reallocate (and empty) the table for a new memory budget in MB."""
+        slots = max(1, int(size_mb * 1024 * 1024) // ENTRY_BYTES)
+        # Round down to a power of two so a slot is just key & mask
+        self.size = 1 << (slots.bit_length() - 1)
+        self.mask = self.size - 1
+        self.clear()
+
+    def clear(self):
+        self.table = [None] * self.size
+        self.age = 0
+
+    def new_search(self):
+        """Start a new search; entries from earlier searches become replaceable."""
+        self.age = (self.age + 1) & 0xFF
+
+    def probe(self, key):
+        """Entry tuple (key, depth, flag, score, move_id, age) for key, or None."""
+        entry = self.table[key & self.mask]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key, depth, flag, score, move_id):
+        index = key & self.mask
+        old = self.table[index]
+        if (
+            old is None
+            or old[0] == key
+            or old[5] != self.age
+            or depth >= old[1]
+        ):
+            # Keep the old best move if this search did not find one
+            if move_id is None and old is not None and old[0] == key:
+                move_id = old[4]
+            self.table[index] = (key, depth, flag, score, move_id, self.age)
+
+    def usage(self):
+        """Fraction of slots in use."""
+        return sum(1 for entry in self.table if entry is not None) / self.size
+
+
+# Shared table layout, in 64-bit words: word 0 is the search age, then three
+# words per slot: key ^ data ^ score, data, score (float64 bits). data packs
+# move_id (20 bits, 0 for none), depth (8), flag (2) and age (8).
+SHARED_ENTRY_WORDS = 3
+_MOVE_MASK = (1 << 20) - 1
+_DEPTH_SHIFT = 20
+_FLAG_SHIFT = 28
+_AGE_SHIFT = 30
+_FLOAT = struct.Struct("<d")
+_WORD = struct.Struct("<Q")
+
+
+def _float_bits(score):
+    return _WORD.unpack(_FLOAT.pack(score))[0]
+
+
+def _bits_float(bits):
+    return _FLOAT.unpack(_WORD.pack(bits))[0]
+
+
+class SharedTranspositionTable:
+    """
+    TranspositionTable stored in multiprocessing.shared_memory. Probes and
+    stores take no lock: each slot's first word is the key XORed with the
+    other two, so an entry half-written by another process fails the key
+    check and reads as a miss instead of a wrong entry.
+
+    The creating process owns the segment (new_search, clear, unlink). Other
+    processes attach by name, or simply receive the table through pickling,
+    e.g. as a Pool initializer argument.
+    """
+
+    def __init__(self, size_mb=32, name=None):
+        if name is None:
+            slots = max(1, int(size_mb * 1024 * 1024) // (SHARED_ENTRY_WORDS * 8))
+            self.size = 1 << (slots.bit_length() - 1)
+            self.shm = shared_memory.SharedMemory(
+                create=True, size=(1 + self.size * SHARED_ENTRY_WORDS) * 8
+            )
+            self.owner = True
+        else:
+            self.shm = _attach(name)
+            slots = (self.shm.size // 8 - 1) // SHARED_ENTRY_WORDS
+            self.size = 1 << (slots.bit_length() - 1)
+            self.owner = False
+        self.name = self.shm.name
+        self.mask = self.size - 1
+        self.words = self.shm.buf.cast("Q")
+        if self.owner:
+            self.clear()
+        self.age = self.words[0]
+
+    @classmethod
+    def attach(cls, name):
+        return cls(name=name)
+
+    def __reduce__(self):
+        return (SharedTranspositionTable.attach, (self.name,))
+
+    def __del__(self):
+        # The segment cannot be closed while this view of it exists
+        words = getattr(self, "words", None)
+        if words is not None:
+            words.release()
+
+    def close(self):
+        """Detach this process; the owner also frees the segment."""
+        self.words.release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def resize(self, size_mb):
+        """Replace the segment with an empty one; attached processes must reattach."""
+        if not self.owner:
+            raise ValueError("only the owning process can resize a shared table")
+        self.close()
+        self.__init__(size_mb)
+
+    def clear(self):
+        self.shm.buf[:] = bytes(self.shm.size)
+        self.age = 0
+
+    def new_search(self):
+        """
+        Start a new search. The owner advances the shared age; other processes
+        pick it up.
+        """
+        if self.owner:
+            self.words[0] = (self.words[0] + 1) & 0xFF
+        self.age = self.words[0]
+
+    def probe(self, key):
+        """Entry tuple (key, depth, flag, score, move_id, age) for key, or None."""
+        i = 1 + (key & self.mask) * SHARED_ENTRY_WORDS
+        words = self.words
+        check, data, score_bits = words[i], words[i + 1], words[i + 2]
+        if check ^ data ^ score_bits != key or not data:
+            return None
+        return (
+            key,
+            (data >> _DEPTH_SHIFT) & 0xFF,
+            (data >> _FLAG_SHIFT) & 3,
+            _bits_float(score_bits),
+            (data & _MOVE_MASK) or None,
+            data >> _AGE_SHIFT,
+        )
+
+    def store(self, key, depth, flag, score, move_id):
+        i = 1 + (key & self.mask) * SHARED_ENTRY_WORDS
+        words = self.words
+        check, data, score_bits = words[i], words[i + 1], words[i + 2]
+        same = data and check ^ data ^ score_bits == key
+        if (
+            not data
+            or same
+            or data >> _AGE_SHIFT != self.age
+            or depth >= (data >> _DEPTH_SHIFT) & 0xFF
+        ):
+            if move_id is None and same:
+                move_id = data & _MOVE_MASK
+            data = (
+                (move_id or 0)
+                | max(0, min(depth, 255)) << _DEPTH_SHIFT
+                | flag << _FLAG_SHIFT
+                | self.age << _AGE_SHIFT
+            )
+            score_bits = _float_bits(score)
+            words[i + 1] = data
+            words[i + 2] = score_bits
+            words[i] = key ^ data ^ score_bits
+
+    def usage(self):
+        """Fraction of slots in use."""
+        words = self.words
+        used = sum(
+            1 for i in range(2, 1 + self.size * SHARED_ENTRY_WORDS, SHARED_ENTRY_WORDS) if words[i]
+        )
+        return used / self.size
+
+
+def _attach(name):
+    """Open an existing segment without registering it for cleanup here."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13 has no track argument
+        shm = shared_memory.SharedMemory(name=name)
+        # Children of the owner share its resource tracker, so only an
+        # unrelated process has to stop its own tracker unlinking the segment
+        if parent_process() is None:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
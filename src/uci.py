@@ -0,0 +1,252 @@
+"""
+UCI (Universal Chess Interface) front end, for GUIs, match runners and
+analysis tools:
+
+    python -m src.uci
+
+Commands are read from stdin. "go" starts the search in a background thread,
+so "stop", "isready" and "quit" are answered while it runs, and an info line
+is printed after every completed depth.
+"""
+
+import os
+import sys
+import threading
+import time
+
+from src import profiling
+from src.background import SearchJob
+from src.bitbase import bitbases
+from src.bitboard import BitboardGameState
+from src.Engine_Move import MATE, MAX_PLY
+from src.parallel import ParallelSearcher
+from src.search import Searcher
+from src.transposition import TranspositionTable
+
+ENGINE_NAME = "chess-engine"
+ENGINE_AUTHOR = "kanhaOmGM"
+
+DEFAULT_HASH_MB = 32
+MAX_HASH_MB = 4096
+
+GO_PARAMS = ("depth", "movetime", "nodes", "wtime", "btime", "winc", "binc", "movestogo")
+
+# Without movestogo, plan as if this many moves were left on the clock
+DEFAULT_MOVES_TO_GO = 30
+# Keep this much of the clock in reserve for move transmission
+MOVE_OVERHEAD = 0.05
+
+
+def score_to_uci(score):
+    """'cp N' or 'mate N' for a score from the side to move's point of view."""
+    if score >= MATE - MAX_PLY:
+        return f"mate {(MATE - score + 1) // 2:.0f}"
+    if score <= -MATE + MAX_PLY:
+        return f"mate {-((MATE + score + 1) // 2):.0f}"
+    return f"cp {round(score * 100)}"
+
+
+def time_for_move(params, white_to_move):
+    """Seconds to spend on this move from the go parameters, or None."""
+    if "movetime" in params:
+        return max(0.0, params["movetime"] / 1000 - MOVE_OVERHEAD)
+    clock = params.get("wtime" if white_to_move else "btime")
+    if clock is None:
+        return None
+    increment = params.get("winc" if white_to_move else "binc", 0)
+    moves_to_go = params.get("movestogo", DEFAULT_MOVES_TO_GO)
+    budget = clock / max(1, moves_to_go) + increment * 0.8
+    # Never plan to use more than half of what is left
+    return max(0.01, min(budget, clock / 2) / 1000 - MOVE_OVERHEAD)
+
+
+class UCIEngine:
+    """Protocol state: the current position, the searcher and the running search."""
+
+    def __init__(self, output=None):
+        self.output = output if output is not None else sys.stdout
+        self.output_lock = threading.Lock()
+        self.gs = BitboardGameState()
+        self.hash_mb = DEFAULT_HASH_MB
+        self.threads = 1
+        self.searcher = self.make_searcher()
+        self.job = None
+        self.cancel = None
+        self.infinite = False
+        self.go_time = 0.0
+        self.root_sign = 1
+
+    def make_searcher(self):
+        if self.threads > 1:
+            return ParallelSearcher(self.threads, hash_mb=self.hash_mb)
+        return Searcher(tt=TranspositionTable(self.hash_mb))
+
+    def send(self, line):
+        with self.output_lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+    def handle(self, line):
+        """Process one command line; returns False on quit."""
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+        if command == "uci":
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_AUTHOR}")
+            self.send(
+                f"option name Hash type spin default {DEFAULT_HASH_MB} min 1 max {MAX_HASH_MB}"
+            )
+            self.send(f"option name Threads type spin default 1 min 1 max {os.cpu_count() or 1}")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "setoption":
+            self.stop()
+            self.set_option(args)
+        elif command == "ucinewgame":
+            self.stop()
+            self.gs = BitboardGameState()
+            self.searcher.tt.clear()
+        elif command == "position":
+            self.stop()
+            self.set_position(args)
+        elif command == "go":
+            self.stop()
+            self.go(args)
+        elif command == "stop":
+            self.stop()
+        elif command == "quit":
+            self.stop()
+            self.close()
+            return False
+        return True
+
+    def set_option(self, args):
+        # setoption name <id> [value <x>]
+        if "name" not in args:
+            return
+        name_end = args.index("value") if "value" in args else len(args)
+        name = " ".join(args[args.index("name") + 1 : name_end]).lower()
+        value = " ".join(args[name_end + 1 :])
+        try:
+            if name == "hash":
+                self.hash_mb = max(1, min(MAX_HASH_MB, int(value)))
+            elif name == "threads":
+                self.threads = max(1, int(value))
+            else:
+                self.send(f"info string unknown option {name}")
+                return
+        except ValueError:
+            # Keep the previous value
+            self.send(f"info string invalid value {value} for option {name}")
+            return
+        # Workers hold the table too, so start over with a new searcher
+        self.close()
+        self.searcher = self.make_searcher()
+
+    def set_position(self, args):
+        # position [startpos | fen <fen>] [moves <m1> ... <mN>]
+        moves_at = args.index("moves") if "moves" in args else len(args)
+        if args and args[0] == "fen":
+            fen = " ".join(args[1:moves_at])
+            try:
+                gs = BitboardGameState.from_fen(fen)
+            except ValueError:
+                # Keep the previous position
+                self.send(f"info string invalid fen {fen}")
+                return
+        else:
+            gs = BitboardGameState()
+        for uci in args[moves_at + 1 :]:
+            for move in gs.get_valid_moves():
+                if move.get_uci_notation() == uci:
+                    gs.make_move(move)
+                    break
+            else:
+                self.send(f"info string illegal move {uci}")
+                break
+        self.gs = gs
+
+    def go(self, args):
+        params = {}
+        self.infinite = False
+        i = 0
+        while i < len(args):
+            if args[i] == "infinite":
+                self.infinite = True
+            elif args[i] in GO_PARAMS and i + 1 < len(args):
+                try:
+                    params[args[i]] = int(args[i + 1])
+                except ValueError:
+                    self.send(f"info string invalid value {args[i + 1]} for {args[i]}")
+                i += 1
+            i += 1
+
+        depth = MAX_PLY if self.infinite else min(MAX_PLY, params.get("depth", MAX_PLY))
+        time_limit = None if self.infinite else time_for_move(params, self.gs.white_to_move)
+        node_limit = None if self.infinite else params.get("nodes")
+        self.root_sign = 1 if self.gs.white_to_move else -1
+        self.go_time = time.perf_counter()
+        self.cancel = threading.Event()
+        # Search a copy; the next "position" replaces self.gs anyway
+        self.job = SearchJob(
+            self.searcher,
+            self.gs.copy(),
+            depth,
+            time_limit,
+            node_limit,
+            on_iteration=self.report,
+            on_done=self.finish,
+            cancel=self.cancel,
+        )
+
+    def report(self, result):
+        elapsed = time.perf_counter() - self.go_time
+        nps = int(result.nodes / elapsed) if elapsed > 0 else 0
+        pv = " ".join(move.get_uci_notation() for move in result.pv)
+        self.send(
+            f"info depth {result.depth} score {score_to_uci(result.score * self.root_sign)}"
+            f" nodes {result.nodes} nps {nps} time {int(elapsed * 1000)} pv {pv}"
+        )
+
+    def finish(self, result):
+        # In infinite mode bestmove must wait for "stop"
+        if self.infinite:
+            self.cancel.wait()
+        if result.move is None:
+            self.send("bestmove 0000")
+        elif len(result.pv) >= 2:
+            self.send(
+                f"bestmove {result.move.get_uci_notation()} ponder {result.pv[1].get_uci_notation()}"
+            )
+        else:
+            self.send(f"bestmove {result.move.get_uci_notation()}")
+
+    def stop(self):
+        """Stop the running search; its thread prints bestmove before returning."""
+        if self.job is not None:
+            self.job.stop()
+            self.job = None
+
+    def close(self):
+        if isinstance(self.searcher, ParallelSearcher):
+            self.searcher.close()
+
+
+def main():
+    profiling.enable_from_env()
+    # Before the first command: generating missing tables takes a few seconds
+    bitbases.load()
+    engine = UCIEngine()
+    for line in sys.stdin:
+        if not engine.handle(line.strip()):
+            break
+    else:
+        engine.stop()
+        engine.close()
+
+
+if __name__ == "__main__":
+    main()
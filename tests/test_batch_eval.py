@@ -0,0 +1,38 @@
+"""
+Batch evaluation must agree with Engine_Move.evaluate_board (needs numpy).
+
+    python -m pytest -q tests/test_batch_eval.py
+"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from src.batch_eval import (  # noqa: E402
+    encode_fens,
+    encode_states,
+    evaluate_planes,
+    pawn_features,
+    random_positions,
+)
+from src.Engine_Move import evaluate_board, pawn_counts  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def states():
+    return random_positions(300, seed=5)
+
+
+def test_evaluate_planes_matches_evaluate_board(states):
+    expected = np.array([evaluate_board(gs) for gs in states])
+    np.testing.assert_allclose(evaluate_planes(encode_states(states)), expected, atol=1e-9)
+    fens = [gs.board_to_fen() for gs in states]
+    np.testing.assert_allclose(evaluate_planes(encode_fens(fens)), expected, atol=1e-9)
+
+
+def test_pawn_features_match_pawn_counts(states):
+    features = pawn_features(encode_states(states))
+    for gs, counts in zip(states, features):
+        white, black = gs.pawn_masks()
+        assert tuple(counts[0]) == pawn_counts(white, black, "w")
+        assert tuple(counts[1]) == pawn_counts(black, white, "b")
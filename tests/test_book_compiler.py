@@ -0,0 +1,62 @@
+"""
+PGN replay for the book compiler: a game that cannot be replayed to the end
+must not leave any of its moves in the statistics.
+
+    python -m pytest -q tests/test_book_compiler.py
+"""
+
+from src.book_compiler import compile_games, replay_game
+from src.perft import POSITIONS, new_state
+from src.polyglot import encode_move, polyglot_key
+
+GOOD = """[Event "good"]
+[Result "1-0"]
+
+1. e4 e5 2. Nf3 Nc6 3. Bb5 a6 1-0
+"""
+
+# 3. Bb7 is not a legal move
+BAD = """[Event "bad"]
+[Result "1-0"]
+
+1. e4 e5 2. Nf3 Nc6 3. Bb7 a6 1-0
+"""
+
+BAD_FEN = """[Event "bad fen"]
+[FEN "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP w KQkq - 0 1"]
+[Result "0-1"]
+
+1. e4 e5 0-1
+"""
+
+
+def first_move_entry():
+    gs = new_state(POSITIONS["initial"][0])
+    e4 = next(m for m in gs.get_valid_moves() if m.get_uci_notation() == "e2e4")
+    return polyglot_key(gs), encode_move(e4)
+
+
+def test_replay_game_counts_every_ply():
+    stats = {}
+    assert replay_game(GOOD, 20, stats)
+    assert len(stats) == 6
+    assert stats[first_move_entry()] == [1, 1, 0, 0]
+
+
+def test_bad_game_adds_nothing():
+    stats = {}
+    assert not replay_game(BAD, 20, stats)
+    assert not replay_game(BAD_FEN, 20, stats)
+    assert stats == {}
+    # The plies before the bad move only count once the good game is read
+    assert replay_game(GOOD, 20, stats)
+    assert stats[first_move_entry()] == [1, 1, 0, 0]
+
+
+def test_compile_games_skips_bad_games(tmp_path):
+    path = tmp_path / "games.pgn"
+    path.write_text(GOOD + "\n" + BAD + "\n" + BAD_FEN + "\n" + GOOD)
+    stats, games, skipped = compile_games([path])
+    assert (games, skipped) == (4, 2)
+    assert stats[first_move_entry()] == [2, 2, 0, 0]
+    assert all(counts[0] == 2 for counts in stats.values())
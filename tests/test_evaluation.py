@@ -0,0 +1,43 @@
+"""
+Evaluation term tests.
+
+    python -m pytest -q tests/test_evaluation.py
+"""
+
+import random
+
+import pytest
+
+from src.Engine_Move import PAWN_STRUCTURE, pawn_counts, pawn_structure_score
+from src.perft import POSITIONS, new_state
+
+
+def test_pawn_counts():
+    # White: doubled, isolated and passed c-pawns; black: an isolated passed a-pawn
+    gs = new_state("4k3/p7/8/8/8/2P5/2P5/4K3 w - - 0 1")
+    white, black = gs.pawn_masks()
+    assert pawn_counts(white, black, "w") == (1, 2, 2)
+    assert pawn_counts(black, white, "b") == (0, 1, 1)
+    doubled, isolated, passed = PAWN_STRUCTURE
+    assert pawn_structure_score(gs) == pytest.approx(doubled + isolated + passed)
+
+
+def test_passed_pawn_blocked_by_adjacent_file():
+    gs = new_state("4k3/3p4/8/4P3/8/8/8/4K3 w - - 0 1")
+    white, black = gs.pawn_masks()
+    # d7 is in front of e5 on an adjacent file, and e5 in front of d7
+    assert pawn_counts(white, black, "w")[2] == 0
+    assert pawn_counts(black, white, "b")[2] == 0
+
+
+def test_pawn_masks_agree_between_backends():
+    rng = random.Random(3)
+    for _ in range(20):
+        gs = new_state(POSITIONS["initial"][0])
+        for _ in range(rng.randrange(80)):
+            moves = gs.get_valid_moves()
+            if not moves:
+                break
+            gs.make_move(rng.choice(moves))
+        fen = gs.board_to_fen()
+        assert new_state(fen, bitboard=False).pawn_masks() == gs.pawn_masks()
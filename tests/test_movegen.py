@@ -0,0 +1,79 @@
+"""
+Move generation, FEN and Zobrist regression tests for both position backends.
+
+    python -m pytest -q
+"""
+
+import random
+
+import pytest
+
+from src.perft import POSITIONS, new_state, perft
+
+# Node counts above this are left to `python -m src.perft --suite`
+MAX_NODES = 10000
+BACKENDS = [pytest.param(False, id="mailbox"), pytest.param(True, id="bitboard")]
+
+PERFT_CASES = [
+    (name, depth, nodes)
+    for name, (_, counts) in POSITIONS.items()
+    for depth, nodes in counts.items()
+    if nodes <= MAX_NODES
+]
+
+
+def random_walk(gs, plies, rng):
+    """Play up to plies random legal moves, yielding the state after each."""
+    for _ in range(plies):
+        moves = gs.get_valid_moves()
+        if not moves:
+            return
+        gs.make_move(rng.choice(moves))
+        yield gs
+
+
+@pytest.mark.parametrize("bitboard", BACKENDS)
+@pytest.mark.parametrize("name, depth, nodes", PERFT_CASES)
+def test_perft(name, depth, nodes, bitboard):
+    gs = new_state(POSITIONS[name][0], bitboard)
+    assert perft(gs, depth) == nodes
+    # make_move/undo left the position as it was
+    assert gs.board_to_fen() == POSITIONS[name][0]
+
+
+@pytest.mark.parametrize("name", sorted(POSITIONS))
+def test_fen_round_trip(name):
+    fen = POSITIONS[name][0]
+    assert new_state(fen).board_to_fen() == fen
+
+
+@pytest.mark.parametrize("bitboard", BACKENDS)
+def test_fen_round_trip_after_random_play(bitboard):
+    rng = random.Random(1)
+    for _ in range(20):
+        for gs in random_walk(new_state(POSITIONS["initial"][0], bitboard), 60, rng):
+            fen = gs.board_to_fen()
+            copy = new_state(fen, bitboard)
+            assert copy.board_to_fen() == fen
+            assert copy.zobrist_key == gs.zobrist_key
+
+
+@pytest.mark.parametrize("bitboard", BACKENDS)
+@pytest.mark.parametrize("name", sorted(POSITIONS))
+def test_incremental_zobrist_and_evaluation(name, bitboard):
+    rng = random.Random(name)
+    gs = new_state(POSITIONS[name][0], bitboard)
+    start_key = gs.zobrist_key
+    plies = 0
+    for gs in random_walk(gs, 40, rng):
+        plies += 1
+        assert gs.zobrist_key == gs.compute_zobrist()
+        material, mg, eg, phase = gs.compute_evaluation()
+        assert gs.material == pytest.approx(material)
+        assert gs.pst_mg == pytest.approx(mg)
+        assert gs.pst_eg == pytest.approx(eg)
+        assert gs.phase == phase
+    for _ in range(plies):
+        gs.undo()
+    assert gs.zobrist_key == start_key
+    assert gs.board_to_fen() == POSITIONS[name][0]
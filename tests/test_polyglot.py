@@ -0,0 +1,70 @@
+"""
+Polyglot keys against the reference values from the Polyglot book format
+specification, and a write_book / PolyglotBook round trip.
+
+    python -m pytest -q tests/test_polyglot.py
+"""
+
+import random
+
+import pytest
+
+from src.perft import POSITIONS, new_state
+from src.polyglot import PolyglotBook, encode_move, polyglot_key, write_book
+
+BACKENDS = [pytest.param(False, id="mailbox"), pytest.param(True, id="bitboard")]
+
+REFERENCE_KEYS = [
+    ("", 0x463B96181691FC9C),
+    ("e2e4", 0x823C9B50FD114196),
+    ("e2e4 d7d5", 0x0756B94461C50FB0),
+    ("e2e4 d7d5 e4e5", 0x662FAFB965DB29D4),
+    ("e2e4 d7d5 e4e5 f7f5", 0x22A48B5A8E47FF78),
+    ("e2e4 d7d5 e4e5 f7f5 e1e2", 0x652A607CA3F242C1),
+    ("e2e4 d7d5 e4e5 f7f5 e1e2 e8f7", 0x00FDD303C946BDD9),
+    ("a2a4 b7b5 h2h4 b5b4 c2c4", 0x3C8123EA7B067637),
+    ("a2a4 b7b5 h2h4 b5b4 c2c4 b4c3 a1a3", 0x5C3F9B829B279560),
+]
+
+
+def play(gs, moves):
+    for uci in moves.split():
+        move = next(m for m in gs.get_valid_moves() if m.get_uci_notation() == uci)
+        gs.make_move(move)
+    return gs
+
+
+@pytest.mark.parametrize("bitboard", BACKENDS)
+@pytest.mark.parametrize("moves, key", REFERENCE_KEYS)
+def test_reference_keys(moves, key, bitboard):
+    gs = play(new_state(POSITIONS["initial"][0], bitboard), moves)
+    assert polyglot_key(gs) == key
+    # The same position loaded from FEN hashes the same
+    assert polyglot_key(new_state(gs.board_to_fen(), bitboard)) == key
+
+
+def test_write_book_round_trip(tmp_path):
+    gs = new_state(POSITIONS["kiwipete"][0])
+    key = polyglot_key(gs)
+    moves = gs.get_valid_moves()
+    # Castling, captures and quiet moves, with distinct weights
+    chosen = [m for m in moves if m.is_castle] + [m for m in moves if m.is_capture][:3]
+    chosen += [m for m in moves if m not in chosen][:3]
+    weights = {m.get_uci_notation(): 10 * (i + 1) for i, m in enumerate(chosen)}
+    start = new_state(POSITIONS["initial"][0])
+    entries = [(key, encode_move(m), weights[m.get_uci_notation()], 0) for m in chosen]
+    # An entry for another position must not leak in
+    entries.append((polyglot_key(start), encode_move(start.get_valid_moves()[0]), 500, 0))
+    path = tmp_path / "book.bin"
+    assert write_book(path, entries) == len(entries)
+
+    with PolyglotBook(path) as book:
+        assert len(book) == len(entries)
+        found = [(m.get_uci_notation(), w) for m, w in book.moves(gs)]
+        assert found == sorted(weights.items(), key=lambda mw: mw[1], reverse=True)
+        assert all(m in moves for m, _ in book.moves(gs))
+        assert book.choose(gs).get_uci_notation() == found[0][0]
+        rng = random.Random(0)
+        picks = {book.choose(gs, weighted=True, rng=rng).get_uci_notation() for _ in range(200)}
+        assert picks <= set(weights) and len(picks) > 1
+        assert book.moves(new_state("4k3/8/8/8/8/8/8/4K3 w - - 0 1")) == []
@@ -0,0 +1,102 @@
+"""
+SharedTranspositionTable: entry packing, the lockless XOR check and sharing
+the table with other processes.
+
+    python -m pytest -q tests/test_transposition.py
+"""
+
+import multiprocessing
+import pickle
+
+import pytest
+
+from src.transposition import (
+    EXACT,
+    LOWER,
+    SHARED_ENTRY_WORDS,
+    UPPER,
+    SharedTranspositionTable,
+)
+
+KEY = 0x9D39247E33776D41
+
+
+@pytest.fixture
+def table():
+    tt = SharedTranspositionTable(size_mb=1)
+    yield tt
+    tt.close()
+
+
+def slot(tt, key):
+    """Index of the first word of key's slot."""
+    return 1 + (key & tt.mask) * SHARED_ENTRY_WORDS
+
+
+@pytest.mark.parametrize(
+    "depth, flag, score, move_id",
+    [
+        (0, EXACT, 0.0, None),
+        (1, LOWER, -0.35, 1 << 14 | 3 << 15 | 63),
+        (12, UPPER, 99998.0, 4095),
+        (255, EXACT, -1e5, 1),
+    ],
+)
+def test_packing_round_trip(table, depth, flag, score, move_id):
+    table.new_search()
+    table.new_search()
+    table.store(KEY, depth, flag, score, move_id)
+    assert table.probe(KEY) == (KEY, depth, flag, score, move_id, 2)
+
+
+def test_probe_misses_other_keys(table):
+    table.store(KEY, 5, EXACT, 1.5, 100)
+    # Same slot, different key
+    assert table.probe(KEY ^ (1 << 63)) is None
+
+
+def test_torn_entry_is_rejected(table):
+    table.store(KEY, 5, EXACT, 1.5, 100)
+    i = slot(table, KEY)
+    # Another process wrote its data word but not yet its check word
+    table.words[i + 1] = 7 << 20 | 200
+    assert table.probe(KEY) is None
+    # and a torn score word fails the check as well
+    table.store(KEY, 5, EXACT, 1.5, 100)
+    table.words[i + 2] ^= 1
+    assert table.probe(KEY) is None
+
+
+def _store_in_child(tt):
+    tt.store(KEY, 9, LOWER, 2.25, 321)
+    tt.close()
+
+
+def _attach_and_store(name):
+    _store_in_child(SharedTranspositionTable.attach(name))
+
+
+@pytest.mark.parametrize("via_name", [False, True], ids=["pickled", "by-name"])
+def test_child_process_stores(table, via_name):
+    # spawn pickles the Process arguments, so the table goes through __reduce__
+    ctx = multiprocessing.get_context("spawn")
+    if via_name:
+        child = ctx.Process(target=_attach_and_store, args=(table.name,))
+    else:
+        child = ctx.Process(target=_store_in_child, args=(table,))
+    child.start()
+    child.join(60)
+    assert child.exitcode == 0
+    assert table.probe(KEY) == (KEY, 9, LOWER, 2.25, 321, 0)
+
+
+def test_unpickled_table_attaches(table):
+    table.store(KEY, 3, UPPER, -0.5, None)
+    copy = pickle.loads(pickle.dumps(table))
+    try:
+        assert not copy.owner
+        assert copy.name == table.name
+        assert copy.size == table.size
+        assert copy.probe(KEY) == (KEY, 3, UPPER, -0.5, None, 0)
+    finally:
+        copy.close()
@@ -0,0 +1,59 @@
+"""
+UCI command handling: malformed input is reported and leaves the state alone.
+
+    python -m pytest -q tests/test_uci.py
+"""
+
+import io
+
+import pytest
+
+from src.uci import DEFAULT_HASH_MB, UCIEngine
+
+AFTER_E4 = "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1"
+
+
+@pytest.fixture
+def engine():
+    output = io.StringIO()
+    uci = UCIEngine(output)
+    yield uci, output
+    uci.handle("quit")
+
+
+@pytest.mark.parametrize(
+    "fen",
+    [
+        "not a fen",
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNX w KQkq - 0 1",
+        "rnbqkbnr/pppppppp/9/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+        "rnbq1bnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQ - 0 1",
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq e 0 1",
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - x 1",
+    ],
+)
+def test_invalid_fen_keeps_position(engine, fen):
+    uci, output = engine
+    uci.handle("position startpos moves e2e4")
+    uci.handle(f"position fen {fen} moves e7e5")
+    assert "info string invalid fen" in output.getvalue()
+    assert uci.gs.board_to_fen() == AFTER_E4
+
+
+def test_invalid_option_value_keeps_option(engine):
+    uci, output = engine
+    searcher = uci.searcher
+    uci.handle("setoption name Hash value big")
+    uci.handle("setoption name Threads value many")
+    assert output.getvalue().count("info string invalid value") == 2
+    assert uci.hash_mb == DEFAULT_HASH_MB
+    assert uci.threads == 1
+    assert uci.searcher is searcher
+
+
+def test_invalid_go_value_is_ignored(engine):
+    uci, output = engine
+    uci.handle("go depth x nodes 200")
+    uci.stop()
+    assert "info string invalid value x for depth" in output.getvalue()
+    assert "bestmove" in output.getvalue()